@@ -0,0 +1,165 @@
+"""Spending analysis over the month x category matrix.
+
+Works on the table ``monthly_category_totals()`` returns (months down,
+categories across, taka in the cells) and computes, per category and for
+the monthly total:
+
+- a moving average over ``window`` months
+- the change from the month before, in taka and as a fraction
+- outlier flags: months more than ``z`` standard deviations from the mean of
+  the OUTLIER_WINDOW months before them
+- a forecast for the next ``horizon`` months, from a straight line fitted to
+  the last TREND_MONTHS months
+
+Everything is done with whole-column pandas/NumPy operations, so the cost
+depends on the number of months and categories, never on the number of
+transactions. ``SpendingAnalysis.updated`` takes the matrix again after new
+transactions and recomputes only the months from the first one that changed,
+reusing the earlier rows.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+TOTAL = "Total"
+WINDOW = 3
+TREND_MONTHS = 6
+HORIZON = 3
+OUTLIER_WINDOW = 12
+OUTLIER_MIN_MONTHS = 4  # Fewer months before one than this and it is never an outlier
+OUTLIER_Z = 3.0
+# Earlier months any statistic for a month depends on
+CONTEXT = max(WINDOW, OUTLIER_WINDOW) + 1
+
+
+def monthly_matrix(table):
+    """Month x category table with a row for every month in its span and a Total column.
+
+    The index may hold 'YYYY-MM' labels, timestamps or monthly periods; months
+    with no spending become rows of zeros.
+    """
+    if table.empty:
+        return pd.DataFrame(columns=[*map(str, table.columns), TOTAL], index=pd.PeriodIndex([], freq='M'), dtype=float)
+    index = table.index
+    if not isinstance(index, pd.PeriodIndex):
+        index = pd.to_datetime(index.astype(str) if index.dtype == object else index).to_period('M')
+    matrix = table.set_axis(index).astype(float).groupby(level=0).sum()
+    matrix = matrix.reindex(pd.period_range(index.min(), index.max(), freq='M'), fill_value=0.0)
+    matrix.columns = [str(column) for column in matrix.columns]
+    matrix[TOTAL] = matrix.sum(axis=1)
+    return matrix
+
+
+def _statistics(values, window, z):
+    """Rolling mean, changes, z-scores and outlier flags for every row of values"""
+    previous = values.shift(1)
+    change = values - previous
+    trailing = previous.rolling(OUTLIER_WINDOW, min_periods=OUTLIER_MIN_MONTHS)
+    mean, std = trailing.mean(), trailing.std()
+    zscores = (values - mean) / std.where(std > 0)
+    return {
+        'rolling_mean': values.rolling(window, min_periods=1).mean(),
+        'change': change,
+        'change_pct': change / previous.where(previous != 0),
+        'typical': mean,
+        'zscores': zscores,
+        'outliers': zscores.abs() > z,
+    }
+
+
+def _forecast(values, horizon):
+    """Least-squares line through the last TREND_MONTHS months of every column, extended horizon months"""
+    future = pd.period_range(values.index[-1] + 1, periods=horizon, freq='M') if len(values) else pd.PeriodIndex([], freq='M')
+    recent = values.iloc[-TREND_MONTHS:].to_numpy()
+    if not len(recent):
+        return pd.DataFrame(index=future, columns=values.columns, dtype=float)
+    x = np.arange(len(recent), dtype=float)
+    x -= x.mean()
+    level = recent.mean(axis=0)
+    spread = (x ** 2).sum()
+    slope = (x @ (recent - level)) / spread if spread else np.zeros(recent.shape[1])
+    steps = x[-1] + np.arange(1, horizon + 1, dtype=float)
+    predicted = np.maximum(level + np.outer(steps, slope), 0.0)  # Spending can't go negative
+    return pd.DataFrame(predicted, index=future, columns=values.columns)
+
+
+class SpendingAnalysis:
+    """Moving averages, month-over-month changes, outliers and a forecast for a monthly table.
+
+    Every statistic is a DataFrame indexed by month (a monthly PeriodIndex)
+    with one column per category plus TOTAL; ``typical`` is the trailing mean
+    outliers are measured from. ``forecast`` is indexed by the ``horizon``
+    months after the last one.
+    """
+    def __init__(self, table, window=WINDOW, z=OUTLIER_Z, horizon=HORIZON):
+        self.window = window
+        self.z = z
+        self.horizon = horizon
+        self._set(monthly_matrix(table))
+
+    def _set(self, values, statistics=None):
+        self.values = values
+        statistics = statistics if statistics is not None else _statistics(values, self.window, self.z)
+        for name, frame in statistics.items():
+            setattr(self, name, frame)
+        self.forecast = _forecast(values, self.horizon)
+
+    @property
+    def months(self):
+        return self.values.index
+
+    def updated(self, table):
+        """Analysis of a newer version of the table, recomputing only the months that changed.
+
+        Falls back to a full computation if the table now starts earlier or
+        has different categories.
+        """
+        values = monthly_matrix(table)
+        old = self.values
+        if (not len(old) or len(values) < len(old) or list(values.columns) != list(old.columns)
+                or not values.index[:len(old)].equals(old.index)):
+            result = copy.copy(self)
+            result._set(values)
+            return result
+        unchanged = (values.iloc[:len(old)].to_numpy() == old.to_numpy()).all(axis=1)
+        start = len(old) if unchanged.all() else int(np.argmin(unchanged))
+        if start == len(values):
+            return self
+        first = max(start - CONTEXT, 0)
+        fresh = _statistics(values.iloc[first:], self.window, self.z)
+        statistics = {
+            name: pd.concat([getattr(self, name).iloc[:start], frame.iloc[start - first:]])
+            for name, frame in fresh.items()
+        }
+        result = copy.copy(self)
+        result._set(values, statistics)
+        return result
+
+    def flagged(self):
+        """Outlying (month, category) cells as rows of Month, Category, Amount, Typical and Z"""
+        months, columns = np.nonzero(self.outliers.to_numpy())
+        return pd.DataFrame({
+            'Month': self.months[months].astype(str),
+            'Category': self.values.columns[columns],
+            'Amount': self.values.to_numpy()[months, columns],
+            'Typical': self.typical.to_numpy()[months, columns],
+            'Z': self.zscores.to_numpy()[months, columns],
+        })
+
+    def to_frame(self):
+        """Monthly totals with their statistics, then the forecast months, for writing out"""
+        frame = pd.DataFrame({
+            'Total': self.values[TOTAL],
+            f'{self.window}-month average': self.rolling_mean[TOTAL],
+            'Change': self.change[TOTAL],
+            'Change %': self.change_pct[TOTAL] * 100,
+            'Z-score': self.zscores[TOTAL],
+            'Outlier': self.outliers[TOTAL],
+            'Forecast': np.nan,
+        })
+        forecast = pd.DataFrame({'Forecast': self.forecast[TOTAL]})
+        frame = pd.concat([frame, forecast]) if len(forecast) else frame
+        frame.index = frame.index.astype(str)
+        frame.index.name = 'Month'
+        return frame
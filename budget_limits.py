@@ -0,0 +1,97 @@
+import json
+import os
+from dataclasses import dataclass
+
+from transaction_store import PAISA, to_paisa
+
+
+@dataclass
+class LimitStatus:
+    category: str  # None for the overall limit
+    month: str
+    limit: float
+    spent: float
+
+    @property
+    def remaining(self):
+        return self.limit - self.spent
+
+    @property
+    def exceeded(self):
+        return self.spent > self.limit
+
+
+class BudgetLimits:
+    """Monthly spending limits, per category and overall, with running totals.
+
+    Totals are kept per (month, category) and per (month, None) for the
+    overall figure, so checking a limit or adding a transaction is a couple
+    of dict lookups. Totals are int paisa so they never drift; limits and
+    the figures in a LimitStatus are taka. ``rebuild`` recomputes them from a month x category
+    table after loads, imports and edits. Months are 'YYYY-MM' strings.
+    """
+    def __init__(self, overall=None, categories=None):
+        self.overall = overall
+        self.categories = dict(categories or {})
+        self._spent = {}
+
+    @classmethod
+    def load(cls, path):
+        """Limits saved at path, or no limits if there is no (valid) file"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        return cls(data.get("overall"), data.get("categories"))
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"overall": self.overall, "categories": self.categories}, f)
+        os.replace(tmp_path, path)
+
+    def rebuild(self, source):
+        """Recompute running totals from anything with monthly_category_totals()"""
+        self._spent = {}
+        table = source.monthly_category_totals()
+        paisa = to_paisa(table.to_numpy())
+        for month, row in zip(table.index, paisa):
+            for category, amount in zip(table.columns, row):
+                if amount:
+                    self._spent[(month, category)] = int(amount)
+            self._spent[(month, None)] = int(row.sum())
+
+    def add(self, month, category, amount):
+        """Count one new transaction (in taka); returns the statuses of limits it now exceeds"""
+        amount = int(to_paisa(amount))
+        self._spent[(month, category)] = self._spent.get((month, category), 0) + amount
+        self._spent[(month, None)] = self._spent.get((month, None), 0) + amount
+        return [status for status in self.status(month, category) if status.exceeded]
+
+    def add_rollup(self, rollup):
+        """Count the transactions summed in a MonthlyRollup; returns the statuses of limits they now exceed"""
+        for (month, category), cell in rollup.cells.items():
+            self._spent[(month, category)] = self._spent.get((month, category), 0) + cell[0]
+            self._spent[(month, None)] = self._spent.get((month, None), 0) + cell[0]
+        exceeded = {}
+        for month, category in rollup.cells:
+            for status in self.status(month, category):
+                if status.exceeded:
+                    exceeded[(status.month, status.category)] = status
+        return list(exceeded.values())
+
+    def spent(self, month, category=None):
+        """Taka spent in the month, in one category or overall"""
+        return self._spent.get((month, category), 0) / PAISA
+
+    def status(self, month, category=None, pending=0.0):
+        """LimitStatus for the category's limit and the overall limit, with pending added as if spent"""
+        statuses = []
+        if category is not None and self.categories.get(category) is not None:
+            statuses.append(LimitStatus(
+                category, month, self.categories[category], self.spent(month, category) + pending
+            ))
+        if self.overall is not None:
+            statuses.append(LimitStatus(None, month, self.overall, self.spent(month) + pending))
+        return statuses
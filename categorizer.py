@@ -0,0 +1,138 @@
+"""Keyword rules that pick a category from a transaction's description.
+
+All keywords are compiled into one regular expression shaped like a trie:
+alternatives sharing a prefix are factored together (``pa(?:rking|thao)``),
+so a description is scanned once however many rules there are, instead of
+once per rule. Matching is case-insensitive on whole words; the leftmost
+keyword in the description decides, and at the same position the longest
+keyword wins. Results are memoized per distinct description, and
+``categorize_many`` only looks at each distinct string in a column once, so
+statements full of repeated merchant names cost little.
+
+Rules are {category: [keywords]}. A JSON file of the same shape (see
+``Categorizer.load``) adds to or overrides the built-in rules.
+"""
+import json
+import re
+
+from ui_styles import CATEGORIES
+
+DEFAULT_RULES = {
+    "Food": [
+        "restaurant", "cafe", "coffee", "bakery", "grocery", "groceries", "food delivery", "foodpanda",
+        "pathao food", "kfc", "pizza", "burger", "sweets", "kacchi", "biryani", "meena bazar",
+    ],
+    "Transportation": [
+        "bus fare", "bus", "ride share", "uber", "pathao", "obhai", "cng", "fuel", "petrol", "octane",
+        "diesel", "train ticket", "railway", "parking", "toll", "metro rail", "launch",
+    ],
+    "Utilities": [
+        "electricity", "electricity bill", "desco", "dpdc", "water bill", "wasa", "gas bill", "titas",
+        "internet", "broadband", "mobile recharge", "recharge", "grameenphone", "robi", "banglalink",
+    ],
+    "Entertainment": [
+        "cinema", "cineplex", "streaming", "netflix", "spotify", "youtube premium", "concert", "games",
+        "steam", "playstation",
+    ],
+    "Shopping": [
+        "clothing", "electronics", "home goods", "online order", "gifts", "daraz", "aarong", "shwapno",
+        "agora", "amazon", "mall",
+    ],
+    "Healthcare": [
+        "pharmacy", "doctor", "doctor visit", "hospital", "clinic", "lab test", "diagnostic", "dental",
+        "optician", "medicine",
+    ],
+    "Education": [
+        "tuition", "course fee", "stationery", "exam fee", "textbooks", "school", "university",
+        "coursera", "udemy",
+    ],
+    "Other": ["cash withdrawal", "atm", "donation", "repair", "fees"],
+}
+MEMO_SIZE = 100_000
+
+
+def _trie_pattern(keywords):
+    """Regex source matching any of the keywords, factored by shared prefixes"""
+    trie = {}
+    for word in keywords:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = None  # A keyword ends here
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items(), key=str) if char]
+        if not branches:
+            return ''
+        body = '|'.join(branches)
+        if None in node:
+            # Optional and greedy: keep going for a longer keyword, fall back to this one
+            return f'(?:{body})?'
+        return body if len(branches) == 1 else f'(?:{body})'
+
+    return build(trie)
+
+
+class Categorizer:
+    """Suggests categories for descriptions from keyword rules.
+
+    ``rules`` maps categories to keywords; only ``categories`` are allowed as
+    targets. A keyword listed under two categories goes to the later one.
+    """
+    def __init__(self, rules=None, categories=CATEGORIES):
+        self._keywords = {}
+        for category, keywords in (DEFAULT_RULES if rules is None else rules).items():
+            if category not in categories:
+                raise ValueError(f"Unknown category in rules: {category}")
+            for keyword in keywords:
+                keyword = " ".join(str(keyword).lower().split())
+                if keyword:
+                    self._keywords[keyword] = category
+        source = _trie_pattern(self._keywords)
+        self._pattern = re.compile(rf'(?<!\w){source}(?!\w)') if source else None
+        self._memo = {}
+
+    @classmethod
+    def load(cls, path, categories=CATEGORIES):
+        """Built-in rules plus those in the JSON file at path, if there is a valid one.
+
+        Keywords in the file win over built-in ones; categories that aren't
+        in ``categories`` are skipped.
+        """
+        rules = {category: list(keywords) for category, keywords in DEFAULT_RULES.items()}
+        try:
+            with open(path) as f:
+                extra = json.load(f)
+        except (OSError, ValueError):
+            extra = {}
+        if isinstance(extra, dict):
+            for category, keywords in extra.items():
+                if category in categories and isinstance(keywords, list):
+                    # Listed last, so they override the same keyword elsewhere
+                    rules.pop(category, None)
+                    rules[category] = list(DEFAULT_RULES.get(category, [])) + keywords
+        return cls(rules, categories)
+
+    def categorize(self, description):
+        """Category for one description, or None if no keyword matches"""
+        category = self._memo.get(description, False)
+        if category is not False:
+            return category
+        category = None
+        if self._pattern is not None and description:
+            match = self._pattern.search(" ".join(description.lower().split()))
+            if match:
+                category = self._keywords[match.group(0)]
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[description] = category
+        return category
+
+    def categorize_many(self, descriptions):
+        """Object array of categories (None where nothing matched), one per description"""
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(pd.Series(descriptions, dtype=object).fillna('').astype(str))
+        found = np.array([self.categorize(text) for text in uniques] + [None], dtype=object)
+        return found[codes]  # Code -1 never occurs after fillna, but would map to None
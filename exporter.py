@@ -0,0 +1,246 @@
+"""Streaming export of a ledger, or a filtered part of it, to a file.
+
+Rows are taken from a LedgerView ``chunksize`` at a time, turned into a
+small DataFrame and written out, so memory use depends on the chunk size
+and not on the size of the ledger. The format comes from the file name:
+
+    .csv, .csv.gz, .csv.zst      CSV in the ledger's column layout
+    .jsonl, .jsonl.gz, .jsonl.zst  one JSON object per line
+    .parquet                     Parquet with a date column (needs pyarrow)
+
+zstd compression needs the ``zstandard`` package. Output goes to a
+temporary file that only replaces the target once the export completes,
+so a cancelled or failed export never leaves a partial file behind.
+"""
+import gzip
+import io
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from storage import COLUMNS
+
+FORMATS = {
+    '.csv': ('csv', None),
+    '.csv.gz': ('csv', 'gzip'),
+    '.csv.zst': ('csv', 'zstd'),
+    '.jsonl': ('jsonl', None),
+    '.jsonl.gz': ('jsonl', 'gzip'),
+    '.jsonl.zst': ('jsonl', 'zstd'),
+    '.parquet': ('parquet', None),
+}
+# For file dialogs, in the order they should be offered
+FILETYPES = [
+    ("CSV files", "*.csv"),
+    ("Compressed CSV (gzip)", "*.csv.gz"),
+    ("Compressed CSV (zstd)", "*.csv.zst"),
+    ("JSON lines", "*.jsonl"),
+    ("Parquet", "*.parquet"),
+]
+
+
+class ExportCancelled(Exception):
+    """Raised by export_view when its cancelled() check returns True."""
+
+
+@dataclass
+class ExportProgress:
+    rows_written: int = 0
+    rows_total: int = 0
+    elapsed: float = 0.0
+    done: bool = False
+    cancelled: bool = False
+    error: Exception = None
+
+    @property
+    def fraction(self):
+        return self.rows_written / self.rows_total if self.rows_total else 1.0
+
+
+def export_format(path):
+    """(format, compression) for a file name; ValueError for unknown extensions"""
+    name = path.lower()
+    for suffix in sorted(FORMATS, key=len, reverse=True):
+        if name.endswith(suffix):
+            return FORMATS[suffix]
+    raise ValueError(f"Don't know how to export to {os.path.basename(path)}; "
+                     f"use one of {', '.join(FORMATS)}")
+
+
+def _open_binary(path, compression):
+    if compression == 'gzip':
+        # Level 6 is most of level 9's ratio at a fraction of its time
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd export needs the zstandard package (pip install zstandard)") from None
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'))
+    return open(path, 'wb')
+
+
+class _TextWriter:
+    """CSV or JSON-lines chunks into a possibly compressed file"""
+    def __init__(self, path, fmt, compression):
+        self.fmt = fmt
+        self._file = io.TextIOWrapper(_open_binary(path, compression), encoding='utf-8', newline='')
+        self._header = True
+
+    def write(self, chunk):
+        if self.fmt == 'csv':
+            chunk.to_csv(self._file, header=self._header, index=False, lineterminator='\n')
+            self._header = False
+        else:
+            text = chunk.to_json(orient='records', lines=True, force_ascii=False)
+            self._file.write(text if text.endswith('\n') else text + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Chunks as row groups of one Parquet file, with a fixed schema"""
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs the pyarrow package (pip install pyarrow)") from None
+        self._pa = pa
+        self.schema = pa.schema([
+            ('Date', pa.date32()),
+            ('Category', pa.string()),
+            ('Amount', pa.float64()),
+            ('Description', pa.string()),
+            ('Note', pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, chunk):
+        pa = self._pa
+        arrays = [pa.array(chunk['Date'].to_numpy(dtype='datetime64[D]'))]
+        arrays += [pa.array(chunk[field.name], type=field.type) for field in list(self.schema)[1:]]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export_view(view, path, chunksize=100_000, progress=None, cancelled=None):
+    """Write every row of a LedgerView to path in chunks; returns the final ExportProgress.
+
+    Raises ExportCancelled (after removing the partial output) if cancelled()
+    returns True between chunks.
+    """
+    fmt, compression = export_format(path)
+    status = ExportProgress(rows_total=len(view))
+    started = time.perf_counter()
+    tmp_path = path + ".part"
+    writer = _ParquetWriter(tmp_path) if fmt == 'parquet' else _TextWriter(tmp_path, fmt, compression)
+    try:
+        try:
+            for chunk in view.iter_frames(chunksize):
+                if cancelled is not None and cancelled():
+                    raise ExportCancelled()
+                writer.write(chunk.reindex(columns=COLUMNS))
+                status.rows_written += len(chunk)
+                status.elapsed = time.perf_counter() - started
+                if progress is not None:
+                    progress(status)
+            if not len(view) and fmt == 'csv':
+                writer.write(view.to_frame().reindex(columns=COLUMNS))  # Just the CSV header
+        finally:
+            writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    status.elapsed = time.perf_counter() - started
+    status.done = True
+    return status
+
+
+class ExportJob:
+    """Runs export_view on a background thread.
+
+    Like ImportJob, the UI thread calls ``poll()`` from ``root.after`` for the
+    latest ExportProgress and ``cancel()`` to stop after the current chunk.
+    The view holds on to the arrays it was made from, so transactions added
+    while the export runs are simply not part of it.
+    """
+    def __init__(self, view, path, **options):
+        self._updates = queue.Queue()
+        self._cancel = threading.Event()
+        self._latest = ExportProgress(rows_total=len(view))
+        self._thread = threading.Thread(target=self._run, args=(view, path, options), daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self, view, path, options):
+        last = ExportProgress(rows_total=len(view))
+
+        def report(status):
+            nonlocal last
+            last = ExportProgress(**vars(status))
+            self._updates.put(last)
+
+        try:
+            status = export_view(view, path, progress=report, cancelled=self._cancel.is_set, **options)
+        except ExportCancelled:
+            status = ExportProgress(**vars(last))
+            status.done, status.cancelled = True, True
+        except Exception as e:
+            status = ExportProgress(**vars(last))
+            status.done, status.error = True, e
+        self._updates.put(status)
+
+    def poll(self):
+        """Most recent progress report"""
+        while True:
+            try:
+                self._latest = self._updates.get_nowait()
+            except queue.Empty:
+                return self._latest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Export a ledger, or part of it, to CSV, JSON lines or Parquet")
+    parser.add_argument("ledger")
+    parser.add_argument("output", help=f"output file; the extension picks the format ({', '.join(FORMATS)})")
+    parser.add_argument("--start", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("--category", action="append", dest="categories",
+                        help="only this category; may be given more than once")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    ledger = open_storage(args.ledger)
+    try:
+        store = ledger.load_store()
+    finally:
+        ledger.close()
+    if args.start or args.end or args.categories:
+        selection = store.query(args.start, args.end, args.categories)
+    else:
+        selection = store.view()
+    result = export_view(
+        selection, args.output,
+        chunksize=args.chunksize,
+        progress=lambda s: print(f"\r{s.rows_written:,} of {s.rows_total:,} rows", end=""),
+    )
+    print(f"\nExported {result.rows_written:,} rows to {args.output} in {result.elapsed:.1f}s")
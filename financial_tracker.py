@@ -1,13 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from tkcalendar import DateEntry
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
-import os
+import queue
+import threading
 from ui_styles import configure_styles, CATEGORIES, Colors
-import numpy as np
+from report_worker import ReportWorker, ReportCancelled, render_png
+from report_cache import ReportCache, AGGREGATE_BYTES, FIGURE_BYTES
+import reports
+from instrumentation import span
+
+# pandas, numpy, matplotlib and tkcalendar are imported where they are first
+# needed, so the window can appear before any of them has loaded.
+
+
+def __getattr__(name):
+    # Keep `from financial_tracker import Transaction` working without
+    # importing the ledger stack at module load
+    if name in ('Transaction', 'TransactionStore'):
+        import transaction_store
+        return getattr(transaction_store, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class PlaceholderEntry(ttk.Entry):
@@ -39,85 +51,125 @@ class PlaceholderEntry(ttk.Entry):
         return value
 
 
-class Transaction:
-    """Represents a financial transaction."""
-    def __init__(self, amount, category, description="", note="", date=None):
-        self.amount = amount
-        self.category = category
-        self.description = description
-        self.note = note
-        self.date = date if date else datetime.now()
-
-
 class Budget:
     """Manages a collection of transactions."""
-    def __init__(self, data_file="transactions.csv"):
-        self.transactions = []
+    def __init__(self, data_file="transactions.csv", storage=None, journal=False):
+        from budget_limits import BudgetLimits
+        from storage import open_storage
+        from transaction_store import TransactionStore
+
+        self.transactions = TransactionStore()
+        self.signature = None  # Of the ledger as this Budget last saw it
         self.data_file = data_file
+        self.limits = BudgetLimits.load(data_file + ".limits.json")
+        self.storage = storage if storage is not None else open_storage(data_file, journal=journal)
         self.load_transactions()
 
+    def close(self):
+        """Flush and release the storage backend."""
+        self.storage.close()
+
     def load_transactions(self):
-        """Loads transactions from CSV file if it exists."""
-        if os.path.exists(self.data_file):
-            df = pd.read_csv(self.data_file)
-            for _, row in df.iterrows():
-                date = datetime.strptime(row['Date'], "%Y-%m-%d")
-                transaction = Transaction(
-                    amount=float(row['Amount']),
-                    category=row['Category'],
-                    description=row['Description'],
-                    note=row['Note'],
-                    date=date
-                )
-                self.transactions.append(transaction)
+        """Loads transactions from the storage backend if it has any."""
+        with span("budget.load"), self.storage.reading():
+            self.signature = self.storage.signature()
+            if self.storage.exists():
+                self.transactions = self.storage.load_store()
+            self.limits.rebuild(self.transactions.view())
 
     def add_transaction(self, transaction):
-        """Adds a transaction and saves to CSV."""
+        """Adds a transaction and appends it to storage; returns the limits it takes over budget."""
         self.transactions.append(transaction)
-        self.save_transactions()
+        with span("storage.append", rows=1):
+            current = self.storage.signature() == self.signature
+            self.storage.append(self._to_frame([transaction]))
+        if current:
+            # Otherwise someone else wrote too, and save_transactions must not overwrite it
+            self.signature = self.storage.signature()
+        return self.limits.add(transaction.date.strftime("%Y-%m"), transaction.category, transaction.amount)
 
     def save_transactions(self):
-        """Saves all transactions to CSV file."""
+        """Saves all transactions to storage, replacing what was there.
+
+        Raises LedgerConflict, leaving the ledger alone, if another program
+        changed it since it was loaded.
+        """
+        with span("storage.replace", rows=len(self.transactions)), self.storage.writing():
+            self.storage.replace(self.transactions.to_frame(), expected=self.signature)
+            self.signature = self.storage.signature()
+        self.limits.rebuild(self.transactions.view())
+
+    @staticmethod
+    def _to_frame(transactions):
+        import pandas as pd
+
         data = {
-            "Date": [t.date.strftime("%Y-%m-%d") for t in self.transactions],
-            "Category": [t.category for t in self.transactions],
-            "Amount": [t.amount for t in self.transactions],
-            "Description": [t.description for t in self.transactions],
-            "Note": [t.note for t in self.transactions],
+            "Date": [t.date.strftime("%Y-%m-%d") for t in transactions],
+            "Category": [t.category for t in transactions],
+            "Amount": [t.amount for t in transactions],
+            "Description": [t.description for t in transactions],
+            "Note": [t.note for t in transactions],
         }
-        df = pd.DataFrame(data)
-        df.to_csv(self.data_file, index=False)
+        return pd.DataFrame(data)
 
     def get_summary(self):
         """Summarizes the transactions by category."""
-        summary = {}
-        for transaction in self.transactions:
-            summary[transaction.category] = summary.get(transaction.category, 0) + transaction.amount
-        return summary
+        with span("budget.summary"):
+            return self.transactions.get_summary()
+
+    def export_to_csv(self, parent=None):
+        """Exports transactions to a user-selected CSV, JSON lines or Parquet file on a background thread.
+
+        A small window over parent shows the progress and can cancel the
+        export. Returns the running ExportJob, or None if nothing was started.
+        """
+        from exporter import FILETYPES, ExportJob, export_format
 
-    def export_to_csv(self):
-        """Exports transactions to a user-selected CSV file."""
         filename = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
+            filetypes=FILETYPES,
             title="Export Transactions"
         )
-        if filename:  # If user didn't cancel the dialog
-            data = {
-                "Date": [t.date.strftime("%Y-%m-%d") for t in self.transactions],
-                "Category": [t.category for t in self.transactions],
-                "Amount": [t.amount for t in self.transactions],
-                "Description": [t.description for t in self.transactions],
-                "Note": [t.note for t in self.transactions],
-            }
-            df = pd.DataFrame(data)
-            df.to_csv(filename, index=False)
-            messagebox.showinfo("Success", f"Transactions exported to {filename}")
+        if not filename:  # User cancelled the dialog
+            return None
+        try:
+            export_format(filename)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return None
+        # Streamed in chunks, so memory use doesn't grow with the ledger
+        job = ExportJob(self.transactions.view(), filename).start()
+
+        window = tk.Toplevel(parent)
+        window.title("Exporting")
+        progress = ttk.Progressbar(window, length=280, maximum=1.0)
+        progress.pack(padx=20, pady=(20, 10))
+        label = ttk.Label(window, text="Exporting...")
+        label.pack(padx=20)
+        ttk.Button(window, text="Cancel", command=job.cancel).pack(pady=(10, 20))
+        window.protocol("WM_DELETE_WINDOW", job.cancel)
+
+        def poll():
+            status = job.poll()
+            progress["value"] = status.fraction
+            label.configure(text=f"{status.rows_written:,} of {status.rows_total:,} rows")
+            if not status.done:
+                window.after(200, poll)
+                return
+            window.destroy()
+            if status.error is not None:
+                messagebox.showerror("Error", f"Failed to export: {str(status.error)}")
+            elif not status.cancelled:
+                messagebox.showinfo("Success", f"{status.rows_written:,} transactions exported to {filename}")
+
+        window.after(200, poll)
+        return job
 
 
 class FinancialTracker:
     """Main application for managing financial transactions."""
-    def __init__(self, root):
+    WATCH_INTERVAL = 2000  # ms between checks for changes made by other programs
+    def __init__(self, root, transactions_file="transactions.csv"):
         self.root = root
         self.root.title("Financial Tracker")
         self.root.geometry("400x700")  # Narrower width, taller height for mobile format
@@ -127,9 +179,76 @@ class FinancialTracker:
         self.style = ttk.Style()
         configure_styles(self.style)
         
-        self.transactions_file = "transactions.csv"
+        self.transactions_file = transactions_file
+        self.rollup_file = transactions_file + ".rollup.json"
+        self.limits_file = transactions_file + ".limits.json"
+        self.rules_file = transactions_file + ".rules.json"
+        self.fingerprints_file = transactions_file + ".fingerprints.npz"
+        # Set by the background loader once the window is up
+        self.storage = None
+        self.rollup = None
+        self.store = None
+        self.limits = None
+        self.fingerprints = None
+        # Last analysis of the whole ledger's monthly trends, updated rather than redone
+        self._trend_analysis = None
+        self.history = None
+        self.categorizer = None
+        # True while the category shown is a suggestion rather than the user's pick
+        self._category_suggested = False
+        self._export_job = None
+        self.report_worker = ReportWorker(self.root, on_busy=self._set_busy)
+        # Reports are cached per ledger version; every change bumps the version
+        self.report_cache = ReportCache()
+        self.ledger_version = 0
+        self._ledger_signature = None
+        self._ledger_position = None  # Where our copy of the ledger ends, for reading only new rows
+        self._watching = False  # A background check of the ledger is running
         self.create_widgets()
-        self.load_transactions()
+        self.root.after_idle(self._finish_startup)
+
+    def _finish_startup(self):
+        """Work deferred until the window has been drawn"""
+        self.create_date_entry()
+        self._start_loading()
+        self.root.after(self.WATCH_INTERVAL, self._watch_ledger)
+
+    def _start_loading(self):
+        """Open and read the ledger on a background thread"""
+        self.status_var.set("Loading transactions...")
+        results = queue.Queue()
+
+        def load():
+            try:
+                from categorizer import Categorizer
+                from storage import open_storage
+                self.categorizer = Categorizer.load(self.rules_file)
+                self.storage = open_storage(self.transactions_file)
+                results.put(self._read_ledger())
+            except Exception as e:
+                results.put(e)
+
+        threading.Thread(target=load, daemon=True).start()
+        self.root.after(50, self._poll_loading, results)
+
+    def _poll_loading(self, results):
+        try:
+            result = results.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self._poll_loading, results)
+            return
+        self.status_var.set("")
+        if isinstance(result, Exception):
+            messagebox.showerror("Error", f"Failed to open transactions: {str(result)}")
+        else:
+            self._apply_ledger(*result)
+
+    def _ledger_ready(self):
+        """Tell the user to wait if the ledger hasn't finished loading"""
+        if self.store is None:
+            messagebox.showinfo("Please wait", "Transactions are still loading")
+            return False
+        return True
 
     def create_widgets(self):
         main_frame = ttk.Frame(self.root, style="Main.TFrame")
@@ -166,7 +285,14 @@ class FinancialTracker:
             state="readonly"
         )
         self.category_combobox.set("Select category")
-        self.category_combobox.pack(fill=tk.X, pady=(5, 15))
+        self.category_combobox.pack(fill=tk.X, pady=(5, 0))
+        self.category_combobox.bind("<<ComboboxSelected>>", self._category_selected)
+        self.amount_entry.bind("<KeyRelease>", self._update_limit_status)
+
+        # Remaining monthly budget for the selected category and overall
+        self.limit_var = tk.StringVar()
+        self.limit_label = ttk.Label(main_frame, textvariable=self.limit_var, style="Hint.TLabel")
+        self.limit_label.pack(anchor=tk.W, pady=(2, 10))
 
         # Description
         ttk.Label(main_frame, text="Description", style="Label.TLabel").pack(anchor=tk.W)
@@ -176,26 +302,25 @@ class FinancialTracker:
             style="Input.TEntry"
         )
         self.description_entry.pack(fill=tk.X, pady=(5, 15))
+        self.description_entry.bind("<KeyRelease>", self._suggest_category)
 
-        # Date
+        # Date; the calendar widget itself is built by create_date_entry
         ttk.Label(main_frame, text="Date", style="Label.TLabel").pack(anchor=tk.W)
-        self.date_entry = DateEntry(
-            main_frame,
-            width=30,
-            background=Colors.PRIMARY,
-            foreground=Colors.BACKGROUND,
-            borderwidth=0,
-            date_pattern='mm/dd/yyyy'
-        )
-        self.date_entry.pack(fill=tk.X, pady=(5, 20))
+        self.date_frame = ttk.Frame(main_frame, style="Main.TFrame")
+        self.date_frame.pack(fill=tk.X, pady=(5, 20))
+        self.date_entry = None
 
         # Buttons container frame
         buttons_container = ttk.Frame(main_frame, style="Main.TFrame")
         buttons_container.pack(side=tk.BOTTOM, fill=tk.X, pady=(0, 10))
 
+        # Busy indicator, shown above the report buttons while a report renders
+        self.busy_bar = ttk.Progressbar(buttons_container, mode="indeterminate")
+
         # Report buttons frame
         report_frame = ttk.Frame(buttons_container, style="Main.TFrame")
         report_frame.pack(fill=tk.X, pady=(0, 10))
+        self.report_frame = report_frame
         
         # View Report button
         ttk.Button(
@@ -219,14 +344,15 @@ class FinancialTracker:
         action_frame = ttk.Frame(buttons_container, style="Main.TFrame")
         action_frame.pack(fill=tk.X)
         
-        # Export CSV button
-        ttk.Button(
+        # Export button; becomes "Cancel Export" while an export runs
+        self.export_button = ttk.Button(
             action_frame,
-            text="Export CSV",
+            text="Export",
             style="Secondary.TButton",
             command=self.export_transactions,
             width=15  # Slightly narrower
-        ).pack(side=tk.LEFT, padx=(0, 5))
+        )
+        self.export_button.pack(side=tk.LEFT, padx=(0, 5))
         
         # Add Transaction button
         ttk.Button(
@@ -237,6 +363,61 @@ class FinancialTracker:
             width=15  # Slightly narrower
         ).pack(side=tk.RIGHT, padx=(5, 0))
 
+        # Import frame, below the action buttons
+        import_frame = ttk.Frame(buttons_container, style="Main.TFrame")
+        import_frame.pack(fill=tk.X, pady=(10, 0))
+
+        # Import Statement button
+        self.import_button = ttk.Button(
+            import_frame,
+            text="Import Statement",
+            style="Secondary.TButton",
+            command=self.import_statement,
+            width=15  # Slightly narrower
+        )
+        self.import_button.pack(side=tk.LEFT, padx=(0, 5))
+
+        # Limits button
+        ttk.Button(
+            import_frame,
+            text="Limits",
+            style="Secondary.TButton",
+            command=self.edit_limits,
+            width=8
+        ).pack(side=tk.RIGHT, padx=(5, 0))
+
+        # History button
+        ttk.Button(
+            import_frame,
+            text="History",
+            style="Secondary.TButton",
+            command=self.show_history,
+            width=10
+        ).pack(side=tk.RIGHT, padx=(5, 0))
+
+        # Import progress text
+        self.status_var = tk.StringVar()
+        ttk.Label(
+            import_frame,
+            textvariable=self.status_var,
+            style="Label.TLabel"
+        ).pack(side=tk.LEFT, fill=tk.X)
+
+    def create_date_entry(self):
+        """Build the calendar date picker once the window is showing"""
+        from tkcalendar import DateEntry
+
+        self.date_entry = DateEntry(
+            self.date_frame,
+            width=30,
+            background=Colors.PRIMARY,
+            foreground=Colors.BACKGROUND,
+            borderwidth=0,
+            date_pattern='mm/dd/yyyy'
+        )
+        self.date_entry.pack(fill=tk.X)
+        self.date_entry.bind("<<DateEntrySelected>>", self._update_limit_status)
+
     def create_keypad(self, parent):
         keys = [['1', '2', '3'], ['4', '5', '6'], ['7', '8', '9'], ['0', '.', 'Del']]
         for i, row in enumerate(keys):
@@ -259,8 +440,14 @@ class FinancialTracker:
             if self.amount_entry.get() == self.amount_entry.placeholder:
                 self.amount_entry.delete(0, tk.END)
             self.amount_entry.insert(tk.END, key)
+        self._update_limit_status()
 
     def save_transaction(self):
+        if not self._ledger_ready():
+            return
+
+        import pandas as pd
+
         try:
             # Get values and validate
             amount = self.amount_entry.get()
@@ -289,266 +476,856 @@ class FinancialTracker:
                 'Description': [description]
             })
 
-            # If file exists, append; if not, create new
-            if os.path.exists(self.transactions_file):
-                new_transaction.to_csv(self.transactions_file, mode='a', header=False, index=False)
-            else:
-                new_transaction.to_csv(self.transactions_file, index=False)
-            
-            # Reload transactions
-            self.load_transactions()
+            if self._is_duplicate(new_transaction) and not messagebox.askyesno(
+                "Possible duplicate",
+                f"A {category} transaction of BDT {amount:,.2f} on {date} with this description "
+                "is already saved.\nSave it again?"
+            ):
+                return
+
+            # Append to the ledger file and the in-memory frame
+            exceeded = self.append_transactions(new_transaction)
             
             # Clear entries
             self.clear_entries()
             
-            messagebox.showinfo("Success", "Transaction saved successfully!")
+            if exceeded:
+                messagebox.showwarning(
+                    "Over budget",
+                    "Transaction saved, but this month is now over budget:\n"
+                    + "\n".join(self._describe_limit(status) for status in exceeded)
+                )
+            else:
+                messagebox.showinfo("Success", "Transaction saved successfully!")
             
         except ValueError as e:
             messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save transaction: {str(e)}")
 
+    def import_statement(self):
+        """Stream a bank statement into the ledger on a background thread"""
+        if not self._ledger_ready():
+            return
+
+        from importer import ImportJob
+
+        filename = filedialog.askopenfilename(
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Import Statement"
+        )
+        if not filename:
+            return
+        self.import_button.state(["disabled"])
+        self.status_var.set("Importing...")
+        self._import_job = ImportJob(
+            filename, self.transactions_file,
+            categorizer=self.categorizer, fingerprints_file=self.fingerprints_file
+        ).start()
+        self.root.after(200, self._poll_import)
+
+    def _poll_import(self):
+        status = self._import_job.poll()
+        self.status_var.set(f"{status.rows_read:,} rows ({status.rows_per_second:,.0f}/s)")
+        if not status.done:
+            self.root.after(200, self._poll_import)
+            return
+
+        self.import_button.state(["!disabled"])
+        self.status_var.set("")
+        # The import appended straight to the ledger, so pick up its rows
+        self.refresh_transactions()
+        if status.error is not None:
+            messagebox.showerror("Error", f"Import stopped: {str(status.error)}")
+        else:
+            messagebox.showinfo(
+                "Success",
+                f"Imported {status.rows_imported:,} transactions "
+                f"({status.rows_rejected:,} rows skipped, {status.rows_duplicate:,} already in the ledger)"
+            )
+
     def clear_entries(self):
         """Clear all input fields"""
         self.amount_entry.delete(0, tk.END)
         self.amount_entry._add_placeholder()
         
         self.category_combobox.set("Select category")
+        self._category_suggested = False
         
         self.description_entry.delete(0, tk.END)
         self.description_entry._add_placeholder()
         
         # Reset date to current date
         self.date_entry.set_date(datetime.now())
+        self._update_limit_status()
 
-    def load_transactions(self):
-        """Load transactions and ensure proper data types"""
-        try:
-            if os.path.exists(self.transactions_file):
-                self.transactions = pd.read_csv(self.transactions_file)
-                
-                # Convert Date to datetime
-                self.transactions['Date'] = pd.to_datetime(self.transactions['Date'])
-                
-                # Ensure Amount is numeric
-                self.transactions['Amount'] = pd.to_numeric(self.transactions['Amount'], errors='coerce')
-                
-                # Fill NaN values in Description
-                self.transactions['Description'] = self.transactions['Description'].fillna('')
-                
-                # Drop rows with NaN in critical columns
-                self.transactions = self.transactions.dropna(subset=['Date', 'Amount', 'Category'])
-            else:
-                self.transactions = pd.DataFrame(columns=['Date', 'Amount', 'Category', 'Description'])
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load transactions: {str(e)}")
-            self.transactions = pd.DataFrame(columns=['Date', 'Amount', 'Category', 'Description'])
+    def append_transactions(self, new_rows):
+        """Append rows to the ledger and the in-memory store without a full reload.
 
-    def export_transactions(self):
-        """Export transactions to a new CSV file"""
-        if not os.path.exists(self.transactions_file) or self.transactions.empty:
-            messagebox.showerror("Error", "No transactions to export")
+        Returns the statuses of monthly limits the new rows went over.
+        """
+        external_change = self.storage.signature() != self._ledger_signature
+        with span("storage.append", rows=len(new_rows)):
+            self.storage.append(new_rows)
+
+        if self._ledger_position is not None:
+            # Read back what was appended since we last looked: our rows, and
+            # any other instances committed along with them
+            self.refresh_transactions()
+            return self._exceeded_limits(new_rows)
+        if external_change:
+            # Someone else touched the ledger; our store can't be patched in place
+            self.load_transactions()
+            return self._exceeded_limits(new_rows)
+
+        exceeded = self._fold_in(self._digest(new_rows))
+        self._ledger_signature = self.storage.signature()
+        self._save_derived()
+        self._ledger_changed()
+        return exceeded
+
+    @staticmethod
+    def _digest(rows):
+        """Parse new ledger rows into a store, rollup and fingerprints; safe to call off the Tk thread"""
+        from fingerprints import store_fingerprints
+        from rollup import MonthlyRollup
+        from transaction_store import TransactionStore
+
+        added = TransactionStore.from_frame(rows)
+        return added, MonthlyRollup.from_view(added.view()), store_fingerprints(added)
+
+    def _fold_in(self, digest):
+        """Fold a _digest of new rows into the store and what derives from it.
+
+        Each structure takes the new rows in one grouped step. Returns the
+        statuses of monthly limits they went over.
+        """
+        added, rollup, hashes = digest
+        if not len(added):
+            return []
+        self.store.extend_store(added)
+        self.rollup.merge(rollup)
+        self.fingerprints.add(hashes)
+        return self.limits.add_rollup(rollup)
+
+    def _is_duplicate(self, rows):
+        """True if any of rows is already in the ledger"""
+        from fingerprints import frame_fingerprints
+
+        self.refresh_transactions()
+        return bool(self.fingerprints.duplicates(frame_fingerprints(rows)).any())
+
+    def _exceeded_limits(self, rows):
+        """Limits that are over budget in the months and categories of rows"""
+        import pandas as pd
+
+        exceeded = {}
+        months = pd.to_datetime(rows['Date']).dt.strftime('%Y-%m')
+        for month, category in set(zip(months, rows['Category'])):
+            for status in self.limits.status(month, category):
+                if status.exceeded:
+                    exceeded[(status.month, status.category)] = status
+        return list(exceeded.values())
+
+    @staticmethod
+    def _describe_limit(status):
+        name = status.category or "Overall"
+        if status.exceeded:
+            return f"{name}: over by BDT {-status.remaining:,.2f} ({status.month})"
+        return f"{name}: BDT {status.remaining:,.2f} left"
+
+    def _category_selected(self, event=None):
+        """A category picked by hand is never replaced by a suggestion"""
+        self._category_suggested = False
+        self._update_limit_status()
+
+    def _suggest_category(self, event=None):
+        """Fill in the category from the description as it is typed"""
+        if self.categorizer is None:
             return
-            
+        if not self._category_suggested and self.category_var.get() in CATEGORIES:
+            return  # The user chose one
+        description = self.description_entry.get()
+        if description == self.description_entry.placeholder:
+            description = ""
+        category = self.categorizer.categorize(description)
+        if category is not None:
+            self.category_combobox.set(category)
+            self._category_suggested = True
+        elif self._category_suggested:
+            # The text that suggested it is gone
+            self.category_combobox.set("Select category")
+            self._category_suggested = False
+        else:
+            return
+        self._update_limit_status()
+
+    def _update_limit_status(self, event=None):
+        """Show what is left of this month's limits as the entry form changes"""
+        if self.limits is None:
+            return
+        category = self.category_var.get()
+        date = self.date_entry.get_date() if self.date_entry is not None else datetime.now()
         try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv")],
-                title="Export Transactions"
+            pending = float(self.amount_entry.get())
+        except ValueError:
+            pending = 0.0
+        statuses = self.limits.status(
+            date.strftime('%Y-%m'), category if category in CATEGORIES else None, pending
+        )
+        self.limit_var.set("   ".join(self._describe_limit(status) for status in statuses))
+        over = any(status.exceeded for status in statuses)
+        self.limit_label.configure(style="Warning.TLabel" if over else "Hint.TLabel")
+
+    def edit_limits(self):
+        """Dialog for the overall and per-category monthly limits"""
+        if not self._ledger_ready():
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Monthly Limits")
+        dialog.configure(bg=Colors.BACKGROUND)
+        dialog.transient(self.root)
+        frame = ttk.Frame(dialog, style="Main.TFrame")
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        ttk.Label(frame, text="Leave blank for no limit", style="Hint.TLabel").grid(
+            row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 10)
+        )
+
+        entries = {}
+        current = [(None, self.limits.overall)] + [
+            (category, self.limits.categories.get(category)) for category in CATEGORIES
+        ]
+        for row, (category, limit) in enumerate(current, start=1):
+            ttk.Label(frame, text=category or "Overall", style="Label.TLabel").grid(
+                row=row, column=0, sticky=tk.W, padx=(0, 10)
             )
-            if filename:
-                self.transactions.to_csv(filename, index=False)
-                messagebox.showinfo("Success", f"Transactions exported to {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export: {str(e)}")
+            entry = ttk.Entry(frame, style="Input.TEntry", width=15)
+            if limit is not None:
+                entry.insert(0, f"{limit:g}")
+            entry.grid(row=row, column=1, pady=2)
+            entries[category] = entry
 
-    def show_spending_chart(self):
-        """Show spending chart with error handling"""
-        if self.transactions.empty:
-            messagebox.showerror("Error", "No transactions recorded")
+        def save():
+            limits = {}
+            try:
+                for category, entry in entries.items():
+                    text = entry.get().strip()
+                    if text:
+                        limits[category] = float(text)
+                        if limits[category] <= 0:
+                            raise ValueError(f"{category or 'Overall'} limit must be positive")
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=dialog)
+                return
+            self.limits.overall = limits.pop(None, None)
+            self.limits.categories = limits
+            try:
+                self.limits.save(self.limits_file)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to save limits: {str(e)}", parent=dialog)
+                return
+            self._update_limit_status()
+            dialog.destroy()
+
+        ttk.Button(frame, text="Save", style="Secondary.TButton", command=save, width=10).grid(
+            row=len(current) + 1, column=1, sticky=tk.E, pady=(10, 0)
+        )
+
+    def show_history(self):
+        """Open the scrollable transaction history"""
+        if not self._ledger_ready():
             return
-            
-        try:
-            # Calculate category totals
-            category_totals = self.transactions.groupby('Category')['Amount'].sum()
-            
-            if category_totals.empty or category_totals.isna().all():
-                messagebox.showerror("Error", "No valid data to plot")
+        self.refresh_transactions()
+        if self.history is not None and self.history.winfo_exists():
+            self.history.winfo_toplevel().lift()
+            return
+
+        from history_view import HistoryView
+
+        window = tk.Toplevel(self.root)
+        window.title("Transaction History")
+        window.geometry("520x600")
+        window.configure(bg=Colors.BACKGROUND)
+        ttk.Label(
+            window,
+            text="Click a heading to sort. Double-click a row to edit it, Delete removes it.",
+            style="Label.TLabel"
+        ).pack(side=tk.BOTTOM, anchor=tk.W, padx=10, pady=(0, 10))
+        self.history = HistoryView(
+            window,
+            lambda: self.store,
+            on_edit=self.edit_transaction,
+            on_delete=self.delete_transaction
+        )
+        self.history.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.history.refresh()
+
+    def _refresh_history(self):
+        if self.history is not None and self.history.winfo_exists():
+            self.history.refresh()
+
+    def edit_transaction(self, row):
+        """Edit one ledger row in a small dialog"""
+        from tkcalendar import DateEntry
+        from transaction_store import Transaction
+
+        # The row number only means something for this store and this transaction
+        opened = (self.store, self.store[row])
+        transaction = opened[1]
+        dialog = tk.Toplevel(self.history.winfo_toplevel())
+        dialog.title("Edit Transaction")
+        dialog.configure(bg=Colors.BACKGROUND)
+        dialog.transient(self.history.winfo_toplevel())
+        frame = ttk.Frame(dialog, style="Main.TFrame")
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+
+        ttk.Label(frame, text="Amount", style="Label.TLabel").pack(anchor=tk.W)
+        amount_entry = ttk.Entry(frame, style="Input.TEntry")
+        amount_entry.insert(0, f"{transaction.amount:g}")
+        amount_entry.pack(fill=tk.X, pady=(5, 10))
+
+        ttk.Label(frame, text="Category", style="Label.TLabel").pack(anchor=tk.W)
+        category_var = tk.StringVar(value=transaction.category)
+        ttk.Combobox(
+            frame, textvariable=category_var, values=CATEGORIES, state="readonly"
+        ).pack(fill=tk.X, pady=(5, 10))
+
+        ttk.Label(frame, text="Description", style="Label.TLabel").pack(anchor=tk.W)
+        description_entry = ttk.Entry(frame, style="Input.TEntry")
+        description_entry.insert(0, transaction.description)
+        description_entry.pack(fill=tk.X, pady=(5, 10))
+
+        ttk.Label(frame, text="Date", style="Label.TLabel").pack(anchor=tk.W)
+        date_entry = DateEntry(
+            frame,
+            width=30,
+            background=Colors.PRIMARY,
+            foreground=Colors.BACKGROUND,
+            borderwidth=0,
+            date_pattern='mm/dd/yyyy'
+        )
+        date_entry.set_date(transaction.date)
+        date_entry.pack(fill=tk.X, pady=(5, 15))
+
+        def save():
+            try:
+                amount = float(amount_entry.get())
+                if amount <= 0:
+                    raise ValueError("Amount must be positive")
+                date = date_entry.get_date()
+                self.update_transaction(row, Transaction(
+                    amount=amount,
+                    category=category_var.get(),
+                    description=description_entry.get(),
+                    note=transaction.note,
+                    date=datetime(date.year, date.month, date.day)
+                ), opened)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=dialog)
                 return
-                
-            category_totals = category_totals.sort_values(ascending=False)
-            
-            # Create figure with larger size and better resolution
-            plt.close('all')  # Close any existing plots
-            plt.figure(figsize=(10, 6), dpi=100)
-            ax = plt.gca()
-            
-            # Create bars with better colors
-            bars = ax.bar(
-                range(len(category_totals)),
-                category_totals.values,
-                color='#2563eb',
-                alpha=0.7
-            )
-            
-            # Customize the chart
-            plt.title("Spending by Category", pad=20, fontsize=14, fontweight='bold')
-            plt.xlabel("Categories", labelpad=10, fontsize=12)
-            plt.ylabel("Amount (BDT)", labelpad=10, fontsize=12)
-            
-            # Set x-axis labels
-            plt.xticks(
-                range(len(category_totals)),
-                category_totals.index,
-                rotation=45,
-                ha='right'
-            )
-            
-            # Add value labels on top of bars
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(
-                    bar.get_x() + bar.get_width()/2.,
-                    height,
-                    f'BDT {height:,.2f}',
-                    ha='center',
-                    va='bottom',
-                    fontsize=10
-                )
-            
-            # Add grid for better readability
-            ax.grid(True, axis='y', linestyle='--', alpha=0.3)
-            
-            # Adjust layout
-            plt.tight_layout()
-            
-            self.show_chart_window(plt.gcf(), "Spending by Category")
-            
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save transaction: {str(e)}", parent=dialog)
+                return
+            dialog.destroy()
+
+        def delete():
+            if self.delete_transaction(row, opened):
+                dialog.destroy()
+
+        buttons = ttk.Frame(frame, style="Main.TFrame")
+        buttons.pack(fill=tk.X)
+        ttk.Button(buttons, text="Save", style="Secondary.TButton", command=save, width=10).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Delete", style="Secondary.TButton", command=delete, width=10).pack(side=tk.LEFT)
+
+    def update_transaction(self, row, transaction, opened=None):
+        """Overwrite one ledger row and write the ledger back.
+
+        opened is (store, Transaction) as they were when the edit began.
+        """
+        self._change_store(lambda store: store.update(row, transaction), row, opened or (self.store, self.store[row]))
+
+    def delete_transaction(self, row, opened=None):
+        """Delete one ledger row after confirmation; returns True if it was deleted"""
+        opened = opened or (self.store, self.store[row])
+        parent = self.history.winfo_toplevel() if self.history is not None else self.root
+        if not messagebox.askyesno("Delete", "Delete this transaction?", parent=parent):
+            return False
+        try:
+            self._change_store(lambda store: store.delete([row]), row, opened)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to create chart: {str(e)}")
-            plt.close('all')
+            messagebox.showerror("Error", f"Failed to delete transaction: {str(e)}", parent=parent)
+            return False
+        return True
 
-    def show_monthly_trends_chart(self):
-        """Show monthly trends chart with error handling"""
-        if self.transactions.empty:
-            messagebox.showerror("Error", "No transactions recorded")
+    def _change_store(self, change, row, opened):
+        """Edit a copy of the store and rewrite the ledger from it, then swap it in with what derives from it.
+
+        opened is (store, Transaction) as they were when the user picked the
+        row; the change is refused if the store was reloaded or the row has
+        changed since, as the row number may now point at another transaction.
+        """
+        from fingerprints import FingerprintIndex
+        from rollup import MonthlyRollup
+        from storage import LedgerConflict
+
+        store, transaction = opened
+        if store is not self.store or row >= len(store) or store[row] != transaction:
+            raise ValueError("The transaction changed while it was open; please try again")
+        if self.storage.signature() != self._ledger_signature:
+            # Row numbers refer to the ledger as we loaded it
+            self.load_transactions()
+            raise ValueError("The ledger changed on disk and was reloaded; please try again")
+        # Our store only changes once the ledger on disk has
+        changed = self.store.copy()
+        change(changed)
+        try:
+            with self.storage.writing():
+                # Only if nobody else wrote in the meantime, or their rows would be lost
+                with span("storage.replace", rows=len(changed)):
+                    self.storage.replace(changed.to_frame(), expected=self._ledger_signature)
+                self._ledger_signature = self.storage.signature()
+                self._ledger_position = self.storage.position()
+        except LedgerConflict:
+            self.load_transactions()
+            raise ValueError("The ledger changed on disk and was reloaded; please try again") from None
+        self.store = changed
+        with span("rollup.build"):
+            self.rollup = MonthlyRollup.from_view(self.store.view())
+        self.limits.rebuild(self.rollup)
+        with span("fingerprints.build", rows=len(self.store)):
+            self.fingerprints = FingerprintIndex.from_store(self.store)
+        self._save_derived()
+        self._ledger_changed()
+
+    def _ledger_changed(self):
+        """Invalidate cached reports and refresh the views of the ledger"""
+        self.ledger_version += 1
+        self.report_cache.clear()
+        self._refresh_history()
+        self._update_limit_status()
+
+    def _save_derived(self):
+        """Save the rollup and fingerprints against the current ledger signature"""
+        self._save_rollup(self.rollup, self._ledger_signature)
+        self._save_fingerprints(self.fingerprints, self._ledger_signature)
+
+    def _save_rollup(self, rollup, signature):
+        if self.storage.stable_signature and signature is not None:
+            try:
+                rollup.save(self.rollup_file, signature)
+            except OSError:
+                pass  # The rollup is only a cache; it will be rebuilt next time
+
+    def _save_fingerprints(self, fingerprints, signature):
+        if self.storage.stable_signature and signature is not None:
+            try:
+                fingerprints.save(self.fingerprints_file, signature)
+            except OSError:
+                pass  # Rebuilt from the ledger next time
+
+    def refresh_transactions(self, force=False):
+        """Catch up with changes to the ledger on disk.
+
+        Rows appended since we last read it are read on their own and folded
+        in; anything else, or force, reloads the whole ledger.
+        """
+        if self.storage is None:
             return
-            
+        if force:
+            self.load_transactions()
+            return
+        if self.storage.signature() == self._ledger_signature:
+            return
+        appended = self._read_appended(self._ledger_position)
+        if appended is None:
+            self.load_transactions()
+        else:
+            self._apply_appended(appended)
+
+    def _read_appended(self, position):
+        """(digest of the rows appended since position, new position, signature).
+
+        None if the ledger changed some other way. Safe to call off the Tk thread.
+        """
+        with self.storage.reading():
+            appended = self.storage.read_appended(position)
+            signature = self.storage.signature()
+        if appended is None:
+            return None
+        rows, position = appended
+        return self._digest(rows), position, signature
+
+    def _apply_appended(self, appended):
+        """Fold in what _read_appended returned"""
+        digest, self._ledger_position, self._ledger_signature = appended
+        self._fold_in(digest)
+        self._save_derived()
+        self._ledger_changed()
+
+    def _watch_ledger(self):
+        """Pick up what other instances and scripts write to the ledger.
+
+        New rows are read, parsed and aggregated on a background thread; the
+        Tk thread only folds the result in.
+        """
+        if self.store is not None and not self._watching:
+            self._watching = True
+            results = queue.Queue()
+            signature, position = self._ledger_signature, self._ledger_position
+
+            def read():
+                try:
+                    if self.storage.signature() == signature:
+                        results.put(None)
+                        return
+                    appended = self._read_appended(position)
+                    if appended is None:
+                        results.put((self._read_ledger(), None))
+                    else:
+                        results.put((None, appended))
+                except Exception as e:
+                    results.put(e)
+
+            threading.Thread(target=read, daemon=True).start()
+            self.root.after(50, self._poll_watch, results, self.ledger_version)
+        self.root.after(self.WATCH_INTERVAL, self._watch_ledger)
+
+    def _poll_watch(self, results, version):
         try:
-            plt.close('all')  # Close any existing plots
-            
-            # Create figure with better size ratio
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 12), height_ratios=[1, 1.5])
-            fig.suptitle("Monthly Financial Analysis", fontsize=16, fontweight='bold', y=0.95)
-            
-            # Monthly total spending trend
-            monthly_totals = self.transactions.groupby(
-                self.transactions['Date'].dt.strftime('%Y-%m')
-            )['Amount'].sum()
-            
-            if monthly_totals.empty or monthly_totals.isna().all():
-                messagebox.showerror("Error", "No valid monthly data to plot")
-                plt.close('all')
+            result = results.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self._poll_watch, results, version)
+            return
+        self._watching = False
+        if isinstance(result, Exception):
+            self.status_var.set(f"Couldn't refresh transactions: {result}")
+        elif result is not None and version == self.ledger_version:
+            # Otherwise our copy changed while this was read; the next check catches up
+            ledger, appended = result
+            if ledger is not None:
+                self._apply_ledger(*ledger)
+            else:
+                self._apply_appended(appended)
+
+    def load_transactions(self):
+        """Load transactions and ensure proper data types"""
+        self._apply_ledger(*self._read_ledger())
+
+    def _read_ledger(self):
+        """Read the typed ledger and its rollup; safe to call off the Tk thread"""
+        from budget_limits import BudgetLimits
+        from fingerprints import FingerprintIndex
+        from rollup import MonthlyRollup
+        from transaction_store import TransactionStore
+
+        error = None
+        store = TransactionStore()
+        # Hold off writers so the signature and position describe what was loaded
+        with self.storage.reading():
+            signature = self.storage.signature()
+            position = None
+            try:
+                if self.storage.exists():
+                    # The columnar store parses dates/amounts and drops incomplete
+                    # rows; CSV ledgers come from the binary snapshot when it's fresh
+                    with span("ledger.load_store"):
+                        store, position = self.storage.load_store_and_position()
+            except Exception as e:
+                error = e
+
+        # Use the saved month x category rollup if it matches the ledger, else rebuild it
+        rollup = None
+        if self.storage.stable_signature:
+            rollup = MonthlyRollup.load(self.rollup_file, signature)
+        if rollup is None:
+            with span("rollup.build"):
+                rollup = MonthlyRollup.from_view(store.view())
+            self._save_rollup(rollup, signature)
+
+        # Running monthly totals behind the limit checks
+        limits = BudgetLimits.load(self.limits_file)
+        limits.rebuild(rollup)
+
+        # Fingerprints of every row, for catching duplicates on save and import
+        fingerprints = None
+        if self.storage.stable_signature:
+            fingerprints = FingerprintIndex.load(self.fingerprints_file, signature)
+        if fingerprints is None:
+            with span("fingerprints.build", rows=len(store)):
+                fingerprints = FingerprintIndex.from_store(store)
+            self._save_fingerprints(fingerprints, signature)
+        return store, signature, position, rollup, limits, fingerprints, error
+
+    def _apply_ledger(self, store, signature, position, rollup, limits, fingerprints, error):
+        self.store = store
+        self._ledger_signature = signature
+        self._ledger_position = position
+        self.rollup = rollup
+        self.limits = limits
+        self.fingerprints = fingerprints
+        self._ledger_changed()
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to load transactions: {str(error)}")
+
+    def query(self, start=None, end=None, categories=None, min_amount=None, max_amount=None):
+        """Filtered, date-ordered view of the ledger (see TransactionStore.query)"""
+        self.refresh_transactions()
+        return self.store.query(start, end, categories, min_amount, max_amount)
+
+    def export_transactions(self, view=None):
+        """Export transactions, or just those in a query view, on a background thread.
+
+        Pressed again while an export runs, the button cancels it.
+        """
+        if self._export_job is not None:
+            self._export_job.cancel()
+            return
+        if not self._ledger_ready():
+            return
+        self.refresh_transactions()
+        if view is not None:
+            if len(view) == 0:
+                messagebox.showerror("Error", "No transactions match the filter")
                 return
-            
-            # Plot line chart for monthly totals
-            ax1.plot(
-                range(len(monthly_totals)),
-                monthly_totals.values,
-                marker='o',
-                linewidth=2,
-                color='#2563eb'
-            )
-            
-            # Customize first subplot
-            ax1.set_title("Monthly Spending Trend", pad=20, fontsize=12)
-            ax1.set_xlabel("Month", labelpad=10)
-            ax1.set_ylabel("Total Amount (BDT)", labelpad=10)
-            ax1.grid(True, linestyle='--', alpha=0.3)
-            
-            # Set x-axis labels for first subplot
-            ax1.set_xticks(range(len(monthly_totals)))
-            ax1.set_xticklabels(monthly_totals.index, rotation=45, ha='right')
-            
-            # Add value labels on points
-            for i, v in enumerate(monthly_totals):
-                ax1.text(i, v, f'BDT {v:,.2f}', ha='center', va='bottom')
-            
-            # Category-wise monthly breakdown
-            monthly_category = self.transactions.pivot_table(
-                index=self.transactions['Date'].dt.strftime('%Y-%m'),
-                columns='Category',
-                values='Amount',
-                aggfunc='sum',
-                fill_value=0
-            )
-            
-            if not monthly_category.empty:
-                monthly_category.plot(
-                    kind='bar',
-                    stacked=True,
-                    ax=ax2,
-                    width=0.8,
-                    alpha=0.7
-                )
-                
-                ax2.set_title("Monthly Category Breakdown", pad=20, fontsize=12)
-                ax2.set_xlabel("Month", labelpad=10)
-                ax2.set_ylabel("Amount (BDT)", labelpad=10)
-                ax2.grid(True, axis='y', linestyle='--', alpha=0.3)
-                ax2.legend(title="Categories", bbox_to_anchor=(1.05, 1), loc='upper left')
-            
-            # Adjust layout to prevent text cutoff
-            plt.tight_layout()
-            
-            # Show in new window with specific size
-            window = tk.Toplevel(self.root)
-            window.title("Monthly Financial Analysis")
-            window.geometry("1200x900")  # Larger window size
-            
-            canvas = FigureCanvasTkAgg(fig, master=window)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create chart: {str(e)}")
-            plt.close('all')
+        elif not self.storage.exists() or len(self.store) == 0:
+            messagebox.showerror("Error", "No transactions to export")
+            return
+
+        from exporter import FILETYPES, ExportJob, export_format
 
-    def show_chart_window(self, fig, title):
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=FILETYPES,
+            title="Export Transactions"
+        )
+        if not filename:
+            return
+        try:
+            export_format(filename)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self._export_job = ExportJob(self.store.view() if view is None else view, filename).start()
+        self.export_button.configure(text="Cancel Export")
+        self.status_var.set("Exporting...")
+        self.root.after(200, self._poll_export, filename)
+
+    def _poll_export(self, filename):
+        status = self._export_job.poll()
+        self.status_var.set(f"Exporting {status.fraction:.0%} ({status.rows_written:,} rows)")
+        if not status.done:
+            self.root.after(200, self._poll_export, filename)
+            return
+
+        self._export_job = None
+        self.export_button.configure(text="Export")
+        self.status_var.set("")
+        if status.error is not None:
+            messagebox.showerror("Error", f"Failed to export: {str(status.error)}")
+        elif not status.cancelled:
+            messagebox.showinfo("Success", f"{status.rows_written:,} transactions exported to {filename}")
+
+    def show_spending_chart(self, view=None):
+        """Show spending chart with error handling; view limits it to a query result"""
+        if not self._ledger_ready():
+            return
+        self.refresh_transactions()
+        if view is not None and len(view) == 0:
+            messagebox.showerror("Error", "No transactions match the filter")
+            return
+        if view is None and not len(self.store):
+            messagebox.showerror("Error", "No transactions recorded")
+            return
+
+        self._start_report(
+            reports.spending_data,
+            reports.build_spending_figure,
+            "Spending by Category",
+            window_size=(1000, 800),
+            view=view
+        )
+
+    def show_monthly_trends_chart(self, view=None):
+        """Show monthly trends chart with error handling; view limits it to a query result"""
+        if not self._ledger_ready():
+            return
+        self.refresh_transactions()
+        if view is not None and len(view) == 0:
+            messagebox.showerror("Error", "No transactions match the filter")
+            return
+        if view is None and not len(self.store):
+            messagebox.showerror("Error", "No transactions recorded")
+            return
+
+        if view is None:
+            previous = self._trend_analysis
+
+            def aggregate(source):
+                return reports.monthly_data(source, previous)
+
+            def keep_analysis(data):
+                self._trend_analysis = data.analysis
+        else:
+            aggregate = reports.monthly_data
+            keep_analysis = None
+
+        self._start_report(
+            aggregate,
+            reports.build_monthly_figure,
+            "Monthly Financial Analysis",
+            window_size=(1200, 900),
+            view=view,
+            on_data=keep_analysis
+        )
+
+    def _start_report(self, aggregate, build, title, window_size, view=None, on_data=None):
+        """Aggregate, build and rasterize a report on the worker thread, then show it.
+
+        on_data, if given, gets the aggregated data on the Tk thread, and
+        only if the job was not cancelled or superseded.
+        """
+        # Room left for the image once the toolbar and padding are drawn
+        width, height = window_size
+        image_size = (width - 20, height - 70)
+
+        # Reuse an earlier render of the same report over the same ledger version
+        cache = self.report_cache
+        if view is not None and view.key is None:
+            data_key = render_key = None  # Nothing to identify this selection by
+        else:
+            data_key = (self.ledger_version, title, None if view is None else view.key)
+            render_key = data_key + (image_size,)
+        cached = cache.get(render_key) if render_key is not None else None
+        if cached is not None:
+            self.report_worker.cancel()
+            self.show_chart_window(*cached, title, window_size, cache_key=render_key)
+            return
+
+        if view is not None:
+            # Views never change once made, so the worker can read it directly
+            def collect():
+                return aggregate(view)
+        elif self.storage.aggregates_natively:
+            # Give the worker its own connection rather than sharing ours
+            path = self.storage.path
+
+            def collect():
+                from storage import open_storage
+
+                storage = open_storage(path)
+                try:
+                    return aggregate(storage)
+                finally:
+                    storage.close()
+        else:
+            snapshot = self.rollup.copy()
+
+            def collect():
+                return aggregate(snapshot)
+
+        def job(cancelled):
+            data = cache.get(data_key) if data_key is not None else None
+            if data is None:
+                with span("report.aggregate", report=title):
+                    data = collect()
+                if data_key is not None:
+                    cache.put(data_key, data, AGGREGATE_BYTES)
+            if cancelled():
+                raise ReportCancelled()
+            with span("report.build", report=title):
+                fig = build(data)
+            if cancelled():
+                raise ReportCancelled()
+            with span("report.draw", report=title):
+                image = render_png(fig, *image_size)
+            if render_key is not None:
+                cache.put(render_key, (fig, image), FIGURE_BYTES + len(image))
+            return data, fig, image
+
+        def done(result):
+            data, fig, image = result
+            if on_data is not None:
+                on_data(data)
+            self.show_chart_window(fig, image, title, window_size, cache_key=render_key)
+
+        self.report_worker.submit(job, done, self._report_failed)
+
+    def _report_failed(self, error):
+        if isinstance(error, ValueError):
+            messagebox.showerror("Error", str(error))
+        else:
+            messagebox.showerror("Error", f"Failed to create chart: {str(error)}")
+
+    def _set_busy(self, busy):
+        """Show or hide the busy indicator while a report renders"""
+        if busy:
+            self.busy_bar.pack(fill=tk.X, pady=(0, 10), before=self.report_frame)
+            self.busy_bar.start(10)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+
+    def show_chart_window(self, fig, image, title, window_size=(1000, 800), cache_key=None):
         # Create a new window for the chart
         window = tk.Toplevel(self.root)
         window.title(title)
-        window.geometry("1000x800")  # Larger window for better visibility
-        
+        window.geometry("{}x{}".format(*window_size))
+
         # Create toolbar frame
         toolbar_frame = ttk.Frame(window)
         toolbar_frame.pack(fill=tk.X, padx=5, pady=5)
-        
+
         # Add export button
         ttk.Button(
             toolbar_frame,
             text="Export Chart",
             style="Secondary.TButton",
-            command=lambda: self.export_chart(fig)
+            command=lambda: self.export_chart(fig, cache_key)
         ).pack(side=tk.RIGHT)
-        
-        # Create canvas
-        canvas = FigureCanvasTkAgg(fig, master=window)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-    def export_chart(self, fig):
+        # Show the image the worker already rendered; keep a reference so Tk doesn't drop it
+        photo = tk.PhotoImage(master=window, data=image)
+        label = ttk.Label(window, image=photo)
+        label.image = photo
+        label.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    def export_chart(self, fig, cache_key=None):
         filename = filedialog.asksaveasfilename(
             defaultextension=".png",
             filetypes=[("PNG files", "*.png"), ("All files", "*.*")],
             title="Export Chart"
         )
-        if filename:
+        if not filename:
+            return
+        if not filename.lower().endswith(".png"):
             fig.savefig(filename, dpi=300, bbox_inches='tight')
-            messagebox.showinfo("Success", "Chart exported successfully!")
+        else:
+            # The 300 dpi render is slow; keep it for repeat exports of the same report
+            export_key = cache_key + ('export', 300) if cache_key is not None else None
+            image = self.report_cache.get(export_key) if export_key is not None else None
+            if image is None:
+                import io
+
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
+                image = buffer.getvalue()
+                if export_key is not None:
+                    self.report_cache.put(export_key, image, len(image))
+            with open(filename, "wb") as f:
+                f.write(image)
+        messagebox.showinfo("Success", "Chart exported successfully!")
 
 
 if __name__ == "__main__":
+    import argparse
+
+    import instrumentation
+
+    parser = argparse.ArgumentParser(description="Financial Tracker")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args.metrics, args.profile)
+
     root = tk.Tk()
     app = FinancialTracker(root)
     root.mainloop()
@@ -0,0 +1,164 @@
+"""Duplicate detection for transactions being added to a ledger.
+
+A transaction's fingerprint is a 64-bit hash of its date, amount in paisa,
+category and description, ignoring case and spacing in the text. A
+FingerprintIndex counts how many ledger rows have each fingerprint: sorted
+unique hashes with their counts, plus a dict of recent additions that is
+folded in once it grows, so adding a row is O(1) amortized and a batch is
+checked with one vectorized binary search.
+
+Counting rather than just remembering fingerprints lets genuinely repeated
+transactions through: the k-th of several identical rows in a batch is a
+duplicate only if the ledger already holds more than k of them. A statement
+with two identical coffee purchases imports both the first time and neither
+when it is imported again.
+
+The index is saved next to the ledger tagged with the ledger's signature,
+like the rollup, and otherwise rebuilt from a TransactionStore, hashing each
+distinct description once rather than once per row.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from transaction_store import to_epoch_days, to_paisa
+
+FORMAT = 1
+# Recent additions kept in a dict before being merged into the sorted arrays
+MERGE_MIN = 4096
+
+
+def _hash_text(values):
+    """uint64 hash per value of case- and spacing-insensitive text"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna('').astype(str))
+    normalized = pd.Series(uniques, dtype=object).str.lower().str.split().str.join(' ')
+    return pd.util.hash_array(normalized.to_numpy(dtype=object))[codes]
+
+
+def _combine(days, paisa, category_hashes, description_hashes):
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        'date': np.asarray(days, dtype=np.int64),
+        'paisa': np.asarray(paisa, dtype=np.int64),
+        'category': category_hashes,
+        'description': description_hashes,
+    }), index=False).to_numpy()
+
+
+def frame_fingerprints(df):
+    """Fingerprint of every row of a ledger DataFrame (rows should already be valid)"""
+    days, _ = to_epoch_days(df['Date'])
+    description = df['Description'] if 'Description' in df else pd.Series('', index=df.index)
+    return _combine(
+        days,
+        to_paisa(pd.to_numeric(df['Amount'], errors='coerce').to_numpy(dtype=np.float64)),
+        _hash_text(df['Category'].to_numpy(dtype=object)),
+        _hash_text(description.to_numpy(dtype=object)),
+    )
+
+
+def store_fingerprints(store):
+    """Fingerprint of every row of a TransactionStore, hashing its interned strings once each"""
+    columns = store.columns()
+    return _combine(
+        columns['dates'],
+        columns['paisa'],
+        _hash_text(store.categories)[columns['codes']],
+        _hash_text(store.strings)[columns['description_codes']],
+    )
+
+
+class FingerprintIndex:
+    """How many ledger rows have each transaction fingerprint."""
+    def __init__(self, hashes=None, counts=None):
+        self._hashes = np.empty(0, dtype=np.uint64) if hashes is None else hashes
+        self._counts = np.empty(0, dtype=np.uint32) if counts is None else counts
+        self._recent = {}
+
+    @classmethod
+    def from_hashes(cls, hashes):
+        hashes, counts = np.unique(np.asarray(hashes, dtype=np.uint64), return_counts=True)
+        return cls(hashes, counts.astype(np.uint32))
+
+    @classmethod
+    def from_store(cls, store):
+        return cls.from_hashes(store_fingerprints(store))
+
+    def __len__(self):
+        """Number of rows indexed"""
+        return int(self._counts.sum()) + sum(self._recent.values())
+
+    def counts(self, hashes):
+        """How many indexed rows have each of the given fingerprints"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        found = np.zeros(len(hashes), dtype=np.int64)
+        if len(self._hashes):
+            positions = np.minimum(np.searchsorted(self._hashes, hashes), len(self._hashes) - 1)
+            hit = self._hashes[positions] == hashes
+            found[hit] = self._counts[positions[hit]]
+        if self._recent:
+            found += np.fromiter((self._recent.get(h, 0) for h in hashes.tolist()), np.int64, len(hashes))
+        return found
+
+    def duplicates(self, hashes):
+        """Mask of the rows with these fingerprints that are already in the ledger"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        earlier = pd.Series(hashes).groupby(hashes, sort=False).cumcount().to_numpy()
+        return earlier < self.counts(hashes)
+
+    def add(self, hashes):
+        """Count rows that were just added to the ledger"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(hashes) >= MERGE_MIN:
+            self._merge(hashes)
+            return
+        recent = self._recent
+        for h in hashes.tolist():
+            recent[h] = recent.get(h, 0) + 1
+        if len(recent) >= max(MERGE_MIN, len(self._hashes) // 8):
+            self._merge()
+
+    def _merge(self, extra=None):
+        """Fold the recent dict, and any extra hashes, into the sorted arrays"""
+        if not self._recent and extra is None:
+            return
+        recent = np.fromiter(self._recent, np.uint64, len(self._recent))
+        parts = [self._hashes, recent]
+        weights = [self._counts, np.fromiter(self._recent.values(), np.int64, len(self._recent))]
+        if extra is not None:
+            parts.append(extra)
+            weights.append(np.ones(len(extra), dtype=np.int64))
+        hashes, inverse = np.unique(np.concatenate(parts), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate(weights), minlength=len(hashes))
+        self._hashes, self._counts = hashes, counts.astype(np.uint32)
+        self._recent = {}
+
+    def save(self, path, signature):
+        """Write the index to path, tagged with the ledger signature it matches"""
+        self._merge()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                format=FORMAT,
+                signature=json.dumps(list(signature) if isinstance(signature, (list, tuple)) else signature),
+                hashes=self._hashes,
+                counts=self._counts,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, signature):
+        """Read a saved index, or None if it is missing or was built from another ledger state"""
+        try:
+            with np.load(path) as data:
+                saved = json.loads(str(data['signature']))
+                if int(data['format']) != FORMAT or signature is None or saved is None:
+                    return None
+                if (tuple(saved) if isinstance(saved, list) else saved) != (
+                        tuple(signature) if isinstance(signature, (list, tuple)) else signature):
+                    return None
+                return cls(data['hashes'], data['counts'])
+        except (OSError, ValueError, KeyError):
+            return None
@@ -0,0 +1,221 @@
+"""Scrollable transaction history that only materializes the rows on screen.
+
+A Treeview with one item per ledger row is unusable past a few hundred
+thousand rows, so ``HistoryView`` keeps a fixed pool of items (the visible
+lines plus a small buffer) and rewrites their values from the
+TransactionStore as the user scrolls. The scrollbar is driven by hand from
+the row offset rather than by the tree.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+from transaction_store import to_taka
+
+COLUMNS = ('Date', 'Category', 'Amount', 'Description')
+COLUMN_WIDTHS = {'Date': 90, 'Category': 110, 'Amount': 80, 'Description': 200}
+
+
+class HistoryView(ttk.Frame):
+    """Virtualized, sortable Treeview over a TransactionStore.
+
+    ``get_store`` returns the current store. Sort orders are computed once
+    per column with numpy and kept until ``store.version`` changes, so
+    re-sorting or scrolling never touches more than a screenful of rows.
+    ``on_edit(row)`` and ``on_delete(row)`` are called with store row numbers
+    on double-click and the Delete key.
+    """
+    BUFFER = 5
+    WHEEL_ROWS = 3
+
+    def __init__(self, parent, get_store, on_edit=None, on_delete=None, height=20, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.get_store = get_store
+        self.on_edit = on_edit
+        self.on_delete = on_delete
+        self._offset = 0
+        self._visible = height
+        self._sort = ('Date', True)  # Newest first
+        self._orderings = {}
+        self._orderings_key = None
+        self._rows = np.empty(0, dtype=np.int64)
+        self._selected_row = None
+
+        self.tree = ttk.Treeview(self, columns=COLUMNS, show='headings', height=height, selectmode='browse')
+        for column in COLUMNS:
+            self.tree.heading(column, text=column, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=COLUMN_WIDTHS[column], anchor=tk.E if column == 'Amount' else tk.W)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self._slots = []
+        self._resize_pool(height + self.BUFFER)
+
+        # Returning "break" keeps the tree's own bindings from scrolling it
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll(-self.WHEEL_ROWS if e.delta > 0 else self.WHEEL_ROWS))
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-self.WHEEL_ROWS))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(self.WHEEL_ROWS))
+        self.tree.bind('<Up>', lambda e: self._move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self._move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.scroll(-self._visible))
+        self.tree.bind('<Next>', lambda e: self.scroll(self._visible))
+        self.tree.bind('<Home>', lambda e: self.scroll_to(0))
+        self.tree.bind('<End>', lambda e: self.scroll_to(len(self._ordering())))
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<Double-1>', self._on_double_click)
+        self.tree.bind('<Delete>', self._on_delete_key)
+
+    def _resize_pool(self, size):
+        while len(self._slots) < size:
+            self._slots.append(self.tree.insert('', tk.END, values=('',) * len(COLUMNS)))
+        while len(self._slots) > size:
+            self.tree.delete(self._slots.pop())
+
+    def _on_configure(self, event):
+        # Grow or shrink the item pool to match the rows that fit on screen
+        bbox = self.tree.bbox(self._slots[0]) if self._slots else None
+        if not bbox:
+            return
+        _, top, _, row_height = bbox
+        visible = max(1, (event.height - top) // max(row_height, 1))
+        if visible != self._visible:
+            self._visible = visible
+            self._resize_pool(visible + self.BUFFER)
+            self.refresh()
+
+    def _ordering(self):
+        """Store rows in display order"""
+        store = self.get_store()
+        key = (id(store), store.version)
+        if key != self._orderings_key:
+            self._orderings = {}
+            self._orderings_key = key
+            self._selected_row = None  # Row numbers may have shifted
+        column, descending = self._sort
+        order = self._orderings.get(column)
+        if order is None:
+            order = self._orderings[column] = self._sort_order(store, column)
+        return order[::-1] if descending else order
+
+    @staticmethod
+    def _sort_order(store, column):
+        if column == 'Date':
+            return store.query().rows
+        if column == 'Amount':
+            return np.argsort(store.paisa, kind='stable')
+        if column == 'Category':
+            names, codes = store.categories, store.codes
+        else:
+            names, codes = store.strings, store.columns()['description_codes']
+        # Sort the small table of names once, then sort rows by their code's rank
+        rank = np.empty(len(names), dtype=np.int64)
+        rank[np.argsort(np.array(names, dtype=object), kind='stable')] = np.arange(len(names))
+        return np.argsort(rank[codes], kind='stable')
+
+    def sort_by(self, column):
+        """Sort by column, toggling the direction if it is already the sort column"""
+        current, descending = self._sort
+        self._sort = (column, not descending if column == current else column == 'Date')
+        for name in COLUMNS:
+            arrow = (' ▼' if self._sort[1] else ' ▲') if name == column else ''
+            self.tree.heading(name, text=name + arrow)
+        self._offset = 0
+        self.refresh()
+
+    def scroll(self, rows):
+        self.scroll_to(self._offset + rows)
+        return 'break'
+
+    def scroll_to(self, offset):
+        self._offset = offset
+        self.refresh()
+        return 'break'
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        total = len(self._ordering())
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * total))
+        elif unit == 'pages':
+            self.scroll(int(amount) * self._visible)
+        else:
+            self.scroll(int(amount))
+
+    def refresh(self):
+        """Redraw the visible window, e.g. after the store changed"""
+        store = self.get_store()
+        ordering = self._ordering()
+        total = len(ordering)
+        self._offset = max(0, min(self._offset, total - self._visible))
+        self._rows = np.asarray(ordering[self._offset:self._offset + len(self._slots)])
+
+        # Gather just this window's values from the columns
+        columns = store.columns()
+        dates = np.datetime_as_string(columns['dates'][self._rows].astype('datetime64[D]'))
+        amounts = to_taka(columns['paisa'][self._rows])
+        codes = columns['codes'][self._rows]
+        descriptions = columns['description_codes'][self._rows]
+
+        selected = None
+        for index, iid in enumerate(self._slots):
+            if index < len(self._rows):
+                values = (
+                    dates[index],
+                    store.categories[codes[index]],
+                    f"{amounts[index]:,.2f}",
+                    store.strings[descriptions[index]],
+                )
+                self.tree.move(iid, '', index)  # Reattaches it if it was detached
+                self.tree.item(iid, values=values)
+                if self._rows[index] == self._selected_row:
+                    selected = iid
+            else:
+                self.tree.detach(iid)
+
+        if selected:
+            self.tree.selection_set(selected)
+        else:
+            self.tree.selection_remove(self.tree.selection())
+        self.tree.yview_moveto(0)
+        if total:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + self._visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _row_for(self, iid):
+        index = self._slots.index(iid)
+        return int(self._rows[index]) if index < len(self._rows) else None
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            self._selected_row = self._row_for(selection[0])
+
+    def _move_selection(self, step):
+        selection = self.tree.selection()
+        index = self._slots.index(selection[0]) + step if selection else 0
+        if index < 0:
+            self.scroll(-1)
+            index = 0
+        elif index >= min(self._visible, len(self._rows)):
+            self.scroll(1)
+            index = min(self._visible, len(self._rows)) - 1
+        if 0 <= index < len(self._rows):
+            self._selected_row = int(self._rows[index])
+            self.tree.selection_set(self._slots[index])
+            self.tree.focus(self._slots[index])
+        return 'break'
+
+    def _on_double_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        row = self._row_for(iid) if iid else None
+        if row is not None and self.on_edit is not None:
+            self.on_edit(row)
+
+    def _on_delete_key(self, event):
+        if self._selected_row is not None and self.on_delete is not None:
+            self.on_delete(self._selected_row)
@@ -0,0 +1,256 @@
+"""Chunked import of bank/card statement exports into a ledger.
+
+The source is read ``chunksize`` rows at a time. Each chunk has its columns
+mapped to the ledger schema, its values parsed and validated with vectorized
+pandas operations, and is then written with a single ``storage.append``.
+Memory use depends on the chunk size, not on the size of the file.
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from fingerprints import FingerprintIndex, frame_fingerprints
+from storage import COLUMNS, open_storage
+
+# Lower-cased source headers we recognise for each ledger column
+COLUMN_ALIASES = {
+    'Date': ['date', 'transaction date', 'posting date', 'posted date', 'value date', 'booking date'],
+    'Amount': ['amount', 'debit', 'debit amount', 'withdrawal', 'withdrawals', 'value'],
+    'Category': ['category'],
+    'Description': ['description', 'details', 'narration', 'merchant', 'payee', 'particulars'],
+    'Note': ['note', 'notes', 'memo', 'reference', 'remarks'],
+}
+DEFAULT_CATEGORY = "Other"
+
+
+@dataclass
+class ImportProgress:
+    rows_read: int = 0
+    rows_imported: int = 0
+    rows_rejected: int = 0
+    rows_duplicate: int = 0
+    elapsed: float = 0.0
+    done: bool = False
+    error: Exception = None
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+
+def resolve_columns(source_columns, column_map=None):
+    """Map source column names to ledger columns, explicit column_map entries first"""
+    mapping = dict(column_map or {})
+    by_lower = {str(name).strip().lower(): name for name in source_columns}
+    for target, aliases in COLUMN_ALIASES.items():
+        if target in mapping.values():
+            continue
+        for alias in aliases:
+            if alias in by_lower and by_lower[alias] not in mapping:
+                mapping[by_lower[alias]] = target
+                break
+    missing = {'Date', 'Amount'} - set(mapping.values())
+    if missing:
+        raise ValueError(f"Statement has no column for: {', '.join(sorted(missing))}")
+    return mapping
+
+
+def _parse_amounts(values, negate):
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        # Strip currency symbols and thousands separators in one pass
+        values = values.astype(str).str.replace(r'[^0-9.\-]', '', regex=True)
+    amounts = pd.to_numeric(values, errors='coerce')
+    return -amounts if negate else amounts
+
+
+def _categories(chunk, descriptions, categorizer):
+    """The statement's own categories, with gaps filled by the categorizer, then DEFAULT_CATEGORY"""
+    categories = chunk['Category'] if 'Category' in chunk else pd.Series(None, index=chunk.index, dtype=object)
+    if categorizer is not None and descriptions is not None:
+        missing = categories.isna().to_numpy()
+        if missing.any():
+            categories = categories.astype(object)
+            categories[missing] = categorizer.categorize_many(descriptions[missing])
+    return categories.fillna(DEFAULT_CATEGORY)
+
+
+def normalize_chunk(chunk, mapping, date_format=None, dayfirst=False, negate=False, categorizer=None):
+    """Turn a raw statement chunk into valid ledger rows; returns (rows, rejected_count)
+
+    Rows without a category get one from categorizer (a categorizer.Categorizer)
+    when it recognises the description.
+    """
+    chunk = chunk.rename(columns=mapping)
+    dates = pd.to_datetime(chunk['Date'], format=date_format, dayfirst=dayfirst, errors='coerce')
+    amounts = _parse_amounts(chunk['Amount'], negate)
+    descriptions = chunk['Description'].fillna('').astype(str).str.strip() if 'Description' in chunk else None
+    rows = pd.DataFrame({
+        'Date': dates.dt.strftime('%Y-%m-%d'),
+        'Category': _categories(chunk, descriptions, categorizer),
+        'Amount': amounts,
+        'Description': descriptions if descriptions is not None else '',
+        'Note': chunk['Note'].fillna('').astype(str) if 'Note' in chunk else '',
+    }, columns=COLUMNS)
+
+    # Only positive spending amounts with a real date are ledger entries
+    valid = dates.notna() & amounts.notna() & (amounts > 0)
+    return rows[valid], int((~valid).sum())
+
+
+def ledger_fingerprints(storage, path):
+    """(FingerprintIndex, signature) of the ledger: the index saved at path while it
+    matches the ledger, otherwise one rebuilt from it"""
+    with storage.reading():
+        signature = storage.signature()
+        fingerprints = FingerprintIndex.load(path, signature) if storage.stable_signature else None
+        if fingerprints is None:
+            fingerprints = FingerprintIndex.from_store(storage.load_store()) if storage.exists() else FingerprintIndex()
+    return fingerprints, signature
+
+
+def import_statement(source, storage, chunksize=50_000, column_map=None,
+                     date_format=None, dayfirst=False, negate=False,
+                     progress=None, cancelled=None, read_options=None, categorizer=None,
+                     fingerprints=None, fingerprints_file=None):
+    """Stream a statement file into storage chunk by chunk; returns the final ImportProgress
+
+    With a fingerprints.FingerprintIndex of the ledger, rows that are already
+    in it are skipped and counted in ``rows_duplicate``, and the index is
+    kept up to date with the rows that are imported. With fingerprints_file
+    instead, the index saved there is used and saved again afterwards, unless
+    someone else wrote to the ledger during the import.
+    """
+    status = ImportProgress()
+    started = time.perf_counter()
+    mapping = None
+    signature = None
+    if fingerprints is None and fingerprints_file is not None:
+        fingerprints, signature = ledger_fingerprints(storage, fingerprints_file)
+    reader = pd.read_csv(source, chunksize=chunksize, **(read_options or {}))
+    with reader:
+        for chunk in reader:
+            if cancelled is not None and cancelled():
+                break
+            if mapping is None:
+                mapping = resolve_columns(chunk.columns, column_map)
+            rows, rejected = normalize_chunk(chunk, mapping, date_format, dayfirst, negate, categorizer)
+            if fingerprints is not None and not rows.empty:
+                hashes = frame_fingerprints(rows)
+                duplicate = fingerprints.duplicates(hashes)
+                rows, hashes = rows[~duplicate], hashes[~duplicate]
+                status.rows_duplicate += int(duplicate.sum())
+            if not rows.empty:
+                # Other writers held off, so the signature after the append covers only our rows
+                with storage.writing():
+                    current = signature is not None and storage.signature() == signature
+                    storage.append(rows)
+                    signature = storage.signature() if current else None
+                if fingerprints is not None:
+                    fingerprints.add(hashes)
+            status.rows_read += len(chunk)
+            status.rows_imported += len(rows)
+            status.rows_rejected += rejected
+            status.elapsed = time.perf_counter() - started
+            if progress is not None:
+                progress(status)
+    if fingerprints_file is not None and signature is not None and storage.stable_signature:
+        try:
+            fingerprints.save(fingerprints_file, signature)
+        except OSError:
+            pass  # Rebuilt from the ledger next time
+    status.elapsed = time.perf_counter() - started
+    status.done = True
+    return status
+
+
+class ImportJob:
+    """Runs import_statement on a background thread.
+
+    The UI thread calls ``poll()`` (e.g. from ``root.after``) to get the
+    latest ImportProgress without ever blocking on the import itself.
+    """
+    def __init__(self, source, storage_path, **options):
+        self._updates = queue.Queue()
+        self._cancel = threading.Event()
+        self._latest = ImportProgress()
+        self._thread = threading.Thread(
+            target=self._run, args=(source, storage_path, options), daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self, source, storage_path, options):
+        # Storage is opened here so SQLite connections belong to this thread
+        storage = open_storage(storage_path)
+        last = ImportProgress()
+
+        def report(status):
+            nonlocal last
+            last = ImportProgress(**vars(status))
+            self._updates.put(last)
+
+        try:
+            status = import_statement(
+                source, storage, progress=report, cancelled=self._cancel.is_set, **options
+            )
+        except Exception as e:
+            status = ImportProgress(**vars(last))
+            status.done, status.error = True, e
+        finally:
+            storage.close()
+        self._updates.put(status)
+
+    def poll(self):
+        """Most recent progress report"""
+        while True:
+            try:
+                self._latest = self._updates.get_nowait()
+            except queue.Empty:
+                return self._latest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import a bank statement CSV into a ledger")
+    parser.add_argument("statement")
+    parser.add_argument("ledger", nargs="?", default="transactions.csv")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--date-format")
+    parser.add_argument("--dayfirst", action="store_true")
+    parser.add_argument("--negate", action="store_true", help="statement lists spending as negative amounts")
+    parser.add_argument("--no-categorize", action="store_true",
+                        help="don't guess categories from descriptions (uncategorized rows become Other)")
+    parser.add_argument("--allow-duplicates", action="store_true",
+                        help="import rows even if the ledger already has an identical transaction")
+    args = parser.parse_args()
+
+    categorizer = None
+    if not args.no_categorize:
+        from categorizer import Categorizer
+        categorizer = Categorizer.load(args.ledger + ".rules.json")
+
+    ledger = open_storage(args.ledger)
+    try:
+        result = import_statement(
+            args.statement, ledger,
+            chunksize=args.chunksize,
+            date_format=args.date_format,
+            dayfirst=args.dayfirst,
+            negate=args.negate,
+            categorizer=categorizer,
+            fingerprints_file=None if args.allow_duplicates else args.ledger + ".fingerprints.npz",
+            progress=lambda s: print(f"\r{s.rows_read:,} rows ({s.rows_per_second:,.0f} rows/s)", end=""),
+        )
+    finally:
+        ledger.close()
+    print(f"\nImported {result.rows_imported:,} rows, rejected {result.rows_rejected:,},"
+          f" skipped {result.rows_duplicate:,} duplicates")
@@ -0,0 +1,202 @@
+"""Timing spans for the hot paths, plus optional cProfile/tracemalloc capture.
+
+Spans are off by default and then cost one flag check. Turn them on with
+``FINANCIAL_TRACKER_METRICS=<path>`` (or ``--metrics`` on the command line):
+durations are collected in memory and written at exit, as Prometheus text
+if the path ends in ``.prom`` and as JSON lines otherwise.
+
+``FINANCIAL_TRACKER_PROFILE=<prefix>`` (or ``--profile``) additionally runs
+cProfile on the main thread and tracemalloc, writing ``<prefix>.prof`` and
+``<prefix>.memory.txt`` at exit.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+METRICS_ENV = "FINANCIAL_TRACKER_METRICS"
+PROFILE_ENV = "FINANCIAL_TRACKER_PROFILE"
+MAX_RECORDS = 100_000
+QUANTILES = (0.5, 0.9, 0.99)
+
+_enabled = False
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+_profiler = None
+_exports = set()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def span(name, **labels):
+    """Context manager timing the block as `name`; a shared no-op while disabled"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def record(name, seconds, **labels):
+    """Add one measurement, e.g. for work timed some other way"""
+    if _enabled:
+        with _lock:
+            _records.append((name, labels, time.time(), seconds))
+
+
+def records():
+    """Measurements so far, oldest first, as dicts"""
+    with _lock:
+        return [
+            {"span": name, "labels": labels, "timestamp": timestamp, "seconds": seconds}
+            for name, labels, timestamp, seconds in list(_records)
+        ]
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summary():
+    """{span name: {'count', 'sum', quantile: seconds}} over everything recorded"""
+    by_name = {}
+    for item in records():
+        by_name.setdefault(item["span"], []).append(item["seconds"])
+    result = {}
+    for name, durations in sorted(by_name.items()):
+        durations.sort()
+        stats = {"count": len(durations), "sum": sum(durations)}
+        for q in QUANTILES:
+            stats[q] = _quantile(durations, q)
+        result[name] = stats
+    return result
+
+
+def write_jsonl(path):
+    with open(path, "a") as f:
+        for item in records():
+            f.write(json.dumps(item) + "\n")
+
+
+def write_prometheus(path):
+    """Write a Prometheus text-format summary of span durations"""
+    lines = [
+        "# HELP financial_tracker_span_seconds Time spent in instrumented operations.",
+        "# TYPE financial_tracker_span_seconds summary",
+    ]
+    for name, stats in summary().items():
+        for q in QUANTILES:
+            lines.append(f'financial_tracker_span_seconds{{span="{name}",quantile="{q}"}} {stats[q]:.6f}')
+        lines.append(f'financial_tracker_span_seconds_sum{{span="{name}"}} {stats["sum"]:.6f}')
+        lines.append(f'financial_tracker_span_seconds_count{{span="{name}"}} {stats["count"]}')
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def export(path):
+    """Write recorded spans to path, in the format its extension implies"""
+    if path.endswith(".prom"):
+        write_prometheus(path)
+    else:
+        write_jsonl(path)
+
+
+def start_profiling(prefix):
+    """Run cProfile (this thread) and tracemalloc until stop_profiling or exit"""
+    global _profiler
+    import cProfile
+    import tracemalloc
+
+    if _profiler is not None:
+        return
+    tracemalloc.start()
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+    atexit.register(stop_profiling, prefix)
+
+
+def stop_profiling(prefix):
+    global _profiler
+    import tracemalloc
+
+    if _profiler is None:
+        return
+    _profiler.disable()
+    _profiler.dump_stats(prefix + ".prof")
+    _profiler = None
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics('lineno')[:30]
+    tracemalloc.stop()
+    with open(prefix + ".memory.txt", "w") as f:
+        f.write(f"current {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB\n\n")
+        for stat in top:
+            f.write(f"{stat}\n")
+
+
+def configure(metrics_path=None, profile_prefix=None):
+    """Turn on span collection and/or profiling, with results written at exit"""
+    if metrics_path:
+        enable()
+        if metrics_path not in _exports:
+            _exports.add(metrics_path)
+            atexit.register(export, metrics_path)
+    if profile_prefix:
+        enable()
+        start_profiling(profile_prefix)
+
+
+def add_arguments(parser):
+    """Add --metrics/--profile options to an argparse parser"""
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="record timing spans and write them to PATH at exit (.prom or .jsonl)")
+    parser.add_argument("--profile", metavar="PREFIX",
+                        help="write cProfile and tracemalloc results to PREFIX.prof and PREFIX.memory.txt")
+
+
+configure(os.environ.get(METRICS_ENV), os.environ.get(PROFILE_ENV))
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+# Rough in-memory cost of a built matplotlib figure, for size accounting
+FIGURE_BYTES = 2 * 2**20
+# Nominal cost of an aggregate (a few hundred cells at most)
+AGGREGATE_BYTES = 64 * 2**10
+
+
+class ReportCache:
+    """Size-bounded LRU cache for report aggregates, figures and PNG bytes.
+
+    Keys should include the ledger version the value was computed from, so
+    a result computed before a save can never be served after it. Every
+    entry carries a size estimate in bytes; the least recently used entries
+    are evicted once the total exceeds ``max_bytes`` or the entry count
+    exceeds ``max_entries``. Safe to use from the report worker thread.
+    """
+    def __init__(self, max_bytes=64 * 2**20, max_entries=32):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._bytes
+
+    def get(self, key):
+        """Cached value for key, or None; marks it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Store value under key; values bigger than the whole cache are not kept"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
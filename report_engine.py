@@ -0,0 +1,208 @@
+"""Parallel aggregation and rendering of reports for many ledgers.
+
+Work is split into partitions: a whole ledger, or one calendar year of a
+ledger when ``by_year`` is set. Each partition is aggregated in a worker
+process into a MonthlyRollup, and only those small month x category cells
+come back to the parent. There they are merged with ``MonthlyRollup.merge``,
+which costs nothing next to reading the rows. Figures can be rendered in
+parallel too, each worker using the Agg backend.
+
+For a file ledger split by year, the parent sorts the ledger's dates once
+and hands each year the row numbers it covers. Loading the store also brings
+a CSV ledger's snapshot up to date, so a worker only memory-maps it and sums
+its rows, instead of every worker loading and sorting the whole ledger.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rollup import MonthlyRollup
+from storage import open_storage
+from transaction_store import LedgerView, epoch_day
+
+
+def _years(first, last):
+    return [(f"{year}-01-01", f"{year}-12-31") for year in range(int(first[:4]), int(last[:4]) + 1)]
+
+
+def _year_parts(ledger):
+    """[(start, end, rows)] for each year of the ledger, or None if it has no transactions.
+
+    rows is (signature, row numbers) for a file ledger and None where the
+    backend selects the dates itself.
+    """
+    storage = open_storage(ledger)
+    try:
+        if storage.aggregates_natively or not storage.stable_signature:
+            span = storage.date_span()
+            return None if span is None else [(start, end, None) for start, end in _years(*span)]
+        store = storage.load_store()
+        signature = storage.signature()
+    finally:
+        storage.close()
+    if not len(store):
+        return None
+    dates = store.dates
+    order = np.argsort(dates, kind='stable')
+    sorted_dates = dates[order]
+    years = _years(*(str(day) for day in sorted_dates[[0, -1]].astype('datetime64[D]')))
+    bounds = np.searchsorted(sorted_dates, [epoch_day(start) for start, _ in years] + [sorted_dates[-1] + 1])
+    # Rows in file order, so a worker reads the mapped arrays front to back
+    return [
+        (start, end, (signature, np.sort(order[lo:hi])))
+        for (start, end), lo, hi in zip(years, bounds[:-1], bounds[1:])
+    ]
+
+
+def partitions(ledgers, by_year=False, failures=None):
+    """(ledger, start, end, rows) work items; start/end are None for a whole ledger
+    and rows, when given, is (signature, row numbers) of the partition's transactions"""
+    items = []
+    for ledger in ledgers:
+        if not by_year:
+            items.append((ledger, None, None, None))
+            continue
+        try:
+            parts = _year_parts(ledger)
+        except Exception as e:
+            if failures is None:
+                raise
+            failures[ledger] = e
+            continue
+        if parts is None:
+            items.append((ledger, None, None, None))
+            continue
+        items.extend((ledger, *part) for part in parts)
+    return items
+
+
+def partial_rollup(item):
+    """Worker: aggregate one partition; returns (ledger, cells)"""
+    ledger, start, end, rows = item
+    storage = open_storage(ledger)
+    try:
+        if start is None and end is None and storage.stable_signature:
+            # The GUI keeps a rollup next to the ledger; use it while it's current
+            saved = MonthlyRollup.load(ledger + ".rollup.json", storage.signature())
+            if saved is not None:
+                return ledger, saved.cells
+        if rows is not None:
+            signature, rows = rows
+            store = storage.load_store()
+            # Checked after loading: the row numbers only fit the ledger they were taken from
+            if storage.signature() == signature:
+                return ledger, MonthlyRollup.from_view(LedgerView(store, rows)).cells
+        return ledger, storage.monthly_rollup(start, end).cells
+    finally:
+        storage.close()
+
+
+def report_names(ledgers):
+    """{ledger: name} for report files: the file name without its extension where
+    that is unique, otherwise the path from the ledgers' common directory"""
+    stems = {}
+    for ledger in ledgers:
+        stems.setdefault(os.path.splitext(os.path.basename(ledger))[0], []).append(ledger)
+    names = {}
+    for stem, group in stems.items():
+        if len(group) == 1:
+            names[group[0]] = stem
+            continue
+        paths = [os.path.abspath(ledger) for ledger in group]
+        if len(set(paths)) < len(paths):
+            raise ValueError(f"Ledger given more than once: {group[0]}")
+        common = os.path.commonpath([os.path.dirname(path) for path in paths])
+        for ledger, path in zip(group, paths):
+            names[ledger] = os.path.relpath(path, common).replace(os.sep, "-")
+    if len(set(names.values())) < len(names):
+        raise ValueError("Ledgers would write reports with the same name")
+    return names
+
+
+def _from_cells(cells):
+    rollup = MonthlyRollup()
+    rollup.cells = cells
+    return rollup
+
+
+def aggregate(ledgers, by_year=False, max_workers=None):
+    """Returns ({ledger: MonthlyRollup}, {ledger: exception}), computed over a process pool"""
+    failures = {}
+    items = partitions(ledgers, by_year, failures)
+    if max_workers == 1:
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append((item[0], partial_rollup(item)[1]))
+            except Exception as e:
+                outcomes.append((item[0], e))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(item[0], executor.submit(partial_rollup, item)) for item in items]
+            outcomes = []
+            for ledger, future in futures:
+                try:
+                    outcomes.append((ledger, future.result()[1]))
+                except Exception as e:
+                    outcomes.append((ledger, e))
+
+    # Reduce: fold each partition's cells into its ledger's rollup
+    rollups = {}
+    for ledger, outcome in outcomes:
+        if isinstance(outcome, Exception):
+            failures.setdefault(ledger, outcome)
+        elif ledger not in failures:
+            rollups.setdefault(ledger, MonthlyRollup()).merge(_from_cells(outcome))
+    for ledger in failures:
+        rollups.pop(ledger, None)
+    return rollups, failures
+
+
+def combined(rollups):
+    """One rollup covering every ledger"""
+    total = MonthlyRollup()
+    for rollup in rollups.values():
+        total.merge(rollup)
+    return total
+
+
+_chart = None  # Each process reuses one trends figure for every report it renders
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_reports(item):
+    """Worker: write the reports for one (name, cells, output_dir, formats, dpi)"""
+    global _chart
+    import reports
+
+    name, cells, output_dir, formats, dpi = item
+    _use_agg()
+    if _chart is None:
+        _chart = reports.TrendChart()
+    return reports.write_reports(_from_cells(cells), output_dir, name, formats, dpi, _chart)
+
+
+def render_all(named_rollups, output_dir, formats, dpi=150, max_workers=None):
+    """Write reports for each (name, rollup) pair; returns {name: paths or exception}"""
+    items = [(name, rollup.cells, output_dir, formats, dpi) for name, rollup in named_rollups]
+    results = {}
+    if max_workers == 1:
+        for item in items:
+            try:
+                results[item[0]] = render_reports(item)
+            except Exception as e:
+                results[item[0]] = e
+        return results
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_use_agg) as executor:
+        futures = {item[0]: executor.submit(render_reports, item) for item in items}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+    return results
@@ -0,0 +1,89 @@
+import io
+import queue
+import threading
+
+
+class ReportCancelled(Exception):
+    """Raised inside a job when a newer report has replaced it."""
+
+
+def render_png(fig, max_width, max_height):
+    """Rasterize a figure with the Agg backend, scaled to fit max_width x max_height pixels"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    width_in, height_in = fig.get_size_inches()
+    dpi = min(max_width / width_in, max_height / height_in)
+    FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+class ReportWorker:
+    """Runs report jobs on a background thread and hands results back to Tk.
+
+    A job is called with a ``cancelled()`` function it should check between
+    expensive steps. Results travel through a queue that the Tk thread polls
+    with ``root.after``, so callbacks always run on the Tk thread. Submitting
+    a new job makes any job still in flight stale; its result is dropped.
+    """
+    POLL_MS = 50
+
+    def __init__(self, root, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy
+        self._results = queue.Queue()
+        self._generation = 0
+        self._callbacks = None
+
+    @property
+    def busy(self):
+        return self._callbacks is not None
+
+    def submit(self, job, on_done, on_error):
+        """Start job in the background, superseding any job still running"""
+        was_busy = self.busy
+        self._generation += 1
+        self._callbacks = (on_done, on_error)
+        threading.Thread(
+            target=self._run, args=(self._generation, job), daemon=True
+        ).start()
+        if not was_busy:
+            self._set_busy(True)
+            self.root.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        """Drop the result of whatever job is running"""
+        self._generation += 1
+        if self.busy:
+            self._callbacks = None
+            self._set_busy(False)
+
+    def _run(self, generation, job):
+        try:
+            result = job(lambda: generation != self._generation)
+        except Exception as e:
+            self._results.put((generation, None, e))
+        else:
+            self._results.put((generation, result, None))
+
+    def _poll(self):
+        while self.busy:
+            try:
+                generation, result, error = self._results.get_nowait()
+            except queue.Empty:
+                self.root.after(self.POLL_MS, self._poll)
+                return
+            if generation != self._generation:
+                continue  # A newer job replaced this one
+            on_done, on_error = self._callbacks
+            self._callbacks = None
+            self._set_busy(False)
+            if error is None:
+                on_done(result)
+            elif not isinstance(error, ReportCancelled):
+                on_error(error)
+
+    def _set_busy(self, busy):
+        if self.on_busy is not None:
+            self.on_busy(busy)
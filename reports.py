@@ -0,0 +1,427 @@
+"""Report aggregation and figure building, independent of any UI.
+
+Aggregation functions take a *source*: anything with ``category_totals()``
+and ``monthly_category_totals()`` (a MonthlyRollup, a LedgerView, or a
+storage that aggregates natively). Figures use matplotlib's object API, so
+nothing here needs a display.
+
+Run as a script to write reports for one or more ledgers:
+
+    python reports.py ledger.csv other.db --output-dir reports --formats png svg csv
+
+Aggregation and rendering for the CLI run on a process pool; see report_engine.
+"""
+import os
+import sys
+from dataclasses import dataclass
+
+FORMATS = ('png', 'svg', 'csv')
+
+# Bounds that keep figure size, and so build and draw time, independent of history length
+MAX_BARS = 60
+MAX_LINE_POINTS = 300
+MAX_ANNOTATIONS = 12
+MAX_TICKS = 24
+
+# Chart granularities, finest first: pandas period frequency and nominal length in days
+GRANULARITIES = {
+    'day': ('D', 1),
+    'week': ('W', 7),
+    'month': ('M', 30.44),
+    'quarter': ('Q', 91.31),
+    'year': ('Y', 365.25),
+}
+ADJECTIVES = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly', 'quarter': 'Quarterly', 'year': 'Yearly'}
+
+
+@dataclass
+class TrendData:
+    periods: object  # period x category totals at `granularity`, labelled for display
+    granularity: str
+    line: object  # total per finest available period, indexed by period start, downsampled
+    resolution: str  # granularity of line: 'day' or 'month'
+    monthly: object  # month x category totals, as written to the CSV report
+    analysis: object = None  # analytics.SpendingAnalysis of monthly
+
+    @property
+    def totals(self):
+        return self.periods.sum(axis=1)
+
+
+def spending_data(source):
+    """Category totals, largest first"""
+    category_totals = source.category_totals()
+    if category_totals.empty or category_totals.isna().all():
+        raise ValueError("No valid data to plot")
+    return category_totals.sort_values(ascending=False)
+
+
+def monthly_data(source, previous=None):
+    """Spending over time, at a granularity that keeps the chart a bounded size
+
+    previous, the analysis from an earlier TrendData, is updated rather than
+    recomputed, so only months that changed since are analysed again.
+    """
+    import pandas as pd
+
+    from analytics import SpendingAnalysis
+
+    daily = getattr(source, 'daily_category_totals', None)
+    if daily is not None:
+        table, finest = daily(), 'day'
+    else:
+        table, finest = source.monthly_category_totals(), 'month'
+        table.index = pd.to_datetime(table.index, format='%Y-%m')
+    line = table.sum(axis=1)
+    if line.empty or line.isna().all():
+        raise ValueError("No valid monthly data to plot")
+
+    granularity = choose_granularity(line.index[0], line.index[-1], finest)
+    monthly = _coarsen(table, 'month')
+    return TrendData(
+        periods=_coarsen(table, granularity),
+        granularity=granularity,
+        line=line.iloc[lttb(line.index.to_numpy(dtype='datetime64[D]').astype('int64'), line.to_numpy(), MAX_LINE_POINTS)],
+        resolution=finest,
+        monthly=monthly,
+        analysis=previous.updated(monthly) if previous is not None else SpendingAnalysis(monthly),
+    )
+
+
+def choose_granularity(first, last, finest='day', max_periods=MAX_BARS):
+    """Finest period, no finer than `finest`, that splits first..last into at most max_periods"""
+    days = (last - first).days + 1
+    names = list(GRANULARITIES)
+    for name in names[names.index(finest):]:
+        if days / GRANULARITIES[name][1] <= max_periods:
+            return name
+    return names[-1]
+
+
+def _coarsen(table, granularity):
+    """Sum a date-indexed table into periods, labelled the way the chart shows them"""
+    import pandas as pd
+
+    freq = GRANULARITIES[granularity][0]
+    grouped = table.groupby(table.index.to_period(freq)).sum()
+    if granularity == 'week':
+        labels = [period.start_time.strftime('%Y-%m-%d') for period in grouped.index]
+    else:
+        labels = [str(period) for period in grouped.index]
+    grouped.index = pd.Index(labels, name=granularity.title())
+    return grouped
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the points to keep.
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the next bucket's average. The line keeps its
+    visual shape with a bounded number of points.
+    """
+    import numpy as np
+
+    n = len(x)
+    if n <= threshold or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        keep[bucket + 1] = previous
+    return keep
+
+
+def build_spending_figure(category_totals):
+    """Bar chart of category totals"""
+    from matplotlib.figure import Figure
+
+    # Create figure with larger size and better resolution
+    fig = Figure(figsize=(10, 6), dpi=100)
+    ax = fig.add_subplot()
+
+    # Create bars with better colors
+    bars = ax.bar(
+        range(len(category_totals)),
+        category_totals.values,
+        color='#2563eb',
+        alpha=0.7
+    )
+
+    # Customize the chart
+    ax.set_title("Spending by Category", pad=20, fontsize=14, fontweight='bold')
+    ax.set_xlabel("Categories", labelpad=10, fontsize=12)
+    ax.set_ylabel("Amount (BDT)", labelpad=10, fontsize=12)
+
+    # Set x-axis labels
+    ax.set_xticks(range(len(category_totals)))
+    ax.set_xticklabels(category_totals.index, rotation=45, ha='right')
+
+    # Add value labels on top of the largest bars; totals arrive sorted largest first
+    for bar in list(bars)[:MAX_ANNOTATIONS]:
+        height = bar.get_height()
+        ax.text(
+            bar.get_x() + bar.get_width()/2.,
+            height,
+            f'BDT {height:,.2f}',
+            ha='center',
+            va='bottom',
+            fontsize=10
+        )
+
+    # Add grid for better readability
+    ax.grid(True, axis='y', linestyle='--', alpha=0.3)
+
+    # Adjust layout
+    fig.tight_layout()
+    return fig
+
+
+def _capped_ticks(ax, labels, rotation):
+    """Label at most MAX_TICKS evenly spaced positions"""
+    step = max(1, -(-len(labels) // MAX_TICKS))
+    positions = range(0, len(labels), step)
+    ax.set_xticks(positions)
+    ax.set_xticklabels([labels[i] for i in positions], rotation=rotation)
+
+
+class TrendChart:
+    """The monthly trends figure, reusable across datasets.
+
+    The figure, axes and styling are built once; ``update`` replaces only
+    the data-dependent artists. Reports for many ledgers or date ranges can
+    share one chart instead of each building a figure from scratch.
+    """
+    def __init__(self):
+        from matplotlib.figure import Figure
+
+        # Create figure with better size ratio
+        self.fig = Figure(figsize=(10, 12), dpi=100)
+        self.ax1, self.ax2 = self.fig.subplots(2, 1, height_ratios=[1, 1.5])
+        self.fig.suptitle("Monthly Financial Analysis", fontsize=16, fontweight='bold', y=0.95)
+
+        # Line chart of totals over time, on a date axis
+        self.ax1.xaxis_date()
+        self.line, = self.ax1.plot([], [], linewidth=2, color='#2563eb')
+        self.ax1.set_xlabel("Date", labelpad=10)
+        self.ax1.set_ylabel("Total Amount (BDT)", labelpad=10)
+        self.ax1.grid(True, linestyle='--', alpha=0.3)
+
+        self.ax2.set_ylabel("Amount (BDT)", labelpad=10)
+        self.ax2.grid(True, axis='y', linestyle='--', alpha=0.3)
+        self._artists = []
+
+    def update(self, data):
+        """Draw a TrendData into the figure; returns the figure"""
+        import numpy as np
+        from matplotlib.dates import date2num
+
+        for artist in self._artists:
+            artist.remove()
+        self._artists = []
+        for ax in (self.ax1, self.ax2):
+            legend = ax.get_legend()
+            if legend is not None:
+                legend.remove()
+
+        # Trend line; markers only while there are few enough points to tell apart
+        x = date2num(data.line.index.to_pydatetime())
+        y = data.line.to_numpy(dtype=float)
+        self.line.set_data(x, y)
+        self.line.set_marker('o' if len(x) <= MAX_BARS else '')
+        self.ax1.relim()
+        self.ax1.autoscale_view()
+        self.ax1.set_title(f"{ADJECTIVES[data.resolution]} Spending Trend", pad=20, fontsize=12)
+
+        # Value labels on the peak of each of at most MAX_ANNOTATIONS stretches of the line
+        for stretch in np.array_split(np.arange(len(y)), min(len(y), MAX_ANNOTATIONS)):
+            i = stretch[np.argmax(y[stretch])]
+            self._artists.append(self.ax1.text(x[i], y[i], f'BDT {y[i]:,.2f}', ha='center', va='bottom'))
+
+        # Category breakdown as stacked bars, one per period
+        periods = data.periods
+        positions = np.arange(len(periods))
+        bottom = np.zeros(len(periods))
+        for i, category in enumerate(periods.columns):
+            values = periods[category].to_numpy(dtype=float)
+            # Explicit colors, so a reused chart doesn't carry on through the color cycle
+            self._artists.append(self.ax2.bar(
+                positions, values, width=0.8, bottom=bottom, alpha=0.7, label=category, color=f'C{i % 10}'
+            ))
+            bottom += values
+        if data.analysis is not None and len(data.analysis.months):
+            self._overlay_analysis(data)
+        self.ax2.relim()
+        self.ax2.autoscale_view()
+        _capped_ticks(self.ax2, list(periods.index), rotation=90)
+        self.ax2.set_title(f"{ADJECTIVES[data.granularity]} Category Breakdown", pad=20, fontsize=12)
+        self.ax2.set_xlabel(data.granularity.title(), labelpad=10)
+        if len(periods.columns):
+            self.ax2.legend(title="Categories", bbox_to_anchor=(1.05, 1), loc='upper left')
+
+        # Adjust layout to prevent text cutoff
+        self.fig.tight_layout()
+        return self.fig
+
+    def _overlay_analysis(self, data):
+        """Moving average, forecast and unusual months from data.analysis, drawn over both charts"""
+        import numpy as np
+        from matplotlib.dates import date2num
+
+        from analytics import TOTAL
+
+        analysis = data.analysis
+        total = analysis.values[TOTAL].to_numpy()
+        average = analysis.rolling_mean[TOTAL].to_numpy()
+        unusual = analysis.outliers[TOTAL].to_numpy()
+        average_label = f"{analysis.window}-month average"
+
+        if data.resolution == 'month':
+            # The trend line is monthly totals too, so the analysis shares its scale
+            x = date2num(analysis.months.to_timestamp().to_pydatetime())
+            self._artists += self.ax1.plot(x, average, linestyle='--', color='#f59e0b', label=average_label)
+            if len(analysis.forecast):
+                ahead = date2num(analysis.forecast.index.to_timestamp().to_pydatetime())
+                self._artists += self.ax1.plot(
+                    np.r_[x[-1], ahead], np.r_[total[-1], analysis.forecast[TOTAL].to_numpy()],
+                    linestyle=':', marker='o', color='#6b7280', label="Forecast"
+                )
+            if unusual.any():
+                self._artists.append(self.ax1.scatter(
+                    x[unusual], total[unusual], s=90, facecolors='none', edgecolors='#dc2626',
+                    linewidths=2, zorder=3, label="Unusual month"
+                ))
+            self.ax1.relim()
+            self.ax1.autoscale_view()
+            self.ax1.legend(loc='best', fontsize=9)
+
+        if data.granularity == 'month':
+            # Bars are months as well; line the analysis up with them by label
+            positions = data.periods.index.get_indexer(analysis.months.astype(str))
+            shown = positions >= 0
+            self._artists += self.ax2.plot(
+                positions[shown], average[shown], linestyle='--', color='#f59e0b', label=average_label
+            )
+            # Circle the bar segments that are unusual for their category
+            tops = data.periods.cumsum(axis=1)
+            flagged = analysis.flagged()
+            flagged = flagged[flagged['Category'].isin(tops.columns)]
+            rows = tops.index.get_indexer(flagged['Month'])
+            flagged, rows = flagged[rows >= 0], rows[rows >= 0]
+            if len(flagged):
+                columns = tops.columns.get_indexer(flagged['Category'])
+                middles = tops.to_numpy()[rows, columns] - flagged['Amount'].to_numpy() / 2
+                self._artists.append(self.ax2.scatter(
+                    rows, middles, s=60, facecolors='none', edgecolors='#dc2626', linewidths=1.5, zorder=3
+                ))
+
+        # The latest month against the one before, and what the next one may come to
+        latest = analysis.months[-1]
+        summary = f"{latest}: BDT {total[-1]:,.2f}"
+        change = analysis.change_pct[TOTAL].iloc[-1]
+        if np.isfinite(change):
+            summary += f" ({change:+.1%} on {latest - 1})"
+        if len(analysis.forecast):
+            summary += f"  ·  forecast {analysis.forecast.index[0]}: BDT {analysis.forecast[TOTAL].iloc[0]:,.2f}"
+        self._artists.append(self.ax1.text(
+            0.99, 0.02, summary, transform=self.ax1.transAxes, ha='right', va='bottom', fontsize=9,
+            color='#374151', bbox={'boxstyle': 'round', 'facecolor': 'white', 'alpha': 0.85, 'edgecolor': '#d1d5db'}
+        ))
+
+
+def build_monthly_figure(data):
+    """Trend line above a stacked period x category breakdown"""
+    return TrendChart().update(data)
+
+
+def write_reports(source, output_dir, name, formats=FORMATS, dpi=150, chart=None):
+    """Write every report for one source, reusing chart (a TrendChart) if given; returns the paths written"""
+    from instrumentation import span
+
+    with span("report.aggregate", ledger=name):
+        spending = spending_data(source)
+        trends = monthly_data(source)
+    written = []
+
+    def path(report, extension):
+        written.append(os.path.join(output_dir, f"{name}-{report}.{extension}"))
+        return written[-1]
+
+    if 'csv' in formats:
+        spending.to_csv(path('spending', 'csv'))
+        trends.monthly.to_csv(path('monthly', 'csv'))
+        trends.analysis.to_frame().to_csv(path('analysis', 'csv'))
+    images = [extension for extension in formats if extension != 'csv']
+    if images:
+        with span("report.build", ledger=name):
+            figures = (('spending', build_spending_figure(spending)),
+                       ('monthly', (chart or TrendChart()).update(trends)))
+        for report, fig in figures:
+            for extension in images:
+                with span("report.draw", ledger=name, format=extension):
+                    fig.savefig(path(report, extension), format=extension, dpi=dpi, bbox_inches='tight')
+    return written
+
+
+def main(argv=None):
+    import argparse
+
+    import instrumentation
+
+    parser = argparse.ArgumentParser(description="Write spending and monthly reports for ledgers")
+    parser.add_argument("ledgers", nargs="+", help="CSV or SQLite ledger files")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="worker processes (default: one per CPU; 1 runs everything in this process)")
+    parser.add_argument("--by-year", action="store_true",
+                        help="aggregate each year of a ledger in its own worker")
+    parser.add_argument("--combined", metavar="NAME",
+                        help="also write a report NAME covering all the ledgers together")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure(args.metrics, args.profile)
+
+    import report_engine
+
+    try:
+        names = report_engine.report_names(args.ledgers)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.combined in names.values():
+        parser.error(f"--combined {args.combined} is also the report name of a ledger")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    rollups, failures = report_engine.aggregate(args.ledgers, args.by_year, args.jobs)
+    for ledger, error in failures.items():
+        print(f"{ledger}: {error}", file=sys.stderr)
+
+    named = [(names[ledger], rollup) for ledger, rollup in rollups.items()]
+    if args.combined:
+        named.append((args.combined, report_engine.combined(rollups)))
+    results = report_engine.render_all(named, args.output_dir, args.formats, args.dpi, args.jobs)
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            failures[name] = result
+            print(f"{name}: {result}", file=sys.stderr)
+        else:
+            print(f"{name}: wrote {len(result)} files")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from transaction_store import PAISA, to_paisa
+
+FORMAT = 2  # Saved rollups from before cells were kept in paisa are rebuilt
+
+
+class MonthlyRollup:
+    """Running sum/count/min/max per (year-month, category).
+
+    Cells hold int paisa, so sums stay exact however often they are added
+    to or merged; the tables handed to reports are in taka. Reports read
+    from here, so opening one costs O(months x categories)
+    instead of a pass over every transaction. ``add`` keeps it current in
+    O(1) and ``save``/``load`` persist it next to the ledger, tagged with the
+    ledger signature it was built from.
+    """
+    def __init__(self):
+        self.cells = {}
+
+    @classmethod
+    def _grouped(cls, months, codes, names, paisa):
+        """Rollup of rows given as datetime64[M] months, codes into names and int paisa"""
+        rollup = cls()
+        if not len(paisa):
+            return rollup
+        # Sort by (month, category) cell, then reduce each run of equal cells
+        width = len(names)
+        keys = months.astype(np.int64) * width + codes
+        order = np.argsort(keys, kind='stable')
+        keys, paisa = keys[order], paisa[order]
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        cells = zip(
+            keys[starts].tolist(),
+            np.add.reduceat(paisa, starts).tolist(),
+            np.diff(np.append(starts, len(keys))).tolist(),
+            np.minimum.reduceat(paisa, starts).tolist(),
+            np.maximum.reduceat(paisa, starts).tolist(),
+        )
+        for key, *cell in cells:
+            month, code = divmod(key, width)
+            rollup.cells[(str(np.datetime64(month, 'M')), names[code])] = cell
+        return rollup
+
+    @classmethod
+    def build(cls, df):
+        """Build a rollup from a typed ledger DataFrame in one grouped pass"""
+        categories = pd.Categorical(df['Category'])
+        return cls._grouped(
+            df['Date'].to_numpy(dtype='datetime64[M]'), categories.codes,
+            list(categories.categories), to_paisa(df['Amount'])
+        )
+
+    @classmethod
+    def from_view(cls, view):
+        """Build a rollup straight from a store view's columns"""
+        months = view.dates.astype('datetime64[D]').astype('datetime64[M]')
+        return cls._grouped(months, view.codes, view.categories, view.paisa)
+
+    def copy(self):
+        """Independent copy, safe to read while the original keeps changing"""
+        rollup = MonthlyRollup()
+        rollup.cells = {key: list(cell) for key, cell in self.cells.items()}
+        return rollup
+
+    def add(self, month, category, amount):
+        """Fold one transaction into its cell; month is a 'YYYY-MM' string, amount in taka"""
+        amount = int(to_paisa(amount))
+        cell = self.cells.get((month, category))
+        if cell is None:
+            self.cells[(month, category)] = [amount, 1, amount, amount]
+        else:
+            cell[0] += amount
+            cell[1] += 1
+            cell[2] = min(cell[2], amount)
+            cell[3] = max(cell[3], amount)
+
+    def merge(self, other):
+        """Fold another rollup's cells into this one; returns self"""
+        for key, cell in other.cells.items():
+            existing = self.cells.get(key)
+            if existing is None:
+                self.cells[key] = list(cell)
+            else:
+                existing[0] += cell[0]
+                existing[1] += cell[1]
+                existing[2] = min(existing[2], cell[2])
+                existing[3] = max(existing[3], cell[3])
+        return self
+
+    def _paisa_frame(self):
+        rows = [(month, category, *cell) for (month, category), cell in self.cells.items()]
+        return pd.DataFrame(rows, columns=['Month', 'Category', 'Sum', 'Count', 'Min', 'Max'])
+
+    def to_frame(self):
+        """One row per cell with Month, Category, Sum, Count, Min and Max (in taka)"""
+        frame = self._paisa_frame()
+        frame[['Sum', 'Min', 'Max']] /= PAISA
+        return frame
+
+    def category_totals(self):
+        """Total amount per category"""
+        totals = {}
+        for (_, category), cell in self.cells.items():
+            totals[category] = totals.get(category, 0) + cell[0]
+        return (pd.Series(totals, name='Amount', dtype=np.int64) / PAISA).rename_axis('Category').sort_index()
+
+    def monthly_category_totals(self):
+        """Month x category table of total amounts, months in order"""
+        frame = self._paisa_frame()
+        table = frame.pivot(index='Month', columns='Category', values='Sum').fillna(0) / PAISA
+        table.index.name = 'Date'
+        return table.sort_index()
+
+    def save(self, path, signature):
+        """Write the rollup to path, tagged with the ledger signature it matches"""
+        data = {
+            "format": FORMAT,
+            "signature": list(signature) if signature is not None else None,
+            "cells": [[month, category, *cell] for (month, category), cell in self.cells.items()],
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, signature):
+        """Read a saved rollup, or None if it is missing or was built from another ledger state"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        saved = data.get("signature")
+        if data.get("format") != FORMAT or signature is None or saved is None or tuple(saved) != tuple(signature):
+            return None
+        rollup = cls()
+        for month, category, total, count, low, high in data["cells"]:
+            rollup.cells[(month, category)] = [total, count, low, high]
+        return rollup
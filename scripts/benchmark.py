@@ -0,0 +1,208 @@
+"""Headless benchmark suite for the ledger, reporting and export paths.
+
+Generates synthetic ledgers (see synthetic_ledger.py), times each operation
+and records its peak traced memory, then writes JSON that can be compared
+across commits:
+
+    python scripts/benchmark.py --sizes 10000 1000000 --output after.json
+    python scripts/benchmark.py --sizes 10000 --compare before.json
+
+Generated ledgers are cached in --workdir, so reruns skip generation.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import matplotlib
+
+matplotlib.use("Agg")  # Never needs a display
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic_ledger  # noqa: E402
+import reports  # noqa: E402
+from financial_tracker import Budget  # noqa: E402
+from importer import import_statement  # noqa: E402
+from report_worker import render_png  # noqa: E402
+from rollup import MonthlyRollup  # noqa: E402
+from storage import open_storage  # noqa: E402
+from transaction_store import Transaction  # noqa: E402
+
+SINGLE_INSERTS = 200
+BULK_ROWS = 100_000
+
+
+def _remove_derived(path):
+    """Drop the snapshot, rollup and journal files kept next to a ledger"""
+    for suffix in (".snapshot",):
+        shutil.rmtree(path + suffix, ignore_errors=True)
+    for suffix in (".rollup.json", ".journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _scratch_copy(ledger, workdir):
+    copy = os.path.join(workdir, "scratch.csv")
+    _remove_derived(copy)
+    shutil.copyfile(ledger, copy)
+    return copy
+
+
+def benchmarks(ledger, workdir):
+    """(name, setup, run) triples; setup's return value is passed to run"""
+    typed = open_storage(ledger).load_store().to_typed_frame()
+    rollup = MonthlyRollup.build(typed)
+    budget = Budget(ledger)
+    spending = reports.spending_data(rollup)
+    monthly = reports.monthly_data(rollup)
+    figure = reports.build_monthly_figure(monthly)
+    statement = os.path.join(workdir, f"statement_{BULK_ROWS}.csv")
+    if not os.path.exists(statement):
+        synthetic_ledger.generate(statement, BULK_ROWS, seed=1)
+
+    def cold_ledger():
+        _remove_derived(ledger)
+        return ledger
+
+    def single_inserts(path):
+        target = Budget(path)
+        for _ in range(SINGLE_INSERTS):
+            target.add_transaction(Transaction(125.0, "Food", "Benchmark", "", datetime(2024, 1, 1)))
+        target.close()
+
+    def bulk_insert(path):
+        storage = open_storage(path)
+        import_statement(statement, storage)
+        storage.close()
+
+    def monthly_pivot_pandas(frame):
+        return frame.pivot_table(
+            index=frame['Date'].dt.strftime('%Y-%m'),
+            columns='Category', values='Amount', aggfunc='sum', fill_value=0, observed=True
+        )
+
+    def export_png(fig):
+        fig.savefig(io.BytesIO(), format='png', dpi=300, bbox_inches='tight')
+
+    return [
+        ("load_cold", cold_ledger, lambda path: Budget(path)),
+        ("load_snapshot", lambda: ledger, lambda path: Budget(path)),
+        ("load_typed_frame", lambda: ledger, lambda path: open_storage(path).load_store().to_typed_frame()),
+        ("insert_single_x%d" % SINGLE_INSERTS, lambda: _scratch_copy(ledger, workdir), single_inserts),
+        ("insert_bulk_%d" % BULK_ROWS, lambda: _scratch_copy(ledger, workdir), bulk_insert),
+        ("summary", lambda: budget, lambda b: b.get_summary()),
+        ("rollup_build", lambda: typed, MonthlyRollup.build),
+        ("monthly_pivot_rollup", lambda: rollup, lambda r: r.monthly_category_totals()),
+        ("monthly_pivot_pandas", lambda: typed, monthly_pivot_pandas),
+        ("figure_spending", lambda: spending, reports.build_spending_figure),
+        ("figure_monthly", lambda: monthly, reports.build_monthly_figure),
+        ("render_monthly", lambda: figure, lambda fig: render_png(fig, 1180, 830)),
+        ("export_png_300dpi", lambda: figure, export_png),
+        ("export_csv", lambda: budget, lambda b: b.transactions.to_frame().to_csv(os.path.join(workdir, "export.csv"), index=False)),
+    ]
+
+
+def measure(setup, run, repeat, memory):
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - started)
+    peak_mb = None
+    if memory:
+        state = setup()
+        tracemalloc.start()
+        run(state)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "peak_mb": peak_mb,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r["rows"], r["benchmark"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} ({baseline['environment'].get('commit')})")
+    for result in results:
+        old = before.get((result["rows"], result["benchmark"]))
+        if old is None:
+            continue
+        ratio = result["min_s"] / old["min_s"] if old["min_s"] else float("inf")
+        print(f"{result['rows']:>10,}  {result['benchmark']:<24} {ratio:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ledger, report and export paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000],
+                        help="ledger sizes in rows (e.g. 10000 1000000 10000000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "financial_tracker_bench"))
+    parser.add_argument("--output", help="write JSON results here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for rows in args.sizes:
+        ledger = os.path.join(args.workdir, f"ledger_{rows}.csv")
+        if not os.path.exists(ledger):
+            print(f"Generating {rows:,} rows...")
+            synthetic_ledger.generate(ledger, rows)
+        for name, setup, run in benchmarks(ledger, args.workdir):
+            if args.only and name not in args.only:
+                continue
+            result = dict(rows=rows, benchmark=name, **measure(setup, run, args.repeat, not args.no_memory))
+            results.append(result)
+            peak = f"{result['peak_mb']:9.1f} MB" if result["peak_mb"] is not None else ""
+            print(f"{rows:>10,}  {name:<24} {result['min_s'] * 1000:10.1f} ms {peak}")
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
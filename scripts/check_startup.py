@@ -0,0 +1,67 @@
+"""Guard the application's import-time budget.
+
+Runs ``python -X importtime -c "import financial_tracker"`` in a fresh
+interpreter and fails if importing the app module takes longer than the
+budget, or if it pulls in any of the heavy modules that are meant to load
+lazily (the plotting stack, pandas/numpy and the calendar widget).
+
+    python scripts/check_startup.py [--budget-ms 200] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "financial_tracker"
+DEFERRED = ("matplotlib", "pandas", "numpy", "tkcalendar")
+
+
+def measure():
+    """Return ({module: cumulative_us}, stderr) for one cold import of the app"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {MODULE} failed:\n{result.stderr}")
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        try:
+            cumulative[name.strip()] = int(total)
+        except ValueError:
+            continue  # The header line
+    return cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=200.0)
+    parser.add_argument("--runs", type=int, default=5, help="best of N cold imports is compared")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    best_ms = min(run[MODULE] for run in runs) / 1000
+    eager = sorted({
+        name for run in runs for name in run
+        if name.split(".")[0] in DEFERRED
+    })
+
+    print(f"import {MODULE}: {best_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if eager:
+        print("Imported at startup but should be lazy: " + ", ".join(eager))
+        failed = True
+    if best_ms > args.budget_ms:
+        print("Startup import time is over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
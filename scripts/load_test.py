@@ -0,0 +1,203 @@
+"""Load test for summary_service.py on localhost.
+
+Either points at a running service (--url) or starts one on a scratch copy
+of a ledger (--ledger), so submitted transactions never touch the original.
+Each of --concurrency clients keeps one connection open and sends requests
+drawn from --mix for --duration seconds, then requests/second and latency
+percentiles are reported per endpoint:
+
+    python scripts/load_test.py --ledger transactions.csv --concurrency 32 --duration 10
+    python scripts/load_test.py --url http://127.0.0.1:8765 --mix summary=1,monthly=1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ui_styles import CATEGORIES  # noqa: E402
+
+DEFAULT_MIX = "summary=4,monthly=2,query=3,post=1"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"summary", "monthly", "query", "post"}
+    if unknown:
+        raise SystemExit(f"unknown request kinds in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def make_request(kind, rng, batch):
+    """(method, target, body) for one request of the given kind"""
+    year = rng.choice([2022, 2023, 2024])
+    month = rng.randint(1, 12)
+    if kind == "summary":
+        if rng.random() < 0.5:
+            return "GET", "/summary", b""
+        return "GET", f"/summary?start={year}-{month:02d}-01&end={year}-{month:02d}-28", b""
+    if kind == "monthly":
+        return "GET", "/monthly" if rng.random() < 0.5 else f"/monthly?start={year}-01-01&end={year}-12-31", b""
+    if kind == "query":
+        return "GET", (f"/query?start={year}-{month:02d}-01&end={year}-{month:02d}-28"
+                       f"&category={rng.choice(CATEGORIES)}&limit=50"), b""
+    rows = [
+        {
+            "date": f"{year}-{month:02d}-{rng.randint(1, 28):02d}",
+            "category": rng.choice(CATEGORIES),
+            "amount": round(rng.uniform(10, 2000), 2),
+            "description": "load test",
+        }
+        for _ in range(batch)
+    ]
+    return "POST", "/transactions", json.dumps(rows).encode()
+
+
+async def send(reader, writer, host, method, target, body):
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, mix, deadline, batch, seed, results):
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, target, body = make_request(kind, rng, batch)
+            started = time.perf_counter()
+            try:
+                status = await send(reader, writer, host, method, target, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                results.append((kind, time.perf_counter() - started, False))
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            results.append((kind, time.perf_counter() - started, status == 200))
+    finally:
+        writer.close()
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+
+def report(results, elapsed):
+    by_kind = {}
+    for kind, seconds, ok in results:
+        by_kind.setdefault(kind, []).append((seconds, ok))
+    by_kind["all"] = [(seconds, ok) for _, seconds, ok in results]
+    summary = {}
+    print(f"{'kind':<8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for kind, samples in sorted(by_kind.items(), key=lambda item: item[0] == "all"):
+        latencies = sorted(seconds for seconds, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        summary[kind] = {
+            "requests": len(samples),
+            "errors": errors,
+            "requests_per_second": len(samples) / elapsed,
+            "p50_ms": percentile(latencies, 0.5) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+        stats = summary[kind]
+        print(f"{kind:<8} {stats['requests']:>9,} {errors:>7,} {stats['requests_per_second']:>9,.0f}"
+              f" {stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+    return summary
+
+
+async def run(host, port, mix, concurrency, duration, batch):
+    results = []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        client(host, port, mix, deadline, batch, seed, results) for seed in range(concurrency)
+    ))
+    return results, time.perf_counter() - started
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_service(ledger, workdir):
+    """Start the service on a scratch copy of ledger; returns (process, port)"""
+    copy = os.path.join(workdir, os.path.basename(ledger))
+    shutil.copy(ledger, copy)
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "summary_service.py"), copy, "--port", str(port)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()  # Printed once the ledger is loaded and the port is open
+    if not line.startswith("Serving"):
+        process.kill()
+        raise SystemExit("the service failed to start")
+    print(line.strip())
+    return process, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the local summary service")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="a running service, e.g. http://127.0.0.1:8765")
+    target.add_argument("--ledger", help="start a service on a scratch copy of this ledger")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"request kinds and weights (default {DEFAULT_MIX}); post submits transactions")
+    parser.add_argument("--batch", type=int, default=5, help="transactions per POST")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    process = None
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    try:
+        if args.ledger:
+            process, port = start_service(args.ledger, workdir)
+            host = "127.0.0.1"
+        else:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        results, elapsed = asyncio.run(run(host, port, mix, args.concurrency, args.duration, args.batch))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = report(results, elapsed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"concurrency": args.concurrency, "duration": elapsed, "mix": mix, "results": summary}, f, indent=2)
+    return 1 if summary.get("all", {}).get("errors") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
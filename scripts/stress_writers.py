@@ -0,0 +1,223 @@
+"""Stress test for several processes writing one CSV ledger at once.
+
+Starts --processes writer processes (each with --threads threads) that all
+append to the same scratch ledger through CSVStorage, plus --readers
+processes that follow the ledger incrementally the way the app does. When
+the writers finish it checks that every row was written exactly once, that
+no line is malformed and that each reader ended up with every row, then
+reports appends/second, rows/second, append latency and how many appends
+each group commit carried:
+
+    python scripts/stress_writers.py --processes 8 --appends 200 --rows 3
+    python scripts/stress_writers.py --ledger transactions.csv --readers 2 --output stress.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ["Food", "Transportation", "Entertainment", "Utilities", "Shopping", "Other"]
+PREFIX = "stress "
+
+
+def _rows(rng, tag, count):
+    import pandas as pd
+
+    return pd.DataFrame({
+        "Date": [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(count)],
+        "Category": [rng.choice(CATEGORIES) for _ in range(count)],
+        "Amount": [round(rng.uniform(10, 2000), 2) for _ in range(count)],
+        "Description": [f"{PREFIX}{tag}-{k}" for k in range(count)],
+        "Note": "",
+    })
+
+
+def writer(path, number, threads, appends, rows, start, results):
+    """One writer process: threads x appends calls to CSVStorage.append"""
+    from storage import CSVStorage
+
+    storage = CSVStorage(path)
+    latencies = []
+
+    def work(thread):
+        rng = random.Random(number * 1000 + thread)
+        batches = [_rows(rng, f"w{number}-t{thread}-{i}", rows) for i in range(appends)]
+        start.wait()
+        for batch in batches:
+            started = time.perf_counter()
+            storage.append(batch)
+            latencies.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=work, args=(thread,)) for thread in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    results.put(("writer", number, {
+        "latencies": latencies,
+        "commits": storage.writer.commits,
+        "rows_committed": storage.writer.rows_committed,
+    }))
+
+
+def reader(path, number, interval, stop, results):
+    """Follows the ledger like the app's watcher: incremental reads, full reloads only when needed"""
+    from storage import CSVStorage
+
+    storage = CSVStorage(path)
+
+    def reload():
+        with storage.reading():
+            return len(storage.load()), storage.position()
+
+    count, position = reload()
+    results.put(("ready", number, None))
+    incremental = reloads = 0
+    while True:
+        stopping = stop.is_set()
+        appended = storage.read_appended(position)
+        if appended is None:
+            count, position = reload()
+            reloads += 1
+        else:
+            rows, position = appended
+            count += len(rows)
+            incremental += bool(len(rows))
+        if stopping:
+            break
+        time.sleep(interval)
+    results.put(("reader", number, {"rows": count, "incremental_reads": incremental, "reloads": reloads}))
+
+
+def verify(path, expected, before):
+    """Problems found in the final ledger (an empty list if it is intact)"""
+    import pandas as pd
+
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    problems = []
+    if list(frame.columns[:5]) != ["Date", "Category", "Amount", "Description", "Note"]:
+        problems.append(f"unexpected header: {list(frame.columns)}")
+    if len(frame) != before + len(expected):
+        problems.append(f"{len(frame):,} rows, expected {before + len(expected):,}")
+    bad = (pd.to_datetime(frame["Date"], format="%Y-%m-%d", errors="coerce").isna()
+           | pd.to_numeric(frame["Amount"], errors="coerce").isna())
+    if bad.any():
+        problems.append(f"{int(bad.sum()):,} malformed rows, e.g. {frame[bad].iloc[0].tolist()}")
+    written = frame["Description"][frame["Description"].str.startswith(PREFIX)].value_counts()
+    missing = expected.difference(written.index)
+    doubled = written[written > 1]
+    if len(missing):
+        problems.append(f"{len(missing):,} rows lost, e.g. {sorted(missing)[0]!r}")
+    if len(doubled):
+        problems.append(f"{len(doubled):,} rows written more than once, e.g. {doubled.index[0]!r}")
+    return problems, len(frame)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test concurrent appends to one CSV ledger")
+    parser.add_argument("--processes", type=int, default=8, help="writer processes")
+    parser.add_argument("--threads", type=int, default=1, help="writer threads per process")
+    parser.add_argument("--appends", type=int, default=100, help="appends per writer thread")
+    parser.add_argument("--rows", type=int, default=1, help="rows per append")
+    parser.add_argument("--readers", type=int, default=1, help="processes following the ledger as it grows")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between reader checks")
+    parser.add_argument("--ledger", help="start from a scratch copy of this ledger instead of an empty one")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    workdir = tempfile.mkdtemp(prefix="stress_writers_")
+    path = os.path.join(workdir, "ledger.csv")
+    before = 0
+    if args.ledger:
+        shutil.copy(args.ledger, path)
+        before = len(pd.read_csv(path, usecols=[0]))
+
+    start, stop = multiprocessing.Event(), multiprocessing.Event()
+    results = multiprocessing.Queue()
+    readers = [
+        multiprocessing.Process(target=reader, args=(path, number, args.interval, stop, results))
+        for number in range(args.readers)
+    ]
+    writers = [
+        multiprocessing.Process(
+            target=writer, args=(path, number, args.threads, args.appends, args.rows, start, results)
+        )
+        for number in range(args.processes)
+    ]
+    try:
+        for process in readers + writers:
+            process.start()
+        for _ in readers:
+            results.get()  # Each reader has loaded the ledger once
+        time.sleep(0.5)  # Let the writers build their rows so the clock only measures appends
+        started = time.perf_counter()
+        start.set()
+        collected = [results.get() for _ in writers]
+        elapsed = time.perf_counter() - started
+        stop.set()
+        collected += [results.get() for _ in readers]
+        for process in readers + writers:
+            process.join()
+
+        expected = pd.Index([
+            f"{PREFIX}w{number}-t{thread}-{i}-{k}"
+            for number in range(args.processes) for thread in range(args.threads)
+            for i in range(args.appends) for k in range(args.rows)
+        ])
+        problems, total = verify(path, expected, before)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    writers_done = [stats for kind, _, stats in collected if kind == "writer"]
+    latencies = sorted(seconds for stats in writers_done for seconds in stats["latencies"])
+    commits = sum(stats["commits"] for stats in writers_done)
+    for kind, number, stats in collected:
+        if kind == "reader" and stats["rows"] != total:
+            problems.append(f"reader {number} saw {stats['rows']:,} rows, the ledger has {total:,}")
+    summary = {
+        "processes": args.processes,
+        "threads": args.threads,
+        "appends": len(latencies),
+        "rows": len(expected),
+        "seconds": elapsed,
+        "appends_per_second": len(latencies) / elapsed,
+        "rows_per_second": len(expected) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "commits": commits,
+        "appends_per_commit": len(latencies) / commits if commits else float("nan"),
+        "readers": [stats for kind, _, stats in sorted(collected) if kind == "reader"],
+        "problems": problems,
+    }
+    print(f"{summary['appends']:,} appends ({summary['rows']:,} rows) from "
+          f"{args.processes} processes x {args.threads} threads in {elapsed:.2f} s")
+    print(f"{summary['appends_per_second']:,.0f} appends/s, {summary['rows_per_second']:,.0f} rows/s, "
+          f"p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms")
+    print(f"{commits:,} group commits, {summary['appends_per_commit']:.1f} appends per commit")
+    for number, stats in enumerate(summary["readers"]):
+        print(f"reader {number}: {stats['rows']:,} rows, {stats['incremental_reads']:,} incremental reads, "
+              f"{stats['reloads']:,} full reloads")
+    print("ledger intact" if not problems else "\n".join(f"FAIL: {problem}" for problem in problems))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
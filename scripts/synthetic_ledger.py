@@ -0,0 +1,107 @@
+"""Generate synthetic ledgers for benchmarking.
+
+Rows use the app's real CATEGORIES. Each category has its own frequency,
+log-normal amount distribution and pool of merchant descriptions. Dates are
+spread over a span of years with more spending on weekends and in December.
+Output is deterministic for a given seed and is written in chunks, so even
+10M-row ledgers are generated in bounded memory.
+
+    python scripts/synthetic_ledger.py transactions.csv --rows 1000000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui_styles import CATEGORIES  # noqa: E402
+
+# Relative frequency, median amount (BDT) and spread (sigma of log amount)
+PROFILES = {
+    "Food": (0.34, 350, 0.8),
+    "Transportation": (0.20, 150, 0.7),
+    "Utilities": (0.06, 2500, 0.5),
+    "Entertainment": (0.08, 800, 0.9),
+    "Shopping": (0.14, 1500, 1.1),
+    "Healthcare": (0.05, 1200, 1.0),
+    "Education": (0.04, 4000, 0.8),
+    "Other": (0.09, 500, 1.2),
+}
+MERCHANTS = {
+    "Food": ["Grocery", "Restaurant", "Cafe", "Bakery", "Food delivery"],
+    "Transportation": ["Bus fare", "Ride share", "Fuel", "Train ticket", "Parking"],
+    "Utilities": ["Electricity bill", "Water bill", "Gas bill", "Internet", "Mobile recharge"],
+    "Entertainment": ["Cinema", "Streaming", "Concert", "Games", "Books"],
+    "Shopping": ["Clothing", "Electronics", "Home goods", "Online order", "Gifts"],
+    "Healthcare": ["Pharmacy", "Doctor visit", "Lab test", "Dental", "Optician"],
+    "Education": ["Tuition", "Course fee", "Stationery", "Exam fee", "Textbooks"],
+    "Other": ["Cash withdrawal", "Donation", "Repair", "Fees", "Misc"],
+}
+
+
+def day_weights(start, days):
+    """Relative likelihood of spending on each day; weekends and December are busier"""
+    day_dates = np.datetime64(start, 'D') + np.arange(days)
+    weekday = (day_dates.view('int64') - 4) % 7  # 0 = Monday
+    month = day_dates.astype('datetime64[M]').astype(int) % 12 + 1
+    weights = np.where(weekday >= 5, 1.4, 1.0) * np.where(month == 12, 1.3, 1.0)
+    return day_dates, weights
+
+
+def generate_frame(rows, rng, day_dates, weights):
+    """One chronologically sorted chunk of transactions drawn from day_dates"""
+    categories = np.array(CATEGORIES)
+    frequencies = np.array([PROFILES[c][0] for c in CATEGORIES])
+    codes = rng.choice(len(CATEGORIES), size=rows, p=frequencies / frequencies.sum())
+
+    medians = np.array([PROFILES[c][1] for c in CATEGORIES])
+    sigmas = np.array([PROFILES[c][2] for c in CATEGORIES])
+    amounts = np.round(rng.lognormal(np.log(medians[codes]), sigmas[codes]), 2)
+
+    dates = np.sort(rng.choice(day_dates, size=rows, p=weights / weights.sum()))
+
+    merchant_pick = rng.integers(0, 5, size=rows)
+    descriptions = [MERCHANTS[categories[c]][m] for c, m in zip(codes, merchant_pick)]
+
+    return pd.DataFrame({
+        "Date": pd.to_datetime(dates).strftime("%Y-%m-%d"),
+        "Category": categories[codes],
+        "Amount": amounts,
+        "Description": descriptions,
+        "Note": "",
+    })
+
+
+def generate(path, rows, seed=0, start="2020-01-01", years=3, chunk_rows=1_000_000):
+    """Write a synthetic ledger of `rows` transactions to path, oldest first"""
+    rng = np.random.default_rng(seed)
+    day_dates, weights = day_weights(start, int(365.25 * years))
+    chunks = max(1, -(-rows // chunk_rows))
+    # Each chunk covers its own slice of the date range so the file stays in order
+    bounds = np.linspace(0, len(day_dates), chunks + 1).astype(int)
+    with open(path, "w", newline="") as f:
+        for index in range(chunks):
+            count = rows // chunks + (1 if index < rows % chunks else 0)
+            lo, hi = bounds[index], max(bounds[index + 1], bounds[index] + 1)
+            frame = generate_frame(count, rng, day_dates[lo:hi], weights[lo:hi])
+            frame.to_csv(f, header=index == 0, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic ledger CSV")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2020-01-01")
+    parser.add_argument("--years", type=float, default=3)
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.seed, args.start, args.years)
+    print(f"Wrote {args.rows:,} transactions to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Safe access to one CSV ledger from several threads and processes.
+
+LedgerLock is an advisory lock on ``<ledger>.lock`` (fcntl.flock): readers
+share it and writers hold it alone, so nobody reads half an append or a
+half-rewritten file. Where fcntl isn't available (Windows) it only
+coordinates threads within one process.
+
+GroupCommitWriter appends rows with a group commit that works across
+processes. Each writer drops its rows into ``<ledger>.spool/`` as a file of
+CSV lines, then takes the lock; whoever gets it first appends *every*
+spooled file in one write and one fsync, and writers whose rows were taken
+along find their file gone and return straight away. Under load, many
+appends share each write instead of queueing up for one each.
+
+A commit records the ledger size and the spool files it is about to append
+in ``<ledger>.spool/commit.json`` before writing. If a writer dies
+mid-commit, the next one cuts the ledger back to that size and appends the
+files again, so rows are never lost or doubled.
+"""
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads in this process are still kept apart
+    fcntl = None
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+class LedgerLock:
+    """Shared/exclusive advisory lock for a ledger file.
+
+    Re-entrant within a thread: nested ``shared()`` or ``exclusive()`` blocks
+    reuse the lock already held, except that a shared hold can't be upgraded.
+    """
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._held = threading.local()
+        with _thread_locks_guard:
+            # Without flock, one RLock per ledger stands in for the file lock
+            self._fallback = _thread_locks.setdefault(os.path.abspath(self.path), threading.RLock())
+
+    @contextlib.contextmanager
+    def _hold(self, exclusive):
+        mode = getattr(self._held, 'mode', None)
+        if mode is not None:
+            if exclusive and mode == 'shared':
+                raise RuntimeError("Can't take an exclusive ledger lock while holding a shared one")
+            yield
+            return
+        if fcntl is None:
+            with self._fallback:
+                self._held.mode = 'exclusive' if exclusive else 'shared'
+                try:
+                    yield
+                finally:
+                    self._held.mode = None
+            return
+        # A descriptor per hold: flock treats each one as a separate owner,
+        # so threads of one process exclude each other like processes do
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._held.mode = 'exclusive' if exclusive else 'shared'
+            try:
+                yield
+            finally:
+                self._held.mode = None
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def shared(self):
+        return self._hold(False)
+
+    def exclusive(self):
+        return self._hold(True)
+
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class GroupCommitWriter:
+    """Appends CSV rows to a ledger, batching concurrent appends into one write."""
+    def __init__(self, path, lock, columns):
+        self.path = path
+        self.lock = lock
+        self.columns = list(columns)
+        self.spool = path + ".spool"
+        self.marker = os.path.join(self.spool, "commit.json")
+        self._sequence = 0
+        self._sequence_lock = threading.Lock()
+        self.commits = 0  # Commits this writer made, and rows in them
+        self.rows_committed = 0
+
+    def _spool_name(self):
+        with self._sequence_lock:
+            self._sequence += 1
+            sequence = self._sequence
+        # Sorts in arrival order across processes; pid and sequence keep names unique
+        return f"{time.time_ns():020d}-{os.getpid()}-{sequence}"
+
+    def append(self, text):
+        """Append CSV lines (no header, in ``columns`` order); returns once they are on disk"""
+        if not text:
+            return
+        os.makedirs(self.spool, exist_ok=True)
+        name = self._spool_name()
+        path = os.path.join(self.spool, name + ".rows")
+        with open(path + ".tmp", "w", newline='') as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+        with self.lock.exclusive():
+            if os.path.exists(path):  # Otherwise another writer committed it for us
+                self.commit()
+
+    def commit(self):
+        """Append everything spooled so far; the caller holds the exclusive lock"""
+        self._recover()
+        try:
+            names = sorted(name for name in os.listdir(self.spool) if name.endswith(".rows"))
+        except FileNotFoundError:
+            return 0
+        if not names:
+            return 0
+        chunks = []
+        for name in names:
+            with open(os.path.join(self.spool, name), "rb") as f:
+                chunks.append(f.read())
+        rows = b"".join(chunks)
+        data = self._ledger_bytes(rows)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+        with open(self.marker + ".tmp", "w") as f:
+            json.dump({"size": size, "files": names}, f)
+            _fsync(f)
+        os.replace(self.marker + ".tmp", self.marker)
+        with open(self.path, "ab") as f:
+            f.write(data)
+            _fsync(f)
+        for name in names:
+            os.remove(os.path.join(self.spool, name))
+        os.remove(self.marker)
+        self.commits += 1
+        self.rows_committed += rows.count(b"\n")
+        return len(names)
+
+    def _ledger_bytes(self, rows):
+        """Spooled rows as bytes to append, with a header for a new file and in the file's column order"""
+        try:
+            with open(self.path, "rb") as f:
+                header = f.readline().decode().strip()
+                f.seek(-1, os.SEEK_END)
+                ends_with_newline = f.read(1) == b"\n"
+        except (FileNotFoundError, OSError):
+            header, ends_with_newline = "", True
+        if not header:
+            return (",".join(self.columns) + "\n").encode() + rows
+        if header.split(",") != self.columns:
+            import pandas as pd
+
+            frame = pd.read_csv(io.BytesIO(rows), header=None, names=self.columns, dtype=str, keep_default_na=False)
+            rows = frame.reindex(columns=header.split(",")).to_csv(header=False, index=False).encode()
+        return rows if ends_with_newline else b"\n" + rows
+
+    def _recover(self):
+        """Finish or redo a commit whose writer died part-way"""
+        try:
+            with open(self.marker) as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return
+        remaining = [name for name in marker["files"] if os.path.exists(os.path.join(self.spool, name))]
+        if len(remaining) == len(marker["files"]):
+            # Nothing was cleared up yet, so the append may be partial: undo it and retry
+            if os.path.exists(self.path) and os.path.getsize(self.path) > marker["size"]:
+                os.truncate(self.path, marker["size"])
+        else:
+            # The append was synced before any spool file went; just finish clearing up
+            for name in remaining:
+                os.remove(os.path.join(self.spool, name))
+        os.remove(self.marker)
@@ -0,0 +1,232 @@
+"""Binary columnar snapshots of CSV ledgers.
+
+A snapshot lives in ``<ledger>.snapshot/`` and holds one ``.npy`` file per
+TransactionStore array plus ``meta.json`` with the categories, the string
+table and a fingerprint of the CSV it was built from. Arrays are loaded with
+``np.load(mmap_mode='r')``, so opening a snapshot costs the same for ten rows
+or ten million.
+
+The fingerprint is the CSV's size, mtime and a hash of the whole file. An
+unchanged size and mtime means the snapshot is current without reading the
+CSV. When the CSV has only grown since the snapshot was taken (the usual case
+for an append-only ledger), the bytes the snapshot was built from still hash
+the same, so just the new tail is parsed and the snapshot is rewritten. Any
+other change, including an edit that keeps the size, rebuilds it from the CSV.
+
+Following a ledger as it grows uses ``appended_fingerprint`` instead, which
+only re-reads a window of bytes before the old end of the file, so its cost
+depends on what was appended rather than on the size of the ledger.
+"""
+import hashlib
+import io
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+from transaction_store import TransactionStore
+
+VERSION = 4  # 2: amounts stored as int64 paisa; 3: whole-file hash; 4: tail hash
+HASH_CHUNK = 1 << 20
+TAIL_WINDOW = 1 << 16  # Bytes before the end of the file covered by tail_hash
+TAIL_KEYS = ("size", "mtime_ns", "tail_hash", "ends_with_newline")
+
+
+def snapshot_dir(csv_path):
+    return csv_path + ".snapshot"
+
+
+def _hash_range(f, start, end, hasher):
+    f.seek(start)
+    while start < end:
+        chunk = f.read(min(HASH_CHUNK, end - start))
+        if not chunk:
+            raise OSError("File shrank while it was being hashed")
+        hasher.update(chunk)
+        start += len(chunk)
+    return hasher
+
+
+def _tail_hash(f, size):
+    """Hash of the TAIL_WINDOW bytes of an open file that end at size"""
+    return _hash_range(f, max(0, size - TAIL_WINDOW), size, hashlib.blake2b(digest_size=16)).hexdigest()
+
+
+def _tail_fingerprint(f, stat):
+    size = stat.st_size
+    tail_hash = _tail_hash(f, size)
+    f.seek(max(0, size - 1))
+    return {
+        "size": size,
+        "mtime_ns": stat.st_mtime_ns,
+        "tail_hash": tail_hash,
+        "ends_with_newline": size == 0 or f.read(1) == b"\n",
+    }
+
+
+def _fingerprint(f, stat, hasher, start):
+    """Fingerprint of an open file, hashing on from `start` with a hasher that has seen the bytes before it"""
+    _hash_range(f, start, stat.st_size, hasher)
+    return dict(_tail_fingerprint(f, stat), hash=hasher.hexdigest())
+
+
+def fingerprint(csv_path):
+    """Size, mtime and hash of the whole file, and whether it ends with a newline"""
+    with open(csv_path, "rb") as f:
+        return _fingerprint(f, os.fstat(f.fileno()), hashlib.blake2b(digest_size=16), 0)
+
+
+def grown_fingerprint(csv_path, previous):
+    """Fingerprint of the file if it has only had bytes appended since `previous`, else None.
+
+    The same size and mtime count as unchanged without reading the file.
+    Otherwise the file is hashed once: the first ``previous["size"]`` bytes
+    must hash as before, and the hash then carries on over the new ones.
+    """
+    with open(csv_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if (stat.st_size, stat.st_mtime_ns) == (previous["size"], previous["mtime_ns"]):
+            return {key: previous[key] for key in ("hash", *TAIL_KEYS)}
+        if stat.st_size < previous["size"] or not previous["ends_with_newline"]:
+            return None  # Truncated, or the last row was cut short and may have been finished since
+        hasher = _hash_range(f, 0, previous["size"], hashlib.blake2b(digest_size=16))
+        if hasher.hexdigest() != previous["hash"]:
+            return None
+        return _fingerprint(f, stat, hasher, previous["size"])
+
+
+def tail_fingerprint(csv_path):
+    """Size, mtime, a hash of the last TAIL_WINDOW bytes and whether the file ends with a newline"""
+    with open(csv_path, "rb") as f:
+        return _tail_fingerprint(f, os.fstat(f.fileno()))
+
+
+def appended_fingerprint(csv_path, previous):
+    """tail_fingerprint of the file if it has only had bytes appended since `previous`, else None.
+
+    Only the TAIL_WINDOW bytes before the old end of the file are read back,
+    so the check costs the same for any size of ledger. A file that kept its
+    size but not its mtime counts as rewritten.
+    """
+    with open(csv_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size == previous["size"]:
+            if stat.st_mtime_ns != previous["mtime_ns"]:
+                return None
+            return {key: previous[key] for key in TAIL_KEYS}
+        if stat.st_size < previous["size"] or not previous["ends_with_newline"]:
+            return None  # Truncated, or the last row was cut short and may have been finished since
+        if _tail_hash(f, previous["size"]) != previous["tail_hash"]:
+            return None
+        return _tail_fingerprint(f, stat)
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == VERSION else None
+
+
+def read_snapshot(directory, meta):
+    """Memory-map the arrays a meta.json points at"""
+    columns = {}
+    for name in TransactionStore.ARRAYS:
+        column = name.lstrip('_')
+        path = os.path.join(directory, f"{column}.{meta['generation']}.npy")
+        columns[column] = np.load(path, mmap_mode='r')
+        if len(columns[column]) != meta["rows"]:
+            raise ValueError(f"Snapshot column {column} has the wrong length")
+    return TransactionStore.from_columns(columns, meta["categories"], meta["strings"])
+
+
+def _write_meta(directory, meta):
+    tmp_path = os.path.join(directory, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+
+def write_snapshot(store, csv_path, source):
+    """Write store as the snapshot of csv_path; source is the CSV fingerprint it matches"""
+    directory = snapshot_dir(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    generation = uuid.uuid4().hex
+    for column, values in store.columns().items():
+        np.save(os.path.join(directory, f"{column}.{generation}.npy"), np.ascontiguousarray(values))
+    meta = dict(
+        source,
+        version=VERSION,
+        generation=generation,
+        rows=len(store),
+        categories=store.categories,
+        strings=store.strings,
+    )
+    _write_meta(directory, meta)
+
+    # Readers that mapped an old generation keep their open files. Anything
+    # else left over, such as another process's snapshot written at the same
+    # time, goes too; a reader that then finds its files gone rebuilds from the CSV.
+    for name in os.listdir(directory):
+        if name.endswith(".npy") and not name.endswith(f".{generation}.npy"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def parse_tail(csv_path, offset):
+    """The rows from byte offset to the end of a CSV, parsed with the file's header"""
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        tail = f.read()
+    with span("csv.read", part="tail"):
+        return pd.read_csv(io.BytesIO(header + tail))
+
+
+def load_store(csv_path):
+    """TransactionStore for a CSV ledger, via its snapshot when that is still valid"""
+    return load_store_and_fingerprint(csv_path)[0]
+
+
+def load_store_and_fingerprint(csv_path):
+    """load_store, plus the fingerprint of the CSV the store was read from"""
+    directory = snapshot_dir(csv_path)
+    meta = _read_meta(directory)
+    store = None
+    # The snapshot still applies if the bytes it was built from are unchanged
+    current = grown_fingerprint(csv_path, meta) if meta is not None else None
+    if current is not None:
+        try:
+            with span("snapshot.read"):
+                store = read_snapshot(directory, meta)
+        except (OSError, ValueError):
+            store = None
+        if store is not None and current["size"] == meta["size"]:
+            if current["mtime_ns"] != meta["mtime_ns"]:
+                # Touched but not changed: remember the new mtime so the next load skips the hash
+                try:
+                    _write_meta(directory, dict(meta, mtime_ns=current["mtime_ns"]))
+                except OSError:
+                    pass
+            return store, current
+        if store is not None:
+            store.extend_frame(parse_tail(csv_path, meta["size"]))
+
+    if store is None:
+        current = fingerprint(csv_path)
+        with span("csv.read", part="full"):
+            frame = pd.read_csv(csv_path)
+        store = TransactionStore.from_frame(frame)
+    try:
+        with span("snapshot.write"):
+            write_snapshot(store, csv_path, current)
+    except OSError:
+        pass  # The snapshot is only a cache; the CSV is still the source of truth
+    return store, current
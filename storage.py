@@ -0,0 +1,642 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+from instrumentation import span
+from rollup import MonthlyRollup
+from shared_ledger import GroupCommitWriter, LedgerLock
+from transaction_store import PAISA, TransactionStore
+
+COLUMNS = ['Date', 'Category', 'Amount', 'Description', 'Note']
+# SQLite keeps taka as REAL; sum whole paisa so totals come out exact
+_PAISA_SQL = f"CAST(ROUND(amount * {PAISA}) AS INTEGER)"
+
+
+class LedgerConflict(ValueError):
+    """The ledger changed on disk since it was read, so a rewrite would lose those changes."""
+
+
+class LedgerStorage:
+    """Base class for the places a ledger can be kept."""
+    # Backends that can answer GROUP BY queries without loading every row
+    aggregates_natively = False
+    # Backends whose signature() means the same thing across processes, so
+    # files derived from the ledger can be cached on disk against it
+    stable_signature = False
+
+    def close(self):
+        pass
+
+    def exists(self):
+        raise NotImplementedError
+
+    def signature(self):
+        """Token that changes when the ledger is modified by someone else"""
+        raise NotImplementedError
+
+    def load(self):
+        """Return every transaction as a DataFrame with string dates"""
+        raise NotImplementedError
+
+    def load_store(self):
+        """Return every valid transaction as a columnar TransactionStore"""
+        return TransactionStore.from_frame(self.load())
+
+    def append(self, rows):
+        """Append a DataFrame of new transactions"""
+        raise NotImplementedError
+
+    def replace(self, rows, expected=None):
+        """Overwrite the whole ledger with a DataFrame of transactions.
+
+        If expected is given and signature() no longer matches it, raises
+        LedgerConflict instead (for backends that can check atomically).
+        """
+        raise NotImplementedError
+
+    def reading(self):
+        """Context in which several reads see the same ledger, with other writers held off"""
+        return contextlib.nullcontext()
+
+    def writing(self):
+        """Context in which writes and the reads after them happen with other writers held off"""
+        return contextlib.nullcontext()
+
+    def position(self):
+        """Token for read_appended, or None if this backend can't read just the new rows"""
+        return None
+
+    def read_appended(self, position):
+        """(rows appended since position, new position), or None if the ledger changed some other way"""
+        return None
+
+    def load_store_and_position(self):
+        """load_store() and the position() of the ledger it was read from"""
+        return self.load_store(), self.position()
+
+    def category_totals(self, start=None, end=None):
+        """Total amount per category, optionally limited to a date range"""
+        raise NotImplementedError
+
+    def monthly_category_totals(self, start=None, end=None):
+        """Month x category table of total amounts"""
+        raise NotImplementedError
+
+    def monthly_rollup(self, start=None, end=None):
+        """MonthlyRollup of the transactions dated start..end"""
+        return MonthlyRollup.from_view(self.load_store().query(start, end))
+
+    def date_span(self):
+        """First and last transaction dates as 'YYYY-MM-DD', or None if there are none"""
+        dates = self.load_store().dates
+        if not len(dates):
+            return None
+        return tuple(str(day) for day in np.array([dates.min(), dates.max()]).astype('datetime64[D]'))
+
+    @staticmethod
+    def _normalize(df):
+        """Make sure every ledger column is present, in the standard order"""
+        return df.reindex(columns=COLUMNS)
+
+    @staticmethod
+    def _rows(rows):
+        """Plain Python tuples in COLUMNS order, with dates as 'YYYY-MM-DD'"""
+        rows = LedgerStorage._normalize(rows)
+        dates = pd.to_datetime(rows['Date']).dt.strftime('%Y-%m-%d')
+        return zip(
+            dates,
+            rows['Category'].astype(str),
+            pd.to_numeric(rows['Amount']).astype(float),
+            rows['Description'].fillna('').astype(str),
+            rows['Note'].fillna('').astype(str),
+        )
+
+
+class CSVStorage(LedgerStorage):
+    """Ledger kept in a plain CSV file.
+
+    Safe to share between processes: reads take a shared LedgerLock, appends
+    go through a GroupCommitWriter and rewrites replace the file atomically
+    under the exclusive lock (see shared_ledger).
+    """
+    stable_signature = True
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = LedgerLock(path)
+        self.writer = GroupCommitWriter(path, self.lock, COLUMNS)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def signature(self):
+        """Return (mtime, size) of the file, or None if it does not exist"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def columns(self):
+        """Read only the header line of the file"""
+        with open(self.path, newline='') as f:
+            header = f.readline().strip()
+        return header.split(',') if header else []
+
+    def load(self):
+        with self.lock.shared():
+            if not os.path.exists(self.path):
+                return self._normalize(pd.DataFrame())
+            with span("csv.read", part="full"):
+                return self._normalize(pd.read_csv(self.path))
+
+    def load_store(self):
+        # Served from the memory-mapped binary snapshot when it is still valid
+        with self.lock.shared():
+            if not os.path.exists(self.path):
+                return TransactionStore()
+            return snapshot.load_store(self.path)
+
+    def append(self, rows):
+        # Written in the file's own column order by whichever writer commits it
+        self.writer.append(self._normalize(rows).to_csv(header=False, index=False))
+
+    def replace(self, rows, expected=None):
+        with self.lock.exclusive():
+            self.writer.commit()  # Appends already waiting are part of the ledger being replaced
+            if expected is not None and self.signature() != expected:
+                raise LedgerConflict("The ledger changed on disk since it was read")
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", newline='') as f:
+                self._normalize(rows).to_csv(f, index=False)
+                _fsync(f)
+            os.replace(tmp_path, self.path)
+
+    def reading(self):
+        return self.lock.shared()
+
+    def writing(self):
+        return self.lock.exclusive()
+
+    def load_store_and_position(self):
+        # The position comes from the fingerprint the snapshot was checked against
+        with self.lock.shared():
+            if not os.path.exists(self.path):
+                return TransactionStore(), None
+            inode = os.stat(self.path).st_ino
+            store, current = snapshot.load_store_and_fingerprint(self.path)
+        return store, dict({key: current[key] for key in snapshot.TAIL_KEYS}, inode=inode)
+
+    def position(self):
+        """The file's inode, size, mtime and a hash of its last bytes (see snapshot.tail_fingerprint)"""
+        try:
+            with self.lock.shared():
+                return dict(snapshot.tail_fingerprint(self.path), inode=os.stat(self.path).st_ino)
+        except OSError:
+            return None
+
+    def read_appended(self, position):
+        if position is None:
+            return None
+        with self.lock.shared():
+            try:
+                if os.stat(self.path).st_ino != position["inode"]:
+                    return None  # Replaced
+                current = snapshot.appended_fingerprint(self.path, position)
+            except OSError:
+                return None
+            if current is None:
+                return None  # Rewritten or truncated
+            current["inode"] = position["inode"]
+            if current["size"] == position["size"]:
+                return self._normalize(pd.DataFrame()), current
+            with span("csv.read", part="appended"):
+                rows = snapshot.parse_tail(self.path, position["size"])
+        return self._normalize(rows), current
+
+    def category_totals(self, start=None, end=None):
+        # Summed in paisa over the snapshot's columns rather than a float re-parse of the CSV
+        return self.load_store().query(start, end).category_totals()
+
+    def monthly_category_totals(self, start=None, end=None):
+        return self.load_store().query(start, end).monthly_category_totals()
+
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class JournaledStorage(CSVStorage):
+    """CSV snapshot plus an append-only journal of newer transactions.
+
+    Appends go to ``<ledger>.journal`` as one JSON object per line and are
+    fsynced in groups: every ``commit_every`` rows or ``commit_interval``
+    seconds, whichever comes first. Loading replays the journal on top of the
+    snapshot and ignores a torn final line. Once the journal holds
+    ``compact_threshold`` rows it is rotated out and merged into the snapshot
+    on a background thread, so appends never wait for a full rewrite.
+
+    Before a rotated journal is merged, the snapshot's signature is recorded
+    in ``<ledger>.journal.base``. After a crash, a rotated journal whose base
+    still matches the snapshot has not been merged yet and is replayed;
+    otherwise it is already part of the snapshot and is discarded.
+
+    Other processes may share the ledger. Appends, rotation and the whole
+    read-merge-write of a compaction hold the exclusive LedgerLock, and rows
+    other writers spooled for the CSV are committed first, so none of them
+    land between the read and the rewrite. The LedgerLock is always taken
+    before the in-process lock.
+    """
+    def __init__(self, path, commit_every=64, commit_interval=1.0, compact_threshold=10_000):
+        super().__init__(path)
+        self.journal_path = path + ".journal"
+        self.compacting_path = path + ".journal.compacting"
+        self.base_path = path + ".journal.base"
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._journal = None
+        self._uncommitted = 0
+        self._commit_timer = None
+        self._compactor = None
+        with self.lock.exclusive():
+            self._recover()
+            self._trim_torn_tail()
+        self._journal_rows = len(self._read_journal(self.journal_path))
+
+    def _recover(self):
+        """Finish or discard a merge that was interrupted by a crash; caller holds the exclusive lock"""
+        if os.path.exists(self.compacting_path):
+            if self._read_base() == super().signature():
+                self._merge()
+            else:
+                os.remove(self.compacting_path)
+        if os.path.exists(self.base_path):
+            os.remove(self.base_path)
+
+    def _trim_torn_tail(self):
+        """Cut a half-written last line off the journal so new rows start cleanly"""
+        try:
+            with open(self.journal_path, "rb+") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    f.truncate(end)
+        except FileNotFoundError:
+            pass
+
+    def _read_base(self):
+        try:
+            with open(self.base_path) as f:
+                base = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return tuple(base) if base is not None else None
+
+    def _read_journal(self, path):
+        records = []
+        try:
+            with open(path, newline='') as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # Torn write from a crash
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return self._normalize(pd.DataFrame(records))
+
+    def exists(self):
+        return super().exists() or os.path.exists(self.journal_path) or os.path.exists(self.compacting_path)
+
+    def position(self):
+        return None  # New rows go to the journal, not the end of the CSV
+
+    def load_store_and_position(self):
+        return self.load_store(), None
+
+    def signature(self):
+        snapshot = super().signature() or (0, 0)
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except OSError:
+            journal_size = 0
+        return (*snapshot, journal_size)
+
+    def load(self):
+        with self.lock.shared(), self._lock:
+            frames = [super().load()]
+            if os.path.exists(self.compacting_path):
+                frames.append(self._read_journal(self.compacting_path))
+            frames.append(self._read_journal(self.journal_path))
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return self._normalize(pd.DataFrame())
+        return pd.concat(frames, ignore_index=True)
+
+    def load_store(self):
+        with self.lock.shared(), self._lock:
+            store = super().load_store()
+            if os.path.exists(self.compacting_path):
+                store.extend_frame(self._read_journal(self.compacting_path))
+            store.extend_frame(self._read_journal(self.journal_path))
+        return store
+
+    def append(self, rows):
+        lines = "".join(
+            json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in self._rows(rows)
+        )
+        # Exclusive, like CSV appends: another process may be rotating the journal
+        with self.lock.exclusive(), self._lock:
+            self._open_journal()
+            self._journal.write(lines)
+            self._journal.flush()
+            self._uncommitted += len(rows)
+            self._journal_rows += len(rows)
+            if self._uncommitted >= self.commit_every:
+                self._commit()
+            elif self._commit_timer is None:
+                # Bound how long a quiet journal can go without an fsync
+                self._commit_timer = threading.Timer(self.commit_interval, self.sync)
+                self._commit_timer.daemon = True
+                self._commit_timer.start()
+        if self._journal_rows >= self.compact_threshold:
+            self.compact()
+
+    def _open_journal(self):
+        """Open the journal for appending, or reopen it if another process rotated it away"""
+        if self._journal is not None:
+            try:
+                rotated = os.stat(self.journal_path).st_ino != os.fstat(self._journal.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = True
+            if not rotated:
+                return
+            self._commit()
+            self._journal.close()
+            self._journal_rows = 0
+        self._journal = open(self.journal_path, "a", newline='')
+
+    def _commit(self):
+        if self._commit_timer is not None:
+            self._commit_timer.cancel()
+            self._commit_timer = None
+        if self._journal is not None and self._uncommitted:
+            _fsync(self._journal)
+        self._uncommitted = 0
+
+    def sync(self):
+        """Force any buffered journal rows to disk"""
+        with self._lock:
+            self._commit()
+
+    def _rotate(self):
+        """Move the journal aside for merging; caller holds both locks"""
+        if os.path.exists(self.compacting_path):
+            self._merge()  # An earlier merge failed part-way; don't overwrite it
+        self._commit()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        with open(self.base_path, "w") as f:
+            json.dump(super().signature(), f)
+            _fsync(f)
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, self.compacting_path)
+        else:
+            open(self.compacting_path, "w").close()
+        self._journal_rows = 0
+
+    def _write_snapshot(self, df):
+        """Atomically rewrite the CSV; caller holds the exclusive lock"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", newline='') as f:
+            self._normalize(df).to_csv(f, index=False)
+            _fsync(f)
+        os.replace(tmp_path, self.path)
+
+    def _finish_rotation(self):
+        os.remove(self.compacting_path)
+        os.remove(self.base_path)
+
+    def _merge(self):
+        """Fold the rotated journal into a new snapshot; caller holds the exclusive lock"""
+        frames = [super().load(), self._read_journal(self.compacting_path)]
+        frames = [frame for frame in frames if not frame.empty]
+        merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        with self._lock:
+            self._write_snapshot(merged)
+            self._finish_rotation()
+
+    def _wait_for_compaction(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def compact(self, wait=False):
+        """Merge the journal into the snapshot on a background thread"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if self._journal_rows == 0:
+                return
+            self._compactor = threading.Thread(target=self._compact, daemon=True)
+            self._compactor.start()
+        if wait:
+            self._wait_for_compaction()
+
+    def _compact(self):
+        # One exclusive hold from the rotation to the rewrite, so the CSV can't
+        # change underneath the merge and the recorded base stays valid
+        with self.lock.exclusive():
+            self.writer.commit()  # CSV rows other writers spooled go in first
+            with self._lock:
+                if not os.path.exists(self.journal_path) and not os.path.exists(self.compacting_path):
+                    return  # Merged by a replace or another process in the meantime
+                self._rotate()
+            self._merge()
+
+    def replace(self, rows, expected=None):
+        with self.lock.exclusive():
+            self.writer.commit()
+            with self._lock:
+                if expected is not None and self.signature() != expected:
+                    raise LedgerConflict("The ledger changed on disk since it was read")
+                self._rotate()
+                self._write_snapshot(rows)
+                self._finish_rotation()
+
+    def close(self):
+        self._wait_for_compaction()
+        with self._lock:
+            self._commit()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+class SQLiteStorage(LedgerStorage):
+    """Ledger kept in an SQLite database with indexes on date and category."""
+    aggregates_natively = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            note TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_date
+            ON transactions (date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_category_date
+            ON transactions (category, date);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # The app opens ledgers on a loader thread and then uses them from Tk
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def exists(self):
+        return self.conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone() is not None
+
+    def signature(self):
+        # data_version only moves when another connection commits
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load(self):
+        df = pd.read_sql_query(
+            "SELECT date AS Date, category AS Category, amount AS Amount,"
+            " description AS Description, note AS Note"
+            " FROM transactions ORDER BY id",
+            self.conn
+        )
+        return self._normalize(df)
+
+    def append(self, rows):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO transactions (date, category, amount, description, note)"
+                " VALUES (?, ?, ?, ?, ?)",
+                self._rows(rows)
+            )
+
+    def replace(self, rows, expected=None):
+        with self.conn:
+            # Take the write lock first, so nobody commits between the check and the rewrite
+            self.conn.execute("BEGIN IMMEDIATE")
+            if expected is not None and self.signature() != expected:
+                raise LedgerConflict("The ledger changed on disk since it was read")
+            self.conn.execute("DELETE FROM transactions")
+            self.conn.executemany(
+                "INSERT INTO transactions (date, category, amount, description, note)"
+                " VALUES (?, ?, ?, ?, ?)",
+                self._rows(rows)
+            )
+
+    @staticmethod
+    def _date_filter(start, end, column="date"):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def category_totals(self, start=None, end=None):
+        where, params = self._date_filter(start, end)
+        rows = self.conn.execute(
+            f"SELECT category, SUM({_PAISA_SQL}) FROM transactions{where}"
+            " GROUP BY category ORDER BY category",
+            params
+        ).fetchall()
+        return pd.Series(
+            [total / PAISA for _, total in rows],
+            index=pd.Index([category for category, _ in rows], name='Category'),
+            name='Amount',
+            dtype=float
+        )
+
+    def monthly_category_totals(self, start=None, end=None):
+        where, params = self._date_filter(start, end)
+        df = pd.read_sql_query(
+            f"SELECT substr(date, 1, 7) AS Month, category AS Category,"
+            f" SUM({_PAISA_SQL}) AS Paisa FROM transactions{where}"
+            " GROUP BY Month, Category",
+            self.conn,
+            params=params
+        )
+        table = df.pivot(index='Month', columns='Category', values='Paisa').fillna(0) / PAISA
+        table.index.name = 'Date'
+        return table.sort_index()
+
+    def monthly_rollup(self, start=None, end=None):
+        where, params = self._date_filter(start, end)
+        rollup = MonthlyRollup()
+        for month, category, total, count, low, high in self.conn.execute(
+            f"SELECT substr(date, 1, 7), category, SUM({_PAISA_SQL}), COUNT(*),"
+            f" MIN({_PAISA_SQL}), MAX({_PAISA_SQL})"
+            f" FROM transactions{where} GROUP BY 1, 2",
+            params
+        ):
+            rollup.cells[(month, category)] = [total, count, low, high]
+        return rollup
+
+    def date_span(self):
+        first, last = self.conn.execute("SELECT MIN(date), MAX(date) FROM transactions").fetchone()
+        return None if first is None else (first, last)
+
+
+def open_storage(path, journal=False):
+    """Pick a storage backend from the ledger file's extension"""
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteStorage(path)
+    if journal or os.path.exists(path + ".journal") or os.path.exists(path + ".journal.compacting"):
+        # A ledger with a journal is read through it, or its newest rows would be missed
+        return JournaledStorage(path)
+    return CSVStorage(path)
+
+
+def migrate_csv_to_sqlite(csv_path, db_path, chunksize=100_000):
+    """One-shot copy of a CSV ledger into an SQLite ledger; returns the row count"""
+    target = SQLiteStorage(db_path)
+    count = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk = chunk.dropna(subset=['Date', 'Amount', 'Category'])
+            target.append(chunk)
+            count += len(chunk)
+    finally:
+        target.close()
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate a CSV ledger into SQLite")
+    parser.add_argument("csv_path")
+    parser.add_argument("db_path")
+    args = parser.parse_args()
+    rows = migrate_csv_to_sqlite(args.csv_path, args.db_path)
+    print(f"Migrated {rows} transactions to {args.db_path}")
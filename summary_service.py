@@ -0,0 +1,497 @@
+"""Local HTTP service answering summary queries from one in-memory ledger.
+
+The ledger is loaded once into a TransactionStore plus a MonthlyRollup, and
+requests are answered from those, or from a cache of encoded responses,
+instead of re-reading the file each time. Endpoints (all JSON):
+
+    GET  /summary?start=&end=                 totals per category
+    GET  /monthly?start=&end=                 month x category totals
+    GET  /query?start=&end=&category=&min=&max=&limit=&offset=
+                                              matching transactions, by date
+    POST /transactions                        a list of {date, category,
+                                              amount, description, note}
+    GET  /health
+
+Submitted batches are group-committed: one writer task takes every batch
+waiting at that moment and appends them all to storage in a single write,
+then folds them into the store and rollup and drops the cached responses.
+Like saves in the app and statement imports, rows the ledger already has
+are skipped, so a client that retries a POST never writes a row twice, and
+the reply lists the monthly budget limits the new rows went over.
+The server speaks just enough HTTP/1.1 (with keep-alive) for local clients
+and needs nothing outside the standard library and the app's own modules.
+
+    python summary_service.py transactions.csv --port 8765
+"""
+import asyncio
+import json
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from budget_limits import BudgetLimits
+from fingerprints import FingerprintIndex, frame_fingerprints, store_fingerprints
+from instrumentation import span
+from report_cache import ReportCache
+from rollup import MonthlyRollup
+from storage import COLUMNS, open_storage
+from transaction_store import PAISA, LedgerView, TransactionStore
+
+MAX_BODY = 8 * 2**20
+MAX_BATCH_ROWS = 50_000
+MAX_COMMIT_ROWS = 200_000
+MAX_QUERY_LIMIT = 10_000
+# Times a commit re-reads a ledger that other programs keep writing before it appends anyway
+MAX_COMMIT_RETRIES = 3
+# Seconds between checks for writes by other programs (e.g. the GUI)
+RELOAD_CHECK_INTERVAL = 1.0
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def _param(params, name, convert=str):
+    values = params.get(name)
+    if not values or values[-1] == '':
+        return None
+    try:
+        return convert(values[-1])
+    except ValueError:
+        raise HTTPError(400, f"bad value for {name}: {values[-1]!r}") from None
+
+
+def _date_range(params):
+    start, end = _param(params, 'start'), _param(params, 'end')
+    for value in (start, end):
+        try:
+            if value is not None and pd.isna(pd.Timestamp(value)):
+                raise ValueError(value)
+        except ValueError:
+            raise HTTPError(400, f"bad date: {value!r}") from None
+    return start, end
+
+
+def parse_rows(body):
+    """Ledger DataFrame from a JSON list of transactions; HTTPError 400 unless every one is valid"""
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPError(400, "body is not valid JSON") from None
+    if isinstance(items, dict):
+        items = items.get("transactions")
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        raise HTTPError(400, "expected a non-empty list of transaction objects")
+    if len(items) > MAX_BATCH_ROWS:
+        raise HTTPError(413, f"at most {MAX_BATCH_ROWS:,} transactions per request")
+
+    frame = pd.DataFrame([{str(key).lower(): value for key, value in item.items()} for item in items])
+    frame = frame.reindex(columns=[column.lower() for column in COLUMNS])
+    frame.columns = COLUMNS
+    dates = pd.to_datetime(frame['Date'], errors='coerce', format='%Y-%m-%d')
+    amounts = pd.to_numeric(frame['Amount'], errors='coerce')
+    categories = frame['Category'].fillna('').astype(str).str.strip()
+    bad = (dates.isna() | ~(amounts > 0) | (categories == '')).to_numpy()
+    if bad.any():
+        raise HTTPError(400, f"transaction {int(np.flatnonzero(bad)[0])} needs a YYYY-MM-DD date,"
+                             " a positive amount and a category")
+    frame['Date'] = dates.dt.strftime('%Y-%m-%d')
+    frame['Amount'] = amounts.astype(float)
+    frame['Category'] = categories
+    for column in ('Description', 'Note'):
+        frame[column] = frame[column].fillna('').astype(str)
+    return frame
+
+
+class LedgerService:
+    """The ledger state behind the HTTP endpoints.
+
+    Everything except storage I/O runs on the event loop thread, so handlers
+    read the store and rollup without locks. Storage calls go to a single
+    worker thread, which also keeps SQLite connections on the thread that
+    opened them.
+    """
+    def __init__(self, path, journal=False, cache_bytes=16 * 2**20):
+        self.path = path
+        self.journal = journal
+        self.storage = None
+        self.store = TransactionStore()
+        self.rollup = MonthlyRollup()
+        self.limits = BudgetLimits.load(path + ".limits.json")
+        self.fingerprints = FingerprintIndex()
+        self.version = 0  # Bumped on every change; part of every cache key
+        self.cache = ReportCache(max_bytes=cache_bytes, max_entries=4096)
+        self.commits = 0
+        self._io = ThreadPoolExecutor(max_workers=1)
+        self._signature = None
+        self._position = None
+        self._checked = 0.0
+        self._lock = None
+        self._pending = None
+        self._writer = None
+        self._getters = {
+            '/summary': self.summary,
+            '/monthly': self.monthly,
+            '/query': self.query,
+            '/health': self.health,
+        }
+
+    async def _run_io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, func, *args)
+
+    async def start(self):
+        self._lock = asyncio.Lock()
+        self._pending = asyncio.Queue()
+        self.storage = await self._run_io(open_storage, self.path, self.journal)
+        async with self._lock:
+            await self._reload()
+        self._writer = asyncio.create_task(self._commit_loop())
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+        if self.storage is not None:
+            await self._run_io(self.storage.close)
+        self._io.shutdown()
+
+    def _read(self):
+        with self.storage.reading():
+            signature = self.storage.signature()
+            store, position = TransactionStore(), None
+            if self.storage.exists():
+                store, position = self.storage.load_store_and_position()
+        # The index the app and importer keep beside the ledger, while it matches
+        fingerprints = None
+        if self.storage.stable_signature:
+            fingerprints = FingerprintIndex.load(self.path + ".fingerprints.npz", signature)
+        if fingerprints is None:
+            fingerprints = FingerprintIndex.from_store(store)
+        return store, MonthlyRollup.from_view(store.view()), fingerprints, signature, position
+
+    def _read_appended(self):
+        with self.storage.reading():
+            appended = self.storage.read_appended(self._position)
+            return None if appended is None else (*appended, self.storage.signature())
+
+    async def _reload(self):
+        with span("service.load"):
+            self.store, self.rollup, self.fingerprints, self._signature, self._position = \
+                await self._run_io(self._read)
+        self.limits.rebuild(self.rollup)
+        self._changed()
+
+    async def _catch_up(self):
+        """Fold in rows appended since the ledger was last read, or reload it if it changed otherwise"""
+        appended = await self._run_io(self._read_appended)
+        if appended is None:
+            await self._reload()
+            return
+        rows, self._position, self._signature = appended
+        if len(rows):
+            self._extend(rows)
+
+    def _extend(self, frame):
+        added = TransactionStore.from_frame(frame)
+        rollup = MonthlyRollup.from_view(added.view())
+        self.store.extend_store(added)
+        self.rollup.merge(rollup)
+        self.limits.add_rollup(rollup)
+        self.fingerprints.add(store_fingerprints(added))
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self.cache.clear()
+        self._checked = time.monotonic()
+
+    async def check_for_changes(self):
+        """Catch up if another program wrote the ledger; checks at most once per interval"""
+        if time.monotonic() - self._checked < RELOAD_CHECK_INTERVAL or self._lock.locked():
+            return  # Checked recently, or a commit is about to bring things up to date
+        async with self._lock:
+            self._checked = time.monotonic()
+            if await self._run_io(self.storage.signature) != self._signature:
+                await self._catch_up()
+
+    # Writes
+
+    async def submit(self, frame):
+        """Queue rows for the next group commit; returns its reply (see _commit)"""
+        done = asyncio.get_running_loop().create_future()
+        await self._pending.put((frame, done))
+        return await done
+
+    async def _commit_loop(self):
+        while True:
+            # Everything queued while the previous write ran goes out in one write
+            batch = [await self._pending.get()]
+            rows = len(batch[0][0])
+            while not self._pending.empty() and rows < MAX_COMMIT_ROWS:
+                batch.append(self._pending.get_nowait())
+                rows += len(batch[-1][0])
+            try:
+                async with self._lock:
+                    replies = await self._commit([frame for frame, _ in batch])
+            except Exception as e:
+                for _, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+            else:
+                for (_, done), reply in zip(batch, replies):
+                    if not done.done():
+                        done.set_result(reply)
+
+    def _append_new(self, frame, hashes, force):
+        """Append the rows of frame the ledger doesn't have yet.
+
+        Returns (new rows mask, whether another program had written, signature),
+        or None without writing if another program changed the ledger since we
+        last read it and force is false: its rows must be read first, or
+        duplicates of them would get through.
+        """
+        with self.storage.writing():
+            external = self.storage.signature() != self._signature
+            if external and not force:
+                return None
+            new = ~self.fingerprints.duplicates(hashes)
+            if new.any():
+                self.storage.append(frame[new])
+            return new, external, self.storage.signature()
+
+    async def _commit(self, frames):
+        """Write the new rows of several submitted frames at once; returns one reply per frame"""
+        frame = pd.concat(frames, ignore_index=True)
+        hashes = frame_fingerprints(frame)
+        with span("service.commit", rows=len(frame)):
+            for attempt in range(MAX_COMMIT_RETRIES + 1):
+                written = await self._run_io(self._append_new, frame, hashes, attempt == MAX_COMMIT_RETRIES)
+                if written is not None:
+                    break
+                await self._catch_up()
+        new, external, signature = written
+        self.commits += 1
+        try:
+            if self._position is not None:
+                # Read back our rows, and any another process committed along with them
+                await self._catch_up()
+            elif external:
+                # Someone else wrote too, so the store can't just be extended
+                await self._reload()
+            else:
+                self._signature = signature
+                self._extend(frame[new])
+        except Exception:
+            # The rows are on disk, so the clients must not retry; the next
+            # check or commit sees the stale signature and reads the ledger again
+            self._signature = None
+        replies = []
+        offset = 0
+        for part in frames:
+            added = part[new[offset:offset + len(part)]]
+            offset += len(part)
+            replies.append({
+                "accepted": len(added),
+                "duplicates": len(part) - len(added),
+                "version": self.version,
+                "over_limit": self._over_limit(added),
+            })
+        return replies
+
+    def _over_limit(self, rows):
+        """The limits that are over budget in the months and categories of rows"""
+        statuses = {}
+        months = pd.to_datetime(rows['Date']).dt.strftime('%Y-%m')
+        for month, category in set(zip(months, rows['Category'])):
+            for status in self.limits.status(month, category):
+                if status.exceeded:
+                    statuses[(status.month, status.category)] = {
+                        "month": status.month, "category": status.category,
+                        "limit": status.limit, "spent": round(status.spent, 2),
+                    }
+        return sorted(statuses.values(), key=lambda status: (status["month"], status["category"] or ""))
+
+    # Reads
+
+    def _selection(self, params):
+        start, end = _date_range(params)
+        if start is None and end is None:
+            return None  # The whole ledger: answer from the rollup
+        return self.store.query(start, end)
+
+    def summary(self, params):
+        view = self._selection(params)
+        if view is None:
+            totals = self.rollup.category_totals()
+            count = sum(cell[1] for cell in self.rollup.cells.values())
+        else:
+            totals, count = view.category_totals(), len(view)
+        return {
+            "version": self.version,
+            "count": int(count),
+            "total": round(float(totals.sum()), 2),
+            "categories": {str(name): float(total) for name, total in totals.items()},
+        }
+
+    def monthly(self, params):
+        view = self._selection(params)
+        table = self.rollup.monthly_category_totals() if view is None else view.monthly_category_totals()
+        return {
+            "version": self.version,
+            "months": [str(month) for month in table.index],
+            "categories": [str(name) for name in table.columns],
+            "totals": table.round(2).to_numpy().tolist(),
+        }
+
+    def query(self, params):
+        start, end = _date_range(params)
+        categories = [
+            name for value in params.get('category', []) for name in value.split(',') if name
+        ] or None
+        limit = _param(params, 'limit', int)
+        limit = 100 if limit is None else max(0, min(limit, MAX_QUERY_LIMIT))
+        offset = max(0, _param(params, 'offset', int) or 0)
+        view = self.store.query(
+            start, end, categories, _param(params, 'min', float), _param(params, 'max', float)
+        )
+        page = LedgerView(self.store, view.rows[offset:offset + limit]).to_frame()
+        return {
+            "version": self.version,
+            "count": len(view),
+            "total": int(view.paisa.sum()) / PAISA,
+            "transactions": page.to_dict('records'),
+        }
+
+    def health(self, params):
+        return {"version": self.version, "rows": len(self.store), "commits": self.commits}
+
+    async def handle(self, method, target, body):
+        """(status, JSON body bytes) for one request"""
+        url = urlsplit(target)
+        try:
+            with span("service.request", endpoint=url.path):
+                if url.path == '/transactions':
+                    if method != 'POST':
+                        raise HTTPError(405, "use POST")
+                    return 200, _encode(await self.submit(parse_rows(body)))
+                getter = self._getters.get(url.path)
+                if getter is None:
+                    raise HTTPError(404, f"no endpoint {url.path}")
+                if method != 'GET':
+                    raise HTTPError(405, "use GET")
+                await self.check_for_changes()
+                key = (self.version, url.path, tuple(sorted(parse_qsl(url.query))))
+                response = self.cache.get(key)
+                if response is None:
+                    response = _encode(getter(parse_qs(url.query)))
+                    self.cache.put(key, response, len(response))
+                return 200, response
+        except HTTPError as e:
+            return e.status, _encode({"error": str(e)})
+        except Exception as e:
+            return 500, _encode({"error": f"{type(e).__name__}: {e}"})
+
+
+def _response(status, body, keep_alive):
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+async def handle_connection(service, reader, writer):
+    """Serve requests on one connection until the client closes it or asks to"""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                break
+            request_line, *header_lines = head.decode('latin-1').split("\r\n")
+            parts = request_line.split(" ")
+            if len(parts) != 3:
+                break
+            method, target, version = parts
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY:
+                writer.write(_response(413, _encode({"error": "request body too large"}), False))
+                await writer.drain()
+                break
+            body = await reader.readexactly(length) if length else b""
+            status, payload = await service.handle(method, target, body)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(path, host="127.0.0.1", port=8765, journal=False):
+    """Load the ledger and serve it until SIGINT/SIGTERM or cancellation"""
+    service = LedgerService(path, journal)
+    await service.start()
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(service, reader, writer), host, port
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Not on this platform; Ctrl+C still raises KeyboardInterrupt
+    print(f"Serving {path} ({len(service.store):,} transactions) on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    import argparse
+
+    import instrumentation
+
+    parser = argparse.ArgumentParser(description="Serve ledger summaries over HTTP on this machine")
+    parser.add_argument("ledger", nargs="?", default="transactions.csv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--journal", action="store_true",
+                        help="append through a journal (CSV ledgers), for cheaper durable commits")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure(args.metrics, args.profile)
+    try:
+        asyncio.run(serve(args.ledger, args.host, args.port, args.journal))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
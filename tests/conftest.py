@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class Root:
+    def after(self, ms, callback, *args):
+        pass
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    """The ledger side of the app on a two-row CSV ledger, without building the window"""
+    from financial_tracker import FinancialTracker
+    from report_cache import ReportCache
+    from storage import CSVStorage
+
+    ledger = str(tmp_path / "ledger.csv")
+    CSVStorage(ledger).append(pd.DataFrame({
+        'Date': ['2024-01-01', '2024-01-02'],
+        'Category': 'Food',
+        'Amount': [10.0, 20.0],
+        'Description': ['first', 'second'],
+        'Note': '',
+    }))
+    app = FinancialTracker.__new__(FinancialTracker)
+    app.transactions_file = ledger
+    app.rollup_file = ledger + ".rollup.json"
+    app.limits_file = ledger + ".limits.json"
+    app.fingerprints_file = ledger + ".fingerprints.npz"
+    app.root = Root()
+    app.history = None
+    app.report_cache = ReportCache()
+    app.ledger_version = 0
+    app._update_limit_status = lambda *args: None
+    app.storage = CSVStorage(ledger)
+    app.load_transactions()
+    return app
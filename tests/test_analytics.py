@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import financial_tracker
+import reports
+from analytics import SpendingAnalysis
+from report_worker import ReportWorker
+
+STATISTICS = ('values', 'rolling_mean', 'change', 'change_pct', 'typical', 'zscores', 'outliers', 'forecast')
+
+
+def monthly_table(start, months, seed):
+    rng = np.random.default_rng(seed)
+    index = pd.period_range(start, periods=months, freq='M').astype(str)
+    return pd.DataFrame(
+        rng.gamma(2.0, 500.0, size=(months, 3)).round(2), index=index, columns=['Food', 'Rent', 'Shopping']
+    )
+
+
+def assert_same_analysis(updated, full):
+    for name in STATISTICS:
+        pd.testing.assert_frame_equal(getattr(updated, name), getattr(full, name), check_freq=False, obj=name)
+
+
+@pytest.mark.parametrize('changed_from', [None, 0, 5, 30, 39])
+def test_updated_matches_a_full_rebuild(changed_from):
+    old = monthly_table('2021-01', 40, seed=1)
+    new = pd.concat([old, monthly_table('2024-05', 7, seed=2)])
+    if changed_from is not None:
+        new.iloc[changed_from:changed_from + 2, 1] += 1234.5
+    assert_same_analysis(SpendingAnalysis(old).updated(new), SpendingAnalysis(new))
+
+
+def test_updated_falls_back_to_a_full_rebuild():
+    old = monthly_table('2021-01', 24, seed=3)
+    earlier = pd.concat([monthly_table('2020-06', 7, seed=4), old])
+    assert_same_analysis(SpendingAnalysis(old).updated(earlier), SpendingAnalysis(earlier))
+    wider = old.assign(Travel=100.0)
+    assert_same_analysis(SpendingAnalysis(old).updated(wider), SpendingAnalysis(wider))
+
+
+def test_updated_returns_itself_when_nothing_changed():
+    analysis = SpendingAnalysis(monthly_table('2021-01', 24, seed=5))
+    assert analysis.updated(analysis.values.drop(columns='Total')) is analysis
+
+
+class Root:
+    def after(self, ms, callback, *args):
+        pass
+
+
+def finish(worker):
+    """Wait for the job to put its result, without letting the Tk side see it"""
+    deadline = time.monotonic() + 10
+    while worker._results.empty():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def trends(tracker, monkeypatch):
+    monkeypatch.setattr(financial_tracker, 'render_png', lambda fig, width, height: b'png')
+    monkeypatch.setattr(reports, 'build_monthly_figure', lambda data: object())
+    tracker._trend_analysis = None
+    tracker._ledger_ready = lambda: True
+    tracker.report_worker = ReportWorker(Root())
+    tracker.shown = []
+    tracker.show_chart_window = lambda *args, **kwargs: tracker.shown.append(args)
+    return tracker
+
+
+def test_trend_analysis_is_kept_on_the_tk_thread(trends):
+    trends.show_monthly_trends_chart()
+    finish(trends.report_worker)
+    assert trends._trend_analysis is None
+    trends.report_worker._poll()
+    assert len(trends.shown) == 1
+    assert trends._trend_analysis is not None
+    assert list(trends._trend_analysis.months.astype(str)) == ['2024-01']
+
+
+def test_cancelled_trends_leave_the_analysis_alone(trends):
+    trends.show_monthly_trends_chart()
+    finish(trends.report_worker)
+    trends.report_worker.cancel()
+    trends.report_worker._poll()
+    assert trends.shown == []
+    assert trends._trend_analysis is None
@@ -0,0 +1,19 @@
+import pandas as pd
+
+from budget_limits import BudgetLimits
+from rollup import MonthlyRollup
+
+
+def test_add_rollup_matches_adding_rows_one_by_one():
+    rows = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-01-03", "2024-01-09", "2024-02-01", "2024-02-02"]),
+        "Category": ["Food", "Food", "Shopping", "Food"],
+        "Amount": [60.0, 50.25, 30.0, 10.0],
+    })
+    one_by_one = BudgetLimits(overall=100, categories={"Food": 100})
+    for row in rows.itertuples(index=False):
+        one_by_one.add(row.Date.strftime("%Y-%m"), row.Category, row.Amount)
+    grouped = BudgetLimits(overall=100, categories={"Food": 100})
+    exceeded = grouped.add_rollup(MonthlyRollup.build(rows))
+    assert grouped._spent == one_by_one._spent
+    assert {(status.month, status.category) for status in exceeded} == {("2024-01", None), ("2024-01", "Food")}
@@ -0,0 +1,70 @@
+import json
+import random
+import re
+
+import pytest
+
+from categorizer import DEFAULT_RULES, Categorizer
+
+
+def naive(rules, description):
+    """Leftmost whole-word keyword, longest first at the same position, checked rule by rule"""
+    keywords = {}
+    for category, words in rules.items():
+        for word in words:
+            keywords[" ".join(word.lower().split())] = category
+    text = " ".join(description.lower().split())
+    best = None
+    for keyword, category in keywords.items():
+        match = re.search(rf'(?<!\w){re.escape(keyword)}(?!\w)', text)
+        if match and (best is None or (match.start(), -len(keyword)) < best[0]):
+            best = ((match.start(), -len(keyword)), category)
+    return best[1] if best else None
+
+
+def test_built_in_rules():
+    categorizer = Categorizer()
+    assert categorizer.categorize("Foodpanda order #123") == "Food"
+    assert categorizer.categorize("DESCO prepaid recharge") == "Utilities"
+    assert categorizer.categorize("  PATHAO   FOOD  dinner") == "Food"  # Longest at the same position
+    assert categorizer.categorize("Pathao ride") == "Transportation"
+    assert categorizer.categorize("busy week") is None  # Whole words only
+    assert categorizer.categorize("") is None
+
+
+def test_matches_a_rule_by_rule_scan():
+    words = [word for keywords in DEFAULT_RULES.values() for word in keywords] + ["bus-stand", "xyz", "café"]
+    rng = random.Random(3)
+    categorizer = Categorizer()
+    for _ in range(2000):
+        description = " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+        description = description.upper() if rng.random() < 0.3 else description
+        assert categorizer.categorize(description) == naive(DEFAULT_RULES, description), description
+
+
+def test_categorize_many_matches_categorize():
+    categorizer = Categorizer()
+    descriptions = ["KFC Gulshan", None, "DESCO", "KFC Gulshan", "nothing here", float("nan")]
+    assert categorizer.categorize_many(descriptions).tolist() == [
+        "Food", None, "Utilities", "Food", None, None
+    ]
+
+
+def test_user_rules_extend_and_override_the_built_in_ones(tmp_path):
+    path = tmp_path / "ledger.csv.rules.json"
+    path.write_text(json.dumps({
+        "Food": ["kacchi bhai"],
+        "Shopping": ["Jamuna Future Park", "pathao"],
+        "Not a category": ["anything"],
+    }))
+    categorizer = Categorizer.load(str(path))
+    assert categorizer.categorize("Kacchi Bhai Dhanmondi") == "Food"
+    assert categorizer.categorize("jamuna  future park") == "Shopping"
+    assert categorizer.categorize("pathao ride") == "Shopping"
+    assert categorizer.categorize("anything") is None
+    assert Categorizer.load(str(tmp_path / "missing.json")).categorize("pathao ride") == "Transportation"
+
+
+def test_unknown_categories_in_rules_are_refused():
+    with pytest.raises(ValueError):
+        Categorizer({"Gadgets": ["phone"]})
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+
+import pandas as pd
+import pytest
+
+from exporter import ExportCancelled, ExportJob, export_format, export_view
+from transaction_store import TransactionStore
+
+
+@pytest.fixture
+def view():
+    store = TransactionStore.from_frame(pd.DataFrame({
+        'Date': [f"2024-{month:02d}-{day:02d}" for month in range(1, 13) for day in (5, 20)],
+        'Category': ['Food', 'Shopping'] * 12,
+        'Amount': [100.25 + i for i in range(24)],
+        'Description': [f"row {i}, with a comma" for i in range(24)],
+        'Note': ['', 'ünïcode'] * 12,
+    }))
+    return store.query(start='2024-03-01')
+
+
+def read_back(path):
+    fmt, compression = export_format(path)
+    if fmt == 'parquet':
+        frame = pd.read_parquet(path)
+        frame['Date'] = pd.to_datetime(frame['Date']).dt.strftime('%Y-%m-%d')
+        return frame
+    if fmt == 'csv':
+        return pd.read_csv(path, compression=compression, keep_default_na=False, dtype={'Date': str})
+    return pd.read_json(path, lines=True, compression=compression, convert_dates=False)
+
+
+@pytest.mark.parametrize("name", ["out.csv", "out.csv.gz", "out.jsonl", "out.JSONL.GZ", "out.csv.zst", "out.parquet"])
+def test_formats_round_trip(view, tmp_path, name):
+    if name.endswith('.zst'):
+        pytest.importorskip('zstandard')
+    if name.endswith('.parquet'):
+        pytest.importorskip('pyarrow')
+    path = str(tmp_path / name)
+    status = export_view(view, path, chunksize=7)
+    assert status.done and status.rows_written == len(view) == 20
+    expected = view.to_frame()
+    pd.testing.assert_frame_equal(read_back(path)[expected.columns.tolist()], expected, check_dtype=False)
+    assert os.listdir(tmp_path) == [name]
+
+
+@pytest.mark.parametrize("name, package", [("out.csv.zst", "zstandard"), ("out.parquet", "pyarrow")])
+def test_missing_optional_package_is_a_clear_error(view, tmp_path, monkeypatch, name, package):
+    monkeypatch.setitem(sys.modules, package, None)  # import now raises ImportError
+    with pytest.raises(ValueError, match=package):
+        export_view(view, str(tmp_path / name))
+    assert os.listdir(tmp_path) == []
+
+
+def test_unknown_extension_is_refused():
+    with pytest.raises(ValueError):
+        export_format("ledger.xlsx")
+
+
+def test_cancelled_export_leaves_no_file(view, tmp_path):
+    chunks = []
+    with pytest.raises(ExportCancelled):
+        export_view(view, str(tmp_path / "out.csv"), chunksize=5,
+                    progress=chunks.append, cancelled=lambda: len(chunks) >= 2)
+    assert os.listdir(tmp_path) == []
+
+
+def test_export_job_reports_progress_until_done(view, tmp_path):
+    path = str(tmp_path / "out.csv.gz")
+    job = ExportJob(view, path, chunksize=3).start()
+    deadline = time.monotonic() + 10
+    status = job.poll()
+    while not status.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+        status = job.poll()
+    assert status.done and not status.cancelled and status.error is None
+    assert status.rows_written == status.rows_total == 20
+    assert len(read_back(path)) == 20
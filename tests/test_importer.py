@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+import importer
+from fingerprints import FingerprintIndex
+from storage import CSVStorage
+
+
+@pytest.fixture
+def statement(tmp_path):
+    path = tmp_path / "statement.csv"
+    pd.DataFrame({
+        'Date': ['2024-03-01', '2024-03-02', '2024-03-02'],
+        'Amount': [120.0, 45.5, 45.5],
+        'Category': ['Food', 'Transportation', 'Transportation'],
+        'Description': ['Cafe', 'Bus', 'Bus'],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_reimport_skips_rows_using_saved_index(tmp_path, statement, monkeypatch):
+    ledger = str(tmp_path / "ledger.csv")
+    index_file = ledger + ".fingerprints.npz"
+    storage = CSVStorage(ledger)
+    storage.append(pd.DataFrame({'Date': ['2024-01-01'], 'Category': ['Food'], 'Amount': [10.0]}))
+
+    first = importer.import_statement(statement, storage, fingerprints_file=index_file)
+    assert (first.rows_imported, first.rows_duplicate) == (3, 0)
+    assert FingerprintIndex.load(index_file, storage.signature()) is not None
+
+    def rebuild(store):
+        raise AssertionError("the saved index should have been used")
+
+    monkeypatch.setattr(FingerprintIndex, "from_store", classmethod(lambda cls, store: rebuild(store)))
+    second = importer.import_statement(statement, storage, fingerprints_file=index_file)
+    assert (second.rows_imported, second.rows_duplicate) == (0, 3)
+    assert len(storage.load()) == 4
+
+
+def test_index_not_saved_when_someone_else_wrote(tmp_path, statement):
+    ledger = str(tmp_path / "ledger.csv")
+    index_file = ledger + ".fingerprints.npz"
+    storage = CSVStorage(ledger)
+    storage.append(pd.DataFrame({'Date': ['2024-01-01'], 'Category': ['Food'], 'Amount': [10.0]}))
+    other = CSVStorage(ledger)
+
+    def progress(status):
+        other.append(pd.DataFrame({'Date': ['2024-01-05'], 'Category': ['Food'], 'Amount': [5.0]}))
+
+    importer.import_statement(statement, storage, chunksize=1, progress=progress, fingerprints_file=index_file)
+    assert FingerprintIndex.load(index_file, storage.signature()) is None
+    fingerprints, _ = importer.ledger_fingerprints(storage, index_file)
+    assert len(fingerprints) == len(storage.load())
@@ -0,0 +1,23 @@
+import glob
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_sources_lint_clean():
+    api = pytest.importorskip("pyflakes.api")
+    from pyflakes.reporter import Reporter
+
+    class Messages:
+        def __init__(self):
+            self.lines = []
+
+        def write(self, text):
+            self.lines.append(text)
+
+    messages = Messages()
+    paths = [path for pattern in ("*.py", "scripts/*.py", "tests/*.py") for path in glob.glob(os.path.join(ROOT, pattern))]
+    warnings = sum(api.checkPath(path, Reporter(messages, messages)) for path in sorted(paths))
+    assert warnings == 0, "".join(messages.lines)
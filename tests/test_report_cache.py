@@ -0,0 +1,41 @@
+import pandas as pd
+
+from report_cache import ReportCache
+
+
+def test_least_recently_used_entries_go_first():
+    cache = ReportCache(max_bytes=100, max_entries=3)
+    cache.put(('a', 1), 'A', 40)
+    cache.put(('b', 1), 'B', 40)
+    assert cache.get(('a', 1)) == 'A'
+    cache.put(('c', 1), 'C', 40)  # Over max_bytes: evicts b, the least recently used
+    assert cache.get(('b', 1)) is None
+    assert cache.get(('a', 1)) == 'A' and cache.get(('c', 1)) == 'C'
+    assert cache.size == 80
+    cache.put(('c', 1), 'C2', 10)
+    assert cache.size == 50
+    for key in 'def':
+        cache.put((key, 1), key, 1)
+    assert len(cache) == 3
+
+
+def test_values_bigger_than_the_cache_are_not_kept():
+    cache = ReportCache(max_bytes=100)
+    cache.put('small', 1, 10)
+    cache.put('huge', 2, 1000)
+    assert cache.get('huge') is None
+    assert cache.get('small') == 1
+    assert cache.size == 10
+
+
+def test_ledger_changes_clear_the_cache_and_bump_the_version(tracker):
+    from storage import CSVStorage
+
+    tracker.report_cache.put(('spending', tracker.ledger_version), 'old', 10)
+    version = tracker.ledger_version
+    CSVStorage(tracker.transactions_file).append(pd.DataFrame({
+        'Date': ['2024-01-03'], 'Category': ['Food'], 'Amount': [5.0], 'Description': ['new'], 'Note': [''],
+    }))
+    tracker.refresh_transactions()
+    assert tracker.ledger_version > version
+    assert len(tracker.report_cache) == 0
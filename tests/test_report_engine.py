@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import report_engine
+from rollup import MonthlyRollup
+from storage import CSVStorage
+from transaction_store import TransactionStore
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    rng = np.random.default_rng(7)
+    days = pd.Timestamp('2021-03-01') + pd.to_timedelta(rng.integers(0, 1000, 3000), unit='D')
+    path = str(tmp_path / "ledger.csv")
+    CSVStorage(path).append(pd.DataFrame({
+        'Date': days.strftime('%Y-%m-%d'),  # Out of date order, as after back-dated entries
+        'Category': rng.choice(['Food', 'Rent', 'Shopping'], len(days)),
+        'Amount': rng.integers(1, 100_000, len(days)) / 100,
+        'Description': '',
+        'Note': '',
+    }))
+    return path
+
+
+def test_years_match_the_whole_ledger_without_sorting_in_workers(ledger, monkeypatch):
+    whole = MonthlyRollup.from_view(CSVStorage(ledger).load_store().view())
+    items = report_engine.partitions([ledger], by_year=True)
+    assert [item[1][:4] for item in items] == ['2021', '2022', '2023']
+    assert sum(len(item[3][1]) for item in items) == 3000
+
+    def no_query(*args, **kwargs):
+        raise AssertionError("a worker rebuilt the date index")
+    monkeypatch.setattr(TransactionStore, 'query', no_query)
+    rollups, failures = report_engine.aggregate([ledger], by_year=True, max_workers=1)
+    assert failures == {}
+    assert rollups[ledger].cells == whole.cells
+
+
+def test_a_ledger_changed_after_partitioning_is_read_again(ledger):
+    items = report_engine.partitions([ledger], by_year=True)
+    CSVStorage(ledger).append(pd.DataFrame({
+        'Date': ['2022-06-15'], 'Category': 'Food', 'Amount': [5.0], 'Description': '', 'Note': '',
+    }))
+    store = CSVStorage(ledger).load_store()
+    expected = MonthlyRollup.from_view(store.query('2022-01-01', '2022-12-31')).cells
+    assert report_engine.partial_rollup(items[1]) == (ledger, expected)
@@ -0,0 +1,43 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import reports
+from transaction_store import TransactionStore
+
+
+def test_choose_granularity_keeps_the_bar_count_bounded():
+    assert reports.choose_granularity(date(2024, 1, 1), date(2024, 1, 31)) == 'day'
+    assert reports.choose_granularity(date(2024, 1, 1), date(2024, 6, 30)) == 'week'
+    assert reports.choose_granularity(date(2021, 1, 1), date(2024, 12, 31)) == 'month'
+    assert reports.choose_granularity(date(2011, 1, 1), date(2024, 12, 31)) == 'quarter'
+    assert reports.choose_granularity(date(1900, 1, 1), date(2024, 12, 31)) == 'year'
+    assert reports.choose_granularity(date(2024, 1, 1), date(2024, 1, 31), finest='month') == 'month'
+
+
+def test_lttb_keeps_the_ends_and_the_spikes():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+    keep = reports.lttb(x, y, 300)
+    assert len(keep) == 300
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()
+    assert 4321 in keep
+    assert reports.lttb(x[:100], y[:100], 300).tolist() == list(range(100))
+
+
+def test_monthly_data_bounds_a_long_daily_history():
+    days = pd.date_range('2015-01-01', '2024-12-31', freq='D')
+    store = TransactionStore.from_frame(pd.DataFrame({
+        'Date': days.strftime('%Y-%m-%d'),
+        'Category': np.where(np.arange(len(days)) % 2, 'Food', 'Shopping'),
+        'Amount': 10.0,
+    }))
+    data = reports.monthly_data(store.view())
+    assert data.resolution == 'day'
+    assert len(data.periods) <= reports.MAX_BARS
+    assert len(data.line) <= reports.MAX_LINE_POINTS
+    assert len(data.monthly) == 120
+    assert data.periods.to_numpy().sum() == data.monthly.to_numpy().sum() == 10.0 * len(days)
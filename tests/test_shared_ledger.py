@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from shared_ledger import LedgerLock
+from storage import COLUMNS, CSVStorage
+
+
+def rows(*descriptions):
+    return pd.DataFrame({
+        'Date': '2024-01-15',
+        'Category': 'Food',
+        'Amount': 10.0,
+        'Description': list(descriptions),
+        'Note': '',
+    })
+
+
+def try_elsewhere(context):
+    """Enter context on another thread; returns (whether it got in within a short wait, join)"""
+    entered = threading.Event()
+
+    def hold():
+        with context():
+            entered.set()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    return entered.wait(0.2), thread.join
+
+
+def test_lock_shares_reads_and_excludes_writes(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    lock, other = LedgerLock(ledger), LedgerLock(ledger)
+    with lock.shared():
+        got_in, join = try_elsewhere(other.shared)
+        assert got_in
+        join()
+        got_in, join_writer = try_elsewhere(other.exclusive)
+        assert not got_in
+        with pytest.raises(RuntimeError):
+            with lock.exclusive():
+                pass
+    join_writer()  # Gets in once the shared hold is released
+    with lock.exclusive():
+        with lock.exclusive(), lock.shared():  # Re-entrant within the thread
+            pass
+        got_in, join = try_elsewhere(other.shared)
+        assert not got_in
+    join()
+
+
+def test_concurrent_appends_all_land_once(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    storages = [CSVStorage(ledger) for _ in range(4)]
+
+    def write(number):
+        for i in range(25):
+            storages[number].append(rows(f"{number}-{i}"))
+
+    threads = [threading.Thread(target=write, args=(number,)) for number in range(len(storages))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    written = CSVStorage(ledger).load()['Description']
+    assert sorted(written) == sorted(f"{number}-{i}" for number in range(4) for i in range(25))
+    assert sum(storage.writer.commits for storage in storages) <= 100
+    assert not [name for name in os.listdir(ledger + ".spool") if name.endswith(".rows")]
+
+
+def test_interrupted_commit_is_redone(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    storage = CSVStorage(ledger)
+    storage.append(rows('before'))
+    size = os.path.getsize(ledger)
+    # A writer spooled a row, recorded its commit and died half-way through the append
+    spool = ledger + ".spool"
+    with open(os.path.join(spool, "00000000000000000001-1-1.rows"), "w") as f:
+        f.write("2024-01-16,Food,20.0,spooled,\n")
+    with open(os.path.join(spool, "commit.json"), "w") as f:
+        json.dump({"size": size, "files": ["00000000000000000001-1-1.rows"]}, f)
+    with open(ledger, "a") as f:
+        f.write("2024-01-16,Fo")
+
+    storage.append(rows('after'))
+    assert CSVStorage(ledger).load()['Description'].tolist() == ['before', 'spooled', 'after']
+
+
+def test_read_appended_returns_only_new_rows(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    storage = CSVStorage(ledger)
+    storage.append(rows('a', 'b'))
+    position = storage.position()
+    CSVStorage(ledger).append(rows('c'))
+    appended, position = storage.read_appended(position)
+    assert list(appended.columns) == COLUMNS
+    assert appended['Description'].tolist() == ['c']
+    assert len(storage.read_appended(position)[0]) == 0
+
+    # An edit that keeps the size can't be read as an append
+    with open(ledger) as f:
+        text = f.read()
+    with open(ledger, "w") as f:
+        f.write(text.replace(",a,", ",z,"))
+    assert storage.read_appended(position) is None
+
+
+def test_following_appends_reads_a_bounded_window(tmp_path, monkeypatch):
+    import snapshot
+
+    ledger = str(tmp_path / "ledger.csv")
+    storage = CSVStorage(ledger)
+    storage.append(rows(*[f"row {i}" for i in range(20_000)]))
+    store, position = storage.load_store_and_position()
+    assert len(store) == 20_000
+    hashed = []
+    hash_range = snapshot._hash_range
+    monkeypatch.setattr(snapshot, "_hash_range", lambda f, start, end, hasher: (
+        hashed.append(end - start), hash_range(f, start, end, hasher))[1])
+    CSVStorage(ledger).append(rows('new'))
+    appended, position = storage.read_appended(position)
+    assert appended['Description'].tolist() == ['new']
+    assert sum(hashed) <= 2 * snapshot.TAIL_WINDOW < os.path.getsize(ledger)
+
+    # A change just before the old end of the file is still caught
+    with open(ledger, "r+b") as f:
+        f.seek(os.path.getsize(ledger) - 10)
+        f.write(b"X")
+    with open(ledger, "a") as f:
+        f.write("2024-01-16,Food,1.0,later,\n")
+    assert storage.read_appended(position) is None
@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+
+import snapshot
+from transaction_store import PAISA
+
+
+def write_ledger(path, amounts):
+    pd.DataFrame({
+        'Date': [f"2024-01-{day % 28 + 1:02d}" for day in range(len(amounts))],
+        'Category': 'Food',
+        'Amount': amounts,
+        'Description': [f"row {i}" for i in range(len(amounts))],
+        'Note': '',
+    }).to_csv(path, index=False)
+
+
+def total(store):
+    return int(store.columns()['paisa'].sum())
+
+
+def test_unchanged_ledger_is_served_from_snapshot(tmp_path):
+    path = str(tmp_path / "ledger.csv")
+    write_ledger(path, [100.0] * 50)
+    snapshot.load_store(path)
+    generation = snapshot._read_meta(snapshot.snapshot_dir(path))["generation"]
+    assert total(snapshot.load_store(path)) == 50 * 100 * PAISA
+    assert snapshot._read_meta(snapshot.snapshot_dir(path))["generation"] == generation
+
+
+def test_appended_rows_extend_snapshot(tmp_path):
+    path = str(tmp_path / "ledger.csv")
+    write_ledger(path, [100.0] * 50)
+    snapshot.load_store(path)
+    with open(path, "a") as f:
+        f.write("2024-02-01,Food,25.5,late,\n")
+    store = snapshot.load_store(path)
+    assert len(store) == 51
+    assert total(store) == (50 * 100 + 25.5) * PAISA
+
+
+def test_same_size_edit_in_the_middle_rebuilds(tmp_path):
+    path = str(tmp_path / "ledger.csv")
+    write_ledger(path, [4227.25 if i == 10_000 else 100.25 for i in range(20_000)])
+    before = total(snapshot.load_store(path))
+    with open(path) as f:
+        text = f.read()
+    with open(path, "w") as f:
+        f.write(text.replace("4227.25", "9999.25"))
+    assert os.path.getsize(path) == len(text)
+    assert total(snapshot.load_store(path)) == before + (9999.25 - 4227.25) * PAISA
+
+
+def test_touched_ledger_keeps_snapshot(tmp_path):
+    path = str(tmp_path / "ledger.csv")
+    write_ledger(path, [100.0] * 50)
+    snapshot.load_store(path)
+    meta = snapshot._read_meta(snapshot.snapshot_dir(path))
+    os.utime(path, ns=(meta["mtime_ns"] + 10**9, meta["mtime_ns"] + 10**9))
+    assert total(snapshot.load_store(path)) == 50 * 100 * PAISA
+    updated = snapshot._read_meta(snapshot.snapshot_dir(path))
+    assert updated["generation"] == meta["generation"]
+    assert updated["mtime_ns"] == meta["mtime_ns"] + 10**9
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "check_startup.py")
+
+
+def test_heavy_modules_stay_out_of_startup():
+    # A loose time budget: CI machines vary, the lazy imports are what matters here
+    result = subprocess.run(
+        [sys.executable, SCRIPT, "--budget-ms", "2000", "--runs", "1"],
+        capture_output=True,
+        text=True,
+    )
+    assert "should be lazy" not in result.stdout, result.stdout
+    for module in ("matplotlib", "pandas"):
+        assert module not in result.stdout, result.stdout
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,155 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from storage import CSVStorage, JournaledStorage, LedgerConflict, SQLiteStorage, open_storage
+
+
+def rows(*descriptions):
+    return pd.DataFrame({
+        'Date': '2024-01-15',
+        'Category': 'Food',
+        'Amount': 10.0,
+        'Description': list(descriptions),
+        'Note': '',
+    })
+
+
+def descriptions(storage):
+    return sorted(storage.load()['Description'].fillna('').tolist())
+
+
+def test_compaction_keeps_rows_appended_while_it_runs(tmp_path, monkeypatch):
+    ledger = str(tmp_path / "ledger.csv")
+    CSVStorage(ledger).append(rows('base'))
+    journaled = JournaledStorage(ledger, compact_threshold=10**6)
+    journaled.append(rows('journal'))
+    other = CSVStorage(ledger)
+    racers = []
+    load = CSVStorage.load
+
+    def load_then_race(self):
+        frame = load(self)
+        if threading.current_thread() is journaled._compactor and not racers:
+            # Another writer appends after the merge has read the CSV
+            racer = threading.Thread(target=other.append, args=(rows('other'),))
+            racer.start()
+            racer.join(0.2)
+            racers.append(racer)
+        return frame
+
+    monkeypatch.setattr(CSVStorage, "load", load_then_race)
+    journaled.compact(wait=True)
+    racers[0].join()
+    monkeypatch.undo()
+    journaled.close()
+    assert descriptions(CSVStorage(ledger)) == ['base', 'journal', 'other']
+
+
+def test_journal_appends_from_two_storages_survive_compaction(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    first = JournaledStorage(ledger, compact_threshold=10**6)
+    second = JournaledStorage(ledger, compact_threshold=10**6)
+    first.append(rows('a'))
+    second.append(rows('b'))
+    first.compact(wait=True)
+    second.append(rows('c'))  # Its journal was rotated away by the other storage
+    first.close()
+    second.close()
+    assert descriptions(open_storage(ledger)) == ['a', 'b', 'c']
+
+
+def test_ledger_with_a_journal_opens_through_it(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    CSVStorage(ledger).append(rows('csv'))
+    journaled = JournaledStorage(ledger)
+    journaled.append(rows('journal'))
+    journaled.close()
+    assert isinstance(open_storage(ledger), JournaledStorage)
+    assert descriptions(open_storage(ledger)) == ['csv', 'journal']
+
+
+@pytest.mark.parametrize("backend, name", [
+    (CSVStorage, "ledger.csv"),
+    (JournaledStorage, "ledger.csv"),
+    (SQLiteStorage, "ledger.db"),
+])
+def test_replace_refuses_a_stale_signature(tmp_path, backend, name):
+    ledger = str(tmp_path / name)
+    storage = backend(ledger)
+    storage.append(rows('mine'))
+    seen = storage.signature()
+    other = backend(ledger)
+    other.append(rows('theirs'))
+    other.close()
+    with pytest.raises(LedgerConflict):
+        storage.replace(rows('mine', 'edited'), expected=seen)
+    assert descriptions(storage) == ['mine', 'theirs']
+
+    storage.replace(rows('mine', 'edited'), expected=storage.signature())
+    assert descriptions(storage) == ['edited', 'mine']
+    storage.close()
+
+
+def test_journal_fsyncs_once_per_group(tmp_path, monkeypatch):
+    import storage
+
+    synced = []
+    fsync = storage._fsync
+    monkeypatch.setattr(storage, "_fsync", lambda f: (synced.append(f.name), fsync(f)))
+    journaled = JournaledStorage(str(tmp_path / "ledger.csv"), commit_every=3, commit_interval=60)
+    for description in 'abcdefg':
+        journaled.append(rows(description))
+    assert synced.count(journaled.journal_path) == 2
+    journaled.close()
+    assert synced.count(journaled.journal_path) == 3
+
+
+def test_journal_replay_ignores_a_torn_last_line(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    journaled = JournaledStorage(ledger, compact_threshold=10**6)
+    journaled.append(rows('a', 'b'))
+    journaled.close()
+    with open(journaled.journal_path, "a") as f:
+        f.write('{"Date": "2024-01-15", "Cat')  # Crash part-way through a write
+    reopened = JournaledStorage(ledger, compact_threshold=10**6)
+    assert descriptions(reopened) == ['a', 'b']
+    reopened.append(rows('c'))
+    reopened.close()
+    assert descriptions(JournaledStorage(ledger)) == ['a', 'b', 'c']
+
+
+def test_journal_recovers_an_interrupted_merge(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    CSVStorage(ledger).append(rows('base'))
+    journaled = JournaledStorage(ledger, compact_threshold=10**6)
+    journaled.append(rows('journal'))
+    with journaled.lock.exclusive(), journaled._lock:
+        journaled._rotate()  # Crash after the rotation, before the merge
+    journaled.close()
+    assert descriptions(JournaledStorage(ledger)) == ['base', 'journal']
+    assert descriptions(CSVStorage(ledger)) == ['base', 'journal']
+
+
+def test_journal_compacts_at_the_threshold(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    journaled = JournaledStorage(ledger, compact_threshold=4)
+    journaled.append(rows('a', 'b'))
+    journaled.append(rows('c', 'd'))
+    journaled._wait_for_compaction()
+    assert descriptions(CSVStorage(ledger)) == ['a', 'b', 'c', 'd']
+    journaled.append(rows('e'))
+    journaled.close()
+    assert descriptions(JournaledStorage(ledger)) == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_journal_discards_a_merge_that_had_finished(tmp_path):
+    ledger = str(tmp_path / "ledger.csv")
+    journaled = JournaledStorage(ledger, compact_threshold=10**6)
+    journaled.append(rows('a'))
+    with journaled.lock.exclusive(), journaled._lock:
+        journaled._rotate()
+        journaled._write_snapshot(journaled.load())  # Crash after the rewrite, before cleaning up
+    journaled.close()
+    assert descriptions(JournaledStorage(ledger)) == ['a']
@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+import summary_service
+from budget_limits import BudgetLimits
+from storage import CSVStorage
+from summary_service import HTTPError, LedgerService, parse_rows
+
+
+def post_body(*rows):
+    return json.dumps([
+        {"date": date, "category": category, "amount": amount, "description": description}
+        for date, category, amount, description in rows
+    ]).encode()
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    path = str(tmp_path / "ledger.csv")
+    CSVStorage(path).append(pd.DataFrame({
+        'Date': ['2024-01-05', '2024-01-20', '2024-02-03'],
+        'Category': ['Food', 'Shopping', 'Food'],
+        'Amount': [100.0, 250.5, 40.0],
+        'Description': ['lunch', 'shoes', 'tea'],
+        'Note': '',
+    }))
+    return path
+
+
+def run(path, steps):
+    """Start a service on path, await steps(service) and close it again"""
+    async def main():
+        service = LedgerService(path)
+        await service.start()
+        try:
+            return await steps(service)
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+async def get(service, target):
+    status, body = await service.handle('GET', target, b'')
+    assert status == 200, body
+    return json.loads(body)
+
+
+async def post(service, body):
+    status, reply = await service.handle('POST', '/transactions', body)
+    return status, json.loads(reply)
+
+
+def test_parse_rows_accepts_either_case_and_rejects_bad_rows():
+    frame = parse_rows(b'{"transactions": [{"Date": "2024-03-01", "CATEGORY": " Food ", "amount": "12.5"}]}')
+    assert frame.iloc[0].tolist() == ['2024-03-01', 'Food', 12.5, '', '']
+    for body in [b'not json', b'[]', b'[1]',
+                 post_body(('2024-13-01', 'Food', 1, '')),
+                 post_body(('2024-03-01', 'Food', -5, '')),
+                 post_body(('2024-03-01', '', 5, ''))]:
+        with pytest.raises(HTTPError) as error:
+            parse_rows(body)
+        assert error.value.status == 400
+
+
+def test_get_endpoints_answer_from_the_loaded_ledger(ledger):
+    async def steps(service):
+        summary = await get(service, '/summary')
+        assert summary['count'] == 3 and summary['total'] == 390.5
+        assert (await get(service, '/summary?start=2024-02-01'))['categories']['Food'] == 40.0
+        monthly = await get(service, '/monthly')
+        assert monthly['months'] == ['2024-01', '2024-02']
+        query = await get(service, '/query?category=Food&min=50')
+        assert [row['Description'] for row in query['transactions']] == ['lunch']
+        status, _ = await service.handle('GET', '/summary?start=yesterday', b'')
+        assert status == 400
+        status, _ = await service.handle('GET', '/nowhere', b'')
+        assert status == 404
+    run(ledger, steps)
+
+
+def test_posts_skip_rows_the_ledger_already_has(ledger):
+    async def steps(service):
+        body = post_body(('2024-01-05', 'Food', 100.0, 'Lunch'), ('2024-03-01', 'Food', 9.0, 'new'))
+        status, reply = await post(service, body)
+        assert status == 200
+        assert (reply['accepted'], reply['duplicates']) == (1, 1)
+        # A client retrying the same request writes nothing more
+        status, reply = await post(service, body)
+        assert (reply['accepted'], reply['duplicates']) == (0, 2)
+        assert (await get(service, '/summary'))['count'] == 4
+    run(ledger, steps)
+    assert len(CSVStorage(ledger).load()) == 4
+
+
+def test_posts_dedupe_against_rows_other_programs_wrote(ledger):
+    async def steps(service):
+        CSVStorage(ledger).append(pd.DataFrame({
+            'Date': ['2024-03-02'], 'Category': ['Food'], 'Amount': [7.0], 'Description': ['elsewhere'], 'Note': [''],
+        }))
+        status, reply = await post(service, post_body(('2024-03-02', 'Food', 7.0, 'elsewhere')))
+        assert (reply['accepted'], reply['duplicates']) == (0, 1)
+        assert (await get(service, '/summary'))['count'] == 4
+    run(ledger, steps)
+    assert len(CSVStorage(ledger).load()) == 4
+
+
+def test_a_failed_catch_up_after_the_write_still_succeeds(ledger, monkeypatch):
+    async def steps(service):
+        async def broken():
+            raise OSError("read failed")
+
+        monkeypatch.setattr(service, "_catch_up", broken)
+        status, reply = await post(service, post_body(('2024-03-03', 'Food', 5.0, 'once')))
+        assert status == 200 and reply['accepted'] == 1
+        monkeypatch.undo()
+        status, reply = await post(service, post_body(('2024-03-03', 'Food', 5.0, 'once')))
+        assert (reply['accepted'], reply['duplicates']) == (0, 1)
+        assert (await get(service, '/summary'))['count'] == 4
+    run(ledger, steps)
+
+
+def test_posts_report_limits_they_go_over(ledger):
+    BudgetLimits(overall=500, categories={'Food': 150}).save(ledger + ".limits.json")
+
+    async def steps(service):
+        _, reply = await post(service, post_body(('2024-01-25', 'Food', 60.0, 'dinner')))
+        assert reply['over_limit'] == [
+            {"month": "2024-01", "category": "Food", "limit": 150, "spent": 160.0},
+        ]
+        _, reply = await post(service, post_body(('2024-02-25', 'Food', 5.0, 'snack')))
+        assert reply['over_limit'] == []
+    run(ledger, steps)
+
+
+def test_concurrent_posts_share_a_group_commit(ledger):
+    async def steps(service):
+        bodies = [post_body(('2024-04-01', 'Food', 1.0 + i, f"batch {i}")) for i in range(20)]
+        replies = await asyncio.gather(*(post(service, body) for body in bodies))
+        assert all(status == 200 and reply['accepted'] == 1 for status, reply in replies)
+        assert service.commits < 20
+        assert (await get(service, '/summary'))['count'] == 23
+    run(ledger, steps)
+
+
+def test_get_catches_up_with_other_writers(ledger, monkeypatch):
+    monkeypatch.setattr(summary_service, "RELOAD_CHECK_INTERVAL", 0)
+
+    async def steps(service):
+        CSVStorage(ledger).append(pd.DataFrame({
+            'Date': ['2024-03-09'], 'Category': ['Other'], 'Amount': [3.0], 'Description': ['gui'], 'Note': [''],
+        }))
+        assert (await get(service, '/summary'))['categories']['Other'] == 3.0
+    run(ledger, steps)
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+import financial_tracker
+from storage import CSVStorage
+from transaction_store import Transaction
+
+
+def edited(amount):
+    return Transaction(amount, "Food", "edited", "", datetime(2024, 1, 2))
+
+
+def ledger_amounts(app):
+    return CSVStorage(app.transactions_file).load()['Amount'].tolist()
+
+
+def test_edit_is_refused_after_the_store_was_reloaded(tracker):
+    opened = (tracker.store, tracker.store[1])
+    tracker.load_transactions()  # e.g. the watcher picked up a rewrite
+    with pytest.raises(ValueError):
+        tracker.update_transaction(1, edited(99.0), opened)
+    assert ledger_amounts(tracker) == [10.0, 20.0]
+
+
+def test_edit_is_refused_when_the_row_changed(tracker):
+    opened = (tracker.store, tracker.store[0])
+    tracker.update_transaction(0, edited(5.0))
+    with pytest.raises(ValueError):
+        tracker.update_transaction(0, edited(99.0), opened)
+    assert ledger_amounts(tracker) == [5.0, 20.0]
+
+
+def test_failed_write_leaves_the_store_alone(tracker, monkeypatch):
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(tracker.storage, "replace", disk_full)
+    store = tracker.store
+    with pytest.raises(OSError):
+        tracker.update_transaction(1, edited(99.0))
+    assert tracker.store is store
+    assert store[1].amount == 20.0
+    assert tracker.rollup.category_totals()['Food'] == 30.0
+    assert ledger_amounts(tracker) == [10.0, 20.0]
+
+
+def test_delete_rewrites_the_ledger(tracker, monkeypatch):
+    monkeypatch.setattr(financial_tracker.messagebox, "askyesno", lambda *args, **kwargs: True)
+    assert tracker.delete_transaction(0)
+    assert [transaction.description for transaction in tracker.store] == ['second']
+    assert ledger_amounts(tracker) == [20.0]
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from transaction_store import PAISA, Transaction, TransactionStore
+
+
+def make_store():
+    store = TransactionStore()
+    for day, amount in [(1, 100.0), (2, 250.0), (3, 75.5)]:
+        store.append(Transaction(amount, "Food", f"day {day}", "", datetime(2024, 1, day)))
+    return store
+
+
+def test_views_keep_their_values_after_update():
+    store = make_store()
+    view = store.query()
+    everything = store.view()
+    store.update(1, Transaction(999.0, "Shopping", "changed", "", datetime(2024, 2, 1)))
+    assert view.paisa.tolist() == [100 * PAISA, 250 * PAISA, int(75.5 * PAISA)]
+    assert everything.column('dates').tolist() == view.dates.tolist()
+    assert store.query().paisa.tolist() == [100 * PAISA, int(75.5 * PAISA), 999 * PAISA]
+
+
+def test_views_keep_their_rows_after_append_and_delete():
+    store = make_store()
+    view = store.query()
+    store.append(Transaction(10.0, "Food", "later", "", datetime(2024, 1, 4)))
+    store.delete([0])
+    assert len(view) == 3
+    assert view.paisa.tolist() == [100 * PAISA, 250 * PAISA, int(75.5 * PAISA)]
+    assert len(store) == 3
+
+
+def test_extend_store_remaps_categories_and_strings():
+    store = make_store()
+    other = TransactionStore(categories=["Rent"])
+    other.append(Transaction(500.0, "Rent", "day 2", "paid", datetime(2024, 1, 5)))
+    other.append(Transaction(20.0, "Food", "new", "", datetime(2024, 1, 6)))
+    assert store.extend_store(other) == 2
+    assert [(t.amount, t.category, t.description, t.note) for t in store][3:] == [
+        (500.0, "Rent", "day 2", "paid"), (20.0, "Food", "new", "")
+    ]
+    assert store.query(start="2024-01-05").paisa.tolist() == [500 * PAISA, 20 * PAISA]
+
+
+def random_frame(rng, count, first_day):
+    import numpy as np
+    import pandas as pd
+
+    return pd.DataFrame({
+        'Date': (np.datetime64(first_day) + rng.integers(0, 90, count)).astype(str),
+        'Category': rng.choice(["Food", "Shopping", "Utilities", "Rent"], count),
+        'Amount': rng.integers(100, 100_000, count) / 100,
+        'Description': [f"row {first_day} {i}" for i in range(count)],
+        'Note': '',
+    })
+
+
+def expected_rows(frame, start=None, end=None, categories=None, min_amount=None, max_amount=None):
+    keep = frame['Date'].between(start or '0000', end or '9999')
+    if categories is not None:
+        keep &= frame['Category'].isin(categories)
+    if min_amount is not None:
+        keep &= frame['Amount'] >= min_amount
+    if max_amount is not None:
+        keep &= frame['Amount'] <= max_amount
+    return frame[keep].sort_values('Date', kind='stable')['Description'].tolist()
+
+
+def test_query_matches_a_pandas_filter_as_the_store_grows():
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(7)
+    frame = random_frame(rng, 2000, '2024-01-01')
+    store = TransactionStore.from_frame(frame)
+    queries = [
+        {},
+        {'start': '2024-02-01', 'end': '2024-02-29'},
+        {'categories': ['Food', 'Rent'], 'end': '2024-03-15'},
+        {'categories': ['Unknown']},
+        {'start': '2024-01-10', 'min_amount': 250, 'max_amount': 750},
+    ]
+    # Later rows, then earlier ones, so the index is both extended and rebuilt
+    for extra in [None, random_frame(rng, 500, '2024-04-01'), random_frame(rng, 500, '2023-12-01')]:
+        if extra is not None:
+            store.extend_frame(extra)
+            frame = pd.concat([frame, extra], ignore_index=True)
+        for query in queries:
+            view = store.query(**query)
+            assert [store.strings[code] for code in view.column('description_codes')] == \
+                expected_rows(frame, **query), query
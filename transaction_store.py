@@ -0,0 +1,557 @@
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+from ui_styles import CATEGORIES
+
+EPOCH = datetime(1970, 1, 1)
+PAISA = 100  # Minor units per taka; amounts are held as int64 paisa
+
+
+class Transaction:
+    """Represents a financial transaction."""
+    __slots__ = ('amount', 'category', 'description', 'note', 'date')
+
+    def __init__(self, amount, category, description="", note="", date=None):
+        self.amount = amount
+        self.category = category
+        self.description = description
+        self.note = note
+        self.date = date if date else datetime.now()
+
+    def __eq__(self, other):
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+def to_epoch_days(dates):
+    """Vectorized conversion of dates to int64 days since 1970-01-01, plus a mask of unparseable ones"""
+    parsed = pd.to_datetime(pd.Series(dates), errors='coerce')
+    days = parsed.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return days, parsed.isna().to_numpy()
+
+
+def from_epoch_day(day):
+    return EPOCH + timedelta(days=int(day))
+
+
+def epoch_day(value):
+    """Epoch day for a date, datetime, Timestamp or date string"""
+    return int(pd.Timestamp(value).to_datetime64().astype('datetime64[D]').astype(np.int64))
+
+
+def to_paisa(amounts):
+    """Taka amounts (a number or an array) as int64 paisa, rounded to the nearest paisa"""
+    return np.rint(np.asarray(amounts, dtype=np.float64) * PAISA).astype(np.int64)
+
+
+def to_taka(paisa):
+    """Paisa as float taka, for display and for writing out"""
+    return np.asarray(paisa) / PAISA
+
+
+def sum_paisa(keys, paisa, size):
+    """Exact int64 paisa totals per key in range(size).
+
+    bincount adds in float64, which is exact for whole numbers of paisa
+    below 2**53 (about 90 trillion taka), and is much faster than np.add.at.
+    """
+    return np.bincount(keys, weights=paisa, minlength=size).astype(np.int64)
+
+
+def _text(codes, strings):
+    return pd.Categorical.from_codes(codes, strings)
+
+
+def _typed_frame(columns, categories, strings):
+    # pandas holds datetimes at second resolution at the coarsest, so day
+    # dates widen to datetime64[s] here
+    return pd.DataFrame({
+        "Date": columns['dates'].astype('datetime64[D]').astype('datetime64[s]'),
+        "Amount": to_taka(columns['paisa']),
+        "Category": pd.Categorical.from_codes(columns['codes'], categories),
+        "Description": _text(columns['description_codes'], strings),
+        "Note": _text(columns['note_codes'], strings),
+    })
+
+
+def _ledger_frame(columns, categories, strings):
+    dates = pd.to_datetime(columns['dates'].astype('datetime64[D]'))
+    return pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Category": pd.Categorical.from_codes(columns['codes'], categories).astype(str),
+        "Amount": to_taka(columns['paisa']),
+        "Description": _text(columns['description_codes'], strings).astype(str),
+        "Note": _text(columns['note_codes'], strings).astype(str),
+    })
+
+
+class _IntVector:
+    """Growable int64 array with amortized O(1) appends."""
+    def __init__(self, values=()):
+        values = np.asarray(values, dtype=np.int64)
+        self._data = np.empty(max(len(values), 16), dtype=np.int64)
+        self._data[:len(values)] = values
+        self._size = len(values)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+    def extend(self, values):
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            data = np.empty(max(needed, 2 * len(self._data)), dtype=np.int64)
+            data[:self._size] = self.values
+            self._data = data
+        self._data[self._size:needed] = values
+        self._size = needed
+
+
+class _DateIndex:
+    """Date-sorted row order plus a posting list of sorted positions per category.
+
+    A date range maps to a slice of ``order`` with two binary searches, and a
+    category filter to a slice of its posting list with two more, so queries
+    cost O(log N) plus the size of the result.
+    """
+    def __init__(self, dates, codes, category_count):
+        order = np.argsort(dates, kind='stable')
+        self.order = _IntVector(order)
+        self.sorted_dates = _IntVector(dates[order])
+        sorted_codes = codes[order]
+        grouped = np.argsort(sorted_codes, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(sorted_codes, minlength=category_count))])
+        self.postings = [
+            _IntVector(grouped[bounds[code]:bounds[code + 1]])
+            for code in range(category_count)
+        ]
+
+    def extend(self, first_row, dates, codes):
+        """Index rows appended at first_row; False if they can't go on the end"""
+        if len(self.sorted_dates) and len(dates) and dates.min() < self.sorted_dates.values[-1]:
+            return False
+        chunk_order = np.argsort(dates, kind='stable')
+        start = len(self.order)
+        self.order.extend(first_row + chunk_order)
+        self.sorted_dates.extend(dates[chunk_order])
+        chunk_codes = codes[chunk_order]
+        for code in np.unique(chunk_codes):
+            while code >= len(self.postings):
+                self.postings.append(_IntVector())
+            self.postings[code].extend(start + np.flatnonzero(chunk_codes == code))
+        return True
+
+
+class TransactionStore:
+    """Columnar, append-friendly storage for transactions.
+
+    Dates are int64 epoch days (the layout of datetime64[D]), amounts int64
+    paisa and categories small-int codes into ``categories``, which start
+    as ui_styles.CATEGORIES. Descriptions and notes are int32 codes into
+    ``strings``, a shared table of interned unique strings. Totals are
+    summed in paisa, so they are exact; amounts only become float taka in
+    ``Transaction`` objects, ``amounts`` and the DataFrames handed out.
+    """
+    ARRAYS = {
+        '_dates': np.int64,
+        '_paisa': np.int64,
+        '_codes': np.int16,
+        '_description_codes': np.int32,
+        '_note_codes': np.int32,
+    }
+
+    def __init__(self, categories=CATEGORIES, capacity=1024):
+        self.categories = list(categories)
+        self._category_codes = {name: code for code, name in enumerate(self.categories)}
+        self.strings = ['']
+        self._string_codes = {'': 0}
+        self._size = 0
+        self._index = None
+        self.version = 0  # Bumped on every change, for caches derived from the store
+        for name, dtype in self.ARRAYS.items():
+            setattr(self, name, np.empty(capacity, dtype=dtype))
+
+    @classmethod
+    def from_frame(cls, df, categories=CATEGORIES):
+        """Build a store from a ledger DataFrame using vectorized parsing"""
+        store = cls(categories, capacity=max(len(df), 1024))
+        store.extend_frame(df)
+        return store
+
+    @classmethod
+    def from_columns(cls, columns, categories, strings):
+        """Wrap existing arrays (e.g. memory-mapped ones) without copying them"""
+        store = cls(categories, capacity=0)
+        store.strings = [sys.intern(value) for value in strings]
+        store._string_codes = {value: code for code, value in enumerate(store.strings)}
+        for name in cls.ARRAYS:
+            setattr(store, name, columns[name.lstrip('_')])
+        store._size = len(store._dates)
+        return store
+
+    def copy(self):
+        """Independent copy; editing either one leaves the other as it was"""
+        columns = {name: np.array(values) for name, values in self.columns().items()}
+        return TransactionStore.from_columns(columns, self.categories, self.strings)
+
+    def columns(self):
+        """The live part of every array, keyed by name without the underscore"""
+        return {name.lstrip('_'): getattr(self, name)[:self._size] for name in self.ARRAYS}
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("transaction index out of range")
+        return Transaction(
+            amount=int(self._paisa[index]) / PAISA,
+            category=self.categories[self._codes[index]],
+            description=self.strings[self._description_codes[index]],
+            note=self.strings[self._note_codes[index]],
+            date=from_epoch_day(self._dates[index])
+        )
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield self[index]
+
+    @property
+    def dates(self):
+        return self._dates[:self._size]
+
+    @property
+    def paisa(self):
+        return self._paisa[:self._size]
+
+    @property
+    def amounts(self):
+        """Amounts in taka, as a float64 array"""
+        return to_taka(self.paisa)
+
+    @property
+    def codes(self):
+        return self._codes[:self._size]
+
+    def category_code(self, category):
+        """Code for a category name, registering it if it is new"""
+        code = self._category_codes.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self._category_codes[category] = code
+        return code
+
+    def string_code(self, value):
+        """Code for a description/note string, interning it if it is new"""
+        code = self._string_codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(sys.intern(value))
+            self._string_codes[value] = code
+        return code
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._dates)
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1024)
+        while capacity < needed:
+            capacity *= 2
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _text_codes(self, df, column):
+        if column not in df:
+            return np.zeros(len(df), dtype=np.int32)
+        codes, uniques = pd.factorize(df[column].fillna('').astype(str))
+        lookup = np.array([self.string_code(value) for value in uniques], dtype=np.int32)
+        return lookup[codes]
+
+    def extend_frame(self, df):
+        """Append every valid row of a ledger DataFrame; returns the number added"""
+        with span("store.parse_dates", rows=len(df)):
+            days, bad_dates = to_epoch_days(df['Date'])
+        with span("store.validate", rows=len(df)):
+            # Drop rows missing a date, amount or category
+            amounts = pd.to_numeric(df['Amount'], errors='coerce').to_numpy(dtype=np.float64)
+            categories = df['Category']
+            valid = ~(bad_dates | np.isnan(amounts) | categories.isna().to_numpy())
+            if not valid.all():
+                df = df[valid]
+                days, amounts, categories = days[valid], amounts[valid], categories[valid]
+            paisa = to_paisa(amounts)
+
+        # Factorize once, then map the handful of unique names to our codes
+        uniques_codes, uniques = pd.factorize(categories.astype(str))
+        lookup = np.array([self.category_code(name) for name in uniques], dtype=np.int16)
+
+        count = len(days)
+        if count == 0:
+            return 0
+        self._reserve(count)
+        end = self._size + count
+        self._dates[self._size:end] = days
+        self._paisa[self._size:end] = paisa
+        self._codes[self._size:end] = lookup[uniques_codes]
+        self._description_codes[self._size:end] = self._text_codes(df, 'Description')
+        self._note_codes[self._size:end] = self._text_codes(df, 'Note')
+        self._index_appended(self._size, end)
+        self._size = end
+        self.version += 1
+        return count
+
+    def extend_store(self, other):
+        """Append every row of another store, remapping its categories and strings; returns the number added"""
+        count = len(other)
+        if count == 0:
+            return 0
+        categories = np.array([self.category_code(name) for name in other.categories], dtype=np.int16)
+        strings = np.array([self.string_code(value) for value in other.strings], dtype=np.int32)
+        self._reserve(count)
+        end = self._size + count
+        self._dates[self._size:end] = other.dates
+        self._paisa[self._size:end] = other.paisa
+        self._codes[self._size:end] = categories[other.codes]
+        self._description_codes[self._size:end] = strings[other._description_codes[:count]]
+        self._note_codes[self._size:end] = strings[other._note_codes[:count]]
+        self._index_appended(self._size, end)
+        self._size = end
+        self.version += 1
+        return count
+
+    def append(self, transaction):
+        """Append a single Transaction in O(1) amortized time"""
+        self._reserve(1)
+        date = transaction.date
+        self._dates[self._size] = (datetime(date.year, date.month, date.day) - EPOCH).days
+        self._paisa[self._size] = to_paisa(transaction.amount)
+        self._codes[self._size] = self.category_code(transaction.category)
+        self._description_codes[self._size] = self.string_code(str(transaction.description or ''))
+        self._note_codes[self._size] = self.string_code(str(transaction.note or ''))
+        self._index_appended(self._size, self._size + 1)
+        self._size += 1
+        self.version += 1
+
+    def _copy_arrays(self):
+        # Views and snapshot mappings share the current arrays; write to fresh copies
+        for name in self.ARRAYS:
+            setattr(self, name, np.array(getattr(self, name)[:self._size]))
+
+    def update(self, index, transaction):
+        """Replace the transaction at index; views made earlier keep the old values"""
+        if not 0 <= index < self._size:
+            raise IndexError("transaction index out of range")
+        self._copy_arrays()
+        date = transaction.date
+        self._dates[index] = (datetime(date.year, date.month, date.day) - EPOCH).days
+        self._paisa[index] = to_paisa(transaction.amount)
+        self._codes[index] = self.category_code(transaction.category)
+        self._description_codes[index] = self.string_code(str(transaction.description or ''))
+        self._note_codes[index] = self.string_code(str(transaction.note or ''))
+        self._index = None
+        self.version += 1
+
+    def delete(self, indices):
+        """Remove the transactions at the given indices; later rows move up"""
+        keep = np.ones(self._size, dtype=bool)
+        keep[indices] = False
+        for name in self.ARRAYS:
+            setattr(self, name, getattr(self, name)[:self._size][keep])
+        self._size = int(keep.sum())
+        self._index = None
+        self.version += 1
+
+    def _index_appended(self, start, end):
+        if self._index is not None and not self._index.extend(
+            start, self._dates[start:end], self._codes[start:end]
+        ):
+            self._index = None  # Out-of-order rows; rebuild on the next query
+
+    def view(self):
+        """Every transaction as a LedgerView, in insertion order, without building the date index"""
+        return LedgerView(self, np.arange(self._size), key=('all',))
+
+    def query(self, start=None, end=None, categories=None, min_amount=None, max_amount=None):
+        """Transactions dated start..end (inclusive) as a date-ordered LedgerView.
+
+        Dates are located by binary search over the sorted dates and categories
+        through per-category posting lists, so no full scan is needed. Amount
+        bounds are applied to the selected rows only.
+        """
+        if self._index is None:
+            self._index = _DateIndex(self.dates, self.codes, len(self.categories))
+        index = self._index
+        sorted_dates = index.sorted_dates.values
+        lo = 0 if start is None else int(np.searchsorted(sorted_dates, epoch_day(start), 'left'))
+        hi = len(sorted_dates) if end is None else int(np.searchsorted(sorted_dates, epoch_day(end), 'right'))
+        order = index.order.values
+
+        if categories is None:
+            rows = order[lo:hi]
+        else:
+            parts = []
+            for name in categories:
+                code = self._category_codes.get(name)
+                if code is None or code >= len(index.postings):
+                    continue
+                posting = index.postings[code].values
+                first, last = np.searchsorted(posting, [lo, hi])
+                parts.append(posting[first:last])
+            positions = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+            rows = order[positions]
+
+        if min_amount is not None or max_amount is not None:
+            paisa = self._paisa[rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if min_amount is not None:
+                keep &= paisa >= to_paisa(min_amount)
+            if max_amount is not None:
+                keep &= paisa <= to_paisa(max_amount)
+            rows = rows[keep]
+        key = (
+            'query',
+            None if start is None else epoch_day(start),
+            None if end is None else epoch_day(end),
+            None if categories is None else tuple(sorted(categories)),
+            min_amount,
+            max_amount,
+        )
+        return LedgerView(self, rows, key)
+
+    def category_totals(self):
+        """Exact total per category code, as an int64 array of paisa"""
+        return sum_paisa(self.codes, self.paisa, len(self.categories))
+
+    def get_summary(self):
+        """Summarizes amounts (in taka) by category name, skipping unused categories"""
+        totals = self.category_totals()
+        counts = np.bincount(self.codes, minlength=len(self.categories))
+        return {
+            self.categories[code]: int(totals[code]) / PAISA
+            for code in np.flatnonzero(counts)
+        }
+
+    def to_typed_frame(self):
+        """DataFrame with datetime Date, float taka Amount and categorical text columns"""
+        return _typed_frame(self.columns(), self.categories, self.strings)
+
+    def to_frame(self):
+        """Ledger DataFrame in the on-disk column layout"""
+        return _ledger_frame(self.columns(), self.categories, self.strings)
+
+
+class LedgerView:
+    """A date-ordered selection of store rows, as returned by TransactionStore.query.
+
+    The view keeps only the selected row numbers; column values are gathered
+    when asked for. It holds on to the arrays as they were when it was made,
+    so it stays valid (and unchanged) while the store grows or is edited. It offers
+    the same aggregation methods as MonthlyRollup, so reports can run on it.
+    """
+    def __init__(self, store, rows, key=None):
+        self.rows = rows
+        self.key = key  # Hashable description of the selection, for caching results
+        self.categories = list(store.categories)
+        self.strings = store.strings
+        self._columns = store.columns()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, name):
+        return self._columns[name][self.rows]
+
+    @property
+    def dates(self):
+        return self.column('dates')
+
+    @property
+    def paisa(self):
+        return self.column('paisa')
+
+    @property
+    def amounts(self):
+        return to_taka(self.paisa)
+
+    @property
+    def codes(self):
+        return self.column('codes')
+
+    def __iter__(self):
+        for row in self.rows:
+            yield Transaction(
+                amount=int(self._columns['paisa'][row]) / PAISA,
+                category=self.categories[self._columns['codes'][row]],
+                description=self.strings[self._columns['description_codes'][row]],
+                note=self.strings[self._columns['note_codes'][row]],
+                date=from_epoch_day(self._columns['dates'][row])
+            )
+
+    def category_totals(self):
+        """Total amount per category name, for categories present in the view"""
+        codes = self.codes
+        totals = sum_paisa(codes, self.paisa, len(self.categories))
+        present = np.flatnonzero(np.bincount(codes, minlength=len(self.categories)))
+        return pd.Series(
+            to_taka(totals[present]),
+            index=pd.Index([self.categories[code] for code in present], name='Category'),
+            name='Amount'
+        ).sort_index()
+
+    def monthly_category_totals(self):
+        """Month x category table of total amounts, months in order"""
+        months = self.dates.astype('datetime64[D]').astype('datetime64[M]')
+        unique_months, month_index = np.unique(months, return_inverse=True)
+        width = len(self.categories)
+        cells = month_index * width + self.codes
+        totals = sum_paisa(cells, self.paisa, len(unique_months) * width)
+        present = np.flatnonzero(np.bincount(self.codes, minlength=width))
+        table = to_taka(totals.reshape(len(unique_months), width)[:, present])
+        return pd.DataFrame(
+            table,
+            index=pd.Index(np.datetime_as_string(unique_months, unit='M'), name='Date'),
+            columns=pd.Index([self.categories[code] for code in present], name='Category')
+        )
+
+    def daily_category_totals(self):
+        """Day x category table of total amounts, indexed by date, days in order"""
+        days = self.dates
+        unique_days, day_index = np.unique(days, return_inverse=True)
+        width = len(self.categories)
+        totals = sum_paisa(day_index * width + self.codes, self.paisa, len(unique_days) * width)
+        present = np.flatnonzero(np.bincount(self.codes, minlength=width))
+        return pd.DataFrame(
+            to_taka(totals.reshape(len(unique_days), width)[:, present]),
+            index=pd.DatetimeIndex(unique_days.astype('datetime64[D]'), name='Date'),
+            columns=pd.Index([self.categories[code] for code in present], name='Category')
+        )
+
+    def _gathered(self, rows=None):
+        rows = self.rows if rows is None else rows
+        return {name: values[rows] for name, values in self._columns.items()}
+
+    def iter_frames(self, chunksize):
+        """Ledger DataFrames of up to chunksize rows each, in view order"""
+        for start in range(0, len(self.rows), chunksize):
+            yield _ledger_frame(self._gathered(self.rows[start:start + chunksize]), self.categories, self.strings)
+
+    def to_typed_frame(self):
+        return _typed_frame(self._gathered(), self.categories, self.strings)
+
+    def to_frame(self):
+        return _ledger_frame(self._gathered(), self.categories, self.strings)
@@ -1,5 +1,4 @@
 from dataclasses import dataclass
-from typing import Dict
 
 @dataclass
 class Colors:
@@ -67,6 +66,18 @@ class Styles:
         "padding": (0, 5),
     }
 
+    LABEL_HINT = {
+        "background": Colors.BACKGROUND,
+        "foreground": Colors.TEXT_SECONDARY,
+        "font": ("Helvetica", 10),
+    }
+
+    LABEL_WARNING = {
+        "background": Colors.BACKGROUND,
+        "foreground": Colors.DANGER,
+        "font": ("Helvetica", 10, "bold"),
+    }
+
     LABEL_HEADER = {
         "background": Colors.BACKGROUND,
         "foreground": Colors.TEXT,
@@ -86,6 +97,8 @@ def configure_styles(style):
     style.configure("Input.TEntry", **Styles.INPUT)
     style.configure("Label.TLabel", **Styles.LABEL)
     style.configure("Header.TLabel", **Styles.LABEL_HEADER)
+    style.configure("Hint.TLabel", **Styles.LABEL_HINT)
+    style.configure("Warning.TLabel", **Styles.LABEL_WARNING)
     style.configure("Main.TFrame", **Styles.FRAME)
 
 CATEGORIES = [